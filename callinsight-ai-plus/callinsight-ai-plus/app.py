@@ -1,6 +1,8 @@
 # app.py
 from flask import Flask, render_template, request, jsonify
 import os
+import json
+import uuid
 
 # Пытаемся импортировать dashboard
 try:
@@ -31,6 +33,44 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('templates', exist_ok=True)
 os.makedirs('static', exist_ok=True)
 
+def demo_segments():
+    """Реплики демо-диалога (для звонков без сохраненного анализа)"""
+    from utils.transcribe import DemoBackend
+    return [{'text': phrase, 'duration': 1.0} for phrase in DemoBackend.phrases]
+
+def emotion_summary(segments):
+    """
+    Эмоции звонка для дашборда - один пакетный проход EmotionAnalyzer.analyze_emotions
+    
+    Returns:
+        dict: emotion_stats (проценты), emotion_stats_by_speaker, dominant_emotion
+              и emotion_score - доля доминирующей эмоции (0-1)
+    """
+    summary = {
+        'emotion_stats': {},
+        'emotion_stats_by_speaker': {},
+        'dominant_emotion': 'нейтрально',
+        'emotion_score': 0.0
+    }
+    try:
+        from utils.emotion import EmotionAnalyzer
+        emotions = EmotionAnalyzer().analyze_emotions(segments)
+    except Exception as e:
+        print(f"⚠️ Анализ эмоций не удался: {e}")
+        return summary
+    
+    summary.update({
+        'emotion_stats': emotions['emotion_stats'],
+        'emotion_stats_by_speaker': emotions['emotion_stats_by_speaker'],
+        'dominant_emotion': emotions['dominant_emotion'],
+        'emotion_score': round(emotions['emotion_stats'].get(emotions['dominant_emotion'], 0.0) / 100, 3)
+    })
+    return summary
+
+def results_path(call_id):
+    """Файл с результатами анализа звонка (рядом с загруженной записью)"""
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"{call_id}.json")
+
 @app.route('/')
 def index():
     """Главная страница со списком звонков"""
@@ -51,16 +91,16 @@ def analyze_audio():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    # Сохраняем файл
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+    # Сохраняем файл: идентификатор уникален и при повторной загрузке того же файла,
+    # поэтому звонки не затирают друг друга ни в uploads/, ни в индексе ключевых слов
+    call_id = uuid.uuid4().hex
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{call_id}_{os.path.basename(file.filename)}")
     file.save(filepath)
     
     # Возвращаем демо-данные
     analysis_results = {
-        'call_id': len(os.listdir(app.config['UPLOAD_FOLDER'])),
+        'call_id': call_id,
         'filename': file.filename,
-        'dominant_emotion': 'гнев',
-        'emotion_score': 0.8,
         'keywords': ['проблема', 'доставка', 'жалоба', 'качество', 'возврат'],
         'has_profanity': True,
         'total_profanity_count': 2,
@@ -69,9 +109,41 @@ def analyze_audio():
         'transcript': 'Демо-текст: клиент жалуется на задержку доставки...'
     }
     
+    # Реплики получают диктора по времени из диаризации: стереозапись АТС делится
+    # по каналам всегда, моно - по звуку с ?engine=1 (иначе демо-дикторы);
+    # распознанный движком транскрипт попадает в индекс ключевых слов
+    # (/api/keywords/...), демо-текст - нет
+    from utils.pipeline import analyze_call
+    call = analyze_call(filepath, engine=request.args.get('engine', 0, type=int) == 1,
+                        call_id=analysis_results['call_id'])
+    if call.get('error'):
+        print(f"⚠️ Анализ звонка не удался: {call['error']}, возвращаются демо-данные")
+    else:
+        if call.get('diarization_error'):
+            analysis_results['diarization_error'] = call['diarization_error']
+        analysis_results.update({
+            'transcript': call['transcript'],
+            'segments': call['segments'],
+            'speaker_stats': call['speaker_stats'],
+            'keywords': [keyword['term'] for keyword in call['keywords']] or analysis_results['keywords'],
+            'has_profanity': call['has_profanity'],
+            'total_profanity_count': call['total_profanity_count'],
+            'profanity_stats': {
+                'клиент': call['profanity_by_speaker'].get('client', 0),
+                'оператор': call['profanity_by_speaker'].get('operator', 0)
+            }
+        })
+    
+    # Эмоции считаются по репликам звонка (при ошибке анализа - по демо-диалогу)
+    analysis_results.update(emotion_summary(call.get('segments') or demo_segments()))
+    
+    # Результаты сохраняются для дашборда /dashboard/<call_id>
+    with open(results_path(call_id), 'w', encoding='utf-8') as f:
+        json.dump(analysis_results, f, ensure_ascii=False)
+    
     return jsonify(analysis_results)
 
-@app.route('/dashboard/<int:call_id>')
+@app.route('/dashboard/<call_id>')
 def show_dashboard(call_id):
     """Отображение дашборда для конкретного звонка"""
     
@@ -85,24 +157,27 @@ def show_dashboard(call_id):
         'нейтрально': 'neutral'
     }
     
-    dominant_emotion = 'гнев'
+    # Сохраненный анализ загруженного звонка; для демо-звонков со страницы
+    # списка эмоции считаются по демо-диалогу
+    saved = {}
+    if call_id.isalnum() and os.path.exists(results_path(call_id)):
+        with open(results_path(call_id), encoding='utf-8') as f:
+            saved = json.load(f)
+    emotions = saved if 'emotion_stats' in saved else emotion_summary(demo_segments())
+    
+    dominant_emotion = emotions['dominant_emotion']
     emotion_class = emotion_class_map.get(dominant_emotion, 'neutral')
     
     call_data = {
         'call_id': call_id,
         'duration': '05:23',
         'date': '2024-03-15',
-        'emotion_stats': {
-            'радость': 15,
-            'нейтрально': 45,
-            'гнев': 25,
-            'грусть': 10,
-            'удивление': 5
-        },
-        'keywords': ['доставка', 'качество', 'проблема', 'возврат', 'деньги', 
-                    'сервис', 'жалоба', 'решение', 'срок', 'товар'],
+        'emotion_stats': emotions['emotion_stats'],
+        'emotion_stats_by_speaker': emotions['emotion_stats_by_speaker'],
+        'keywords': saved.get('keywords', ['доставка', 'качество', 'проблема', 'возврат', 'деньги', 
+                                           'сервис', 'жалоба', 'решение', 'срок', 'товар']),
         'sentiment_score': 0.65,
-        'total_profanity_count': 2,
+        'total_profanity_count': saved.get('total_profanity_count', 2),
         'dominant_emotion': dominant_emotion,
         'dominant_emotion_class': emotion_class,
         'metrics': {
@@ -121,6 +196,29 @@ def show_dashboard(call_id):
                          dashboard_html=dashboard_html,
                          call_data=call_data)
 
+@app.route('/api/models')
+def models_status():
+    """Загруженные модели: время загрузки, память, простой (для выбора размера контейнера)"""
+    from utils.model_registry import get_model_registry
+    return jsonify(get_model_registry().report())
+
+@app.route('/api/keywords/trending')
+def trending_keywords():
+    """Растущие темы за период: ?start=&end= (unix-время), top_n, min_df"""
+    from utils.keyword_index import get_keyword_index
+    start = request.args.get('start', type=float)
+    end = request.args.get('end', type=float)
+    top_n = request.args.get('top_n', 20, type=int)
+    min_df = request.args.get('min_df', 2, type=int)
+    return jsonify(get_keyword_index().trending(start, end, top_n=top_n, min_df=min_df))
+
+@app.route('/api/keywords/<call_id>')
+def call_keywords(call_id):
+    """Отличительные ключевые слова звонка относительно всего корпуса"""
+    from utils.keyword_index import get_keyword_index
+    top_n = request.args.get('top_n', 10, type=int)
+    return jsonify(get_keyword_index().call_keywords(call_id, top_n=top_n))
+
 if __name__ == '__main__':
     print("🚀 Starting CallInsight AI+...")
     print(f"📁 Upload folder: {app.config['UPLOAD_FOLDER']}")
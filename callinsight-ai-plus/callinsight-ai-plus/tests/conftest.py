@@ -0,0 +1,53 @@
+# conftest.py - Общие настройки тестов: пакет utils импортируется из корня проекта
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_audio_cache(tmp_path, monkeypatch):
+    """Декодированное аудио тестов кэшируется во временной папке, а не в data/"""
+    from utils import audio_cache
+    monkeypatch.setattr(audio_cache, "_default_cache",
+                        audio_cache.DecodedAudioCache(str(tmp_path / "audio_cache")))
+
+
+@pytest.fixture
+def make_wav(tmp_path):
+    """Запись WAV во временную папку: make_wav(имя, сэмплы int16 [, частота, ширина сэмпла])"""
+    import wave
+    import numpy as np
+
+    def write(name, samples, sample_rate=16000, sample_width=2):
+        samples = np.asarray(samples)
+        path = str(tmp_path / name)
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(samples.shape[1] if samples.ndim == 2 else 1)
+            wf.setsampwidth(sample_width)
+            wf.setframerate(sample_rate)
+            wf.writeframes(samples.tobytes())
+        return path
+    return write
+
+
+@pytest.fixture
+def stereo_call():
+    """Синтетический звонок АТС: stereo_call(секунды) -> (сэмплы (n, 2), эталонные реплики).
+    Каждый диктор в своем канале, во втором канале - тихое эхо"""
+    import numpy as np
+    from utils.diarization import synthesize_dialogue
+
+    def build(duration_seconds, seed=0):
+        mono, reference = synthesize_dialogue(duration_seconds, seed=seed)
+        channels = np.zeros((len(mono), 2), dtype=np.float32)
+        for speaker, start, end in reference:
+            i0, i1 = int(start * 16000), int(end * 16000)
+            channel = int(speaker[-1]) - 1
+            channels[i0:i1, channel] = mono[i0:i1]
+            channels[i0:i1, 1 - channel] = 0.02 * mono[i0:i1]
+        channels += np.random.default_rng(seed).normal(0, 50, channels.shape)
+        return np.clip(channels, -32768, 32767).astype(np.int16), reference
+    return build
@@ -0,0 +1,140 @@
+import os
+import wave
+
+import numpy as np
+
+from utils.alignment import SpeakerAligner
+from utils.diarization import synthesize_dialogue
+from utils.pipeline import analyze_call
+
+
+def brute_force(turns, start, end):
+    overlaps = {}
+    for turn in turns:
+        overlap = min(end, turn['end']) - max(start, turn['start'])
+        if overlap > 0:
+            overlaps[turn['speaker']] = overlaps.get(turn['speaker'], 0.0) + overlap
+    return max(overlaps.items(), key=lambda x: x[1])[0] if overlaps else 'unknown'
+
+
+def test_long_turn_matches_brute_force():
+    # Одна реплика на весь звонок поверх коротких
+    turns = [{'speaker': 'speaker_3', 'start': 0.0, 'end': 600.0}]
+    turns += [{'speaker': f'speaker_{i % 2 + 1}', 'start': i * 3.0, 'end': i * 3.0 + 2.5} for i in range(200)]
+    aligner = SpeakerAligner(turns)
+    assert len(aligner.long_ids) == 1
+
+    intervals = [(i * 1.7, i * 1.7 + 4.0) for i in range(300)]
+    speakers, coverage = aligner.assign([s for s, _ in intervals], [e for _, e in intervals])
+
+    assert speakers == [brute_force(turns, s, e) for s, e in intervals]
+    assert all(0.0 <= share <= 1.0 for share in coverage)
+
+
+def test_word_level_recomputes_overlap():
+    turns = [
+        {'speaker': 'speaker_1', 'start': 0.0, 'end': 3.0},
+        {'speaker': 'speaker_2', 'start': 3.0, 'end': 10.0}
+    ]
+    words = [
+        {'word': 'да', 'start': 0.5, 'end': 1.0},
+        {'word': 'нет', 'start': 1.0, 'end': 2.0},
+        {'word': 'хорошо', 'start': 3.5, 'end': 4.5}
+    ]
+    segment = {'start': 0.0, 'end': 10.0, 'text': 'да нет хорошо', 'words': words}
+
+    by_segment = SpeakerAligner(turns).align_segments([segment])[0]
+    by_words = SpeakerAligner(turns).align_segments([segment], word_level=True)[0]
+
+    assert by_segment['speaker'] == 'speaker_2' and by_segment['speaker_overlap'] == 0.7
+    assert by_words['speaker'] == 'speaker_1' and by_words['speaker_overlap'] == 0.6
+    assert [w['speaker'] for w in by_words['words']] == ['speaker_1', 'speaker_1', 'speaker_2']
+
+
+def test_analyze_call_assigns_speakers_from_diarization(tmp_path):
+    samples, _ = synthesize_dialogue(30)
+    audio_path = os.path.join(tmp_path, "call.wav")
+    with wave.open(audio_path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(samples.tobytes())
+
+    result = analyze_call(audio_path, engine=True)
+
+    assert result["segments"]
+    assert {segment["speaker"] for segment in result["segments"]} <= {"operator", "client", "unknown"}
+    assert set(result["speaker_stats"]) == {"operator", "client"}
+
+
+def test_analyze_call_splits_stereo_by_default(make_wav, stereo_call):
+    samples, reference = stereo_call(30)
+    path = make_wav("stereo.wav", samples)
+
+    # Без engine: текст демонстрационный, но дикторы определены по каналам
+    result = analyze_call(path)
+
+    operator = sum(end - start for speaker, start, end in reference if speaker == "speaker_1")
+    assert set(result["speaker_stats"]) == {"operator", "client"}
+    assert abs(result["speaker_stats"]["operator"]["total_duration"] - operator) < 1.0
+
+
+def test_analyze_call_reports_diarization_error(make_wav, capsys):
+    class BrokenDiarizer:
+        def diarize(self, audio_path, method="demo"):
+            return {"success": False, "error": "нет модели", "segments": [], "speaker_stats": {}}
+
+    path = make_wav("call.wav", np.zeros(16000, dtype=np.int16))
+
+    result = analyze_call(path, diarizer=BrokenDiarizer())
+
+    assert result["diarization_error"] == "нет модели"
+    assert result["segments"] and {s["speaker"] for s in result["segments"]} == {"unknown"}
+    assert capsys.readouterr().out == ""
+
+
+class FixedBackend:
+    """Движок, распознающий каждый отрезок как одну и ту же фразу (не демо)"""
+
+    def create_stream(self, sample_rate):
+        from utils.transcribe import _DemoStream
+        return _DemoStream(["Доставка заказа задерживается, курьер не приехал."], sample_rate, 5.0)
+
+
+def write_silence(path, seconds):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(b"\0\0" * 16000 * seconds)
+
+
+def test_analyze_call_indexes_keywords(tmp_path):
+    from utils.keyword_index import KeywordIndex
+    from utils.transcribe import AudioTranscriber
+
+    index = KeywordIndex(":memory:", lemmatize=False)
+    audio_path = os.path.join(tmp_path, "call.wav")
+    write_silence(audio_path, 1)
+
+    transcriber = AudioTranscriber(backend=FixedBackend())
+    result = analyze_call(audio_path, engine=True, call_id="call-1",
+                          transcriber=transcriber, keyword_index=index)
+
+    assert result["keywords"] and result["keywords"] == index.call_keywords("call-1")
+    assert index.stats()["calls"] == 1
+
+
+def test_analyze_call_skips_demo_transcript(tmp_path):
+    from utils.keyword_index import KeywordIndex
+
+    index = KeywordIndex(":memory:", lemmatize=False)
+    audio_path = os.path.join(tmp_path, "call.wav")
+    write_silence(audio_path, 1)
+
+    # Демо-текст одинаков для всех звонков и корпус не пополняет -
+    # ни в демо-режиме, ни через демо-движок потокового распознавания
+    for call_id, engine in (("demo", False), ("demo-engine", True)):
+        result = analyze_call(audio_path, engine=engine, call_id=call_id, keyword_index=index)
+        assert result["keywords"] == []
+    assert index.stats()["calls"] == 0
@@ -0,0 +1,68 @@
+import os
+import time
+
+import numpy as np
+
+from utils.audio_cache import DecodedAudioCache, resample_poly
+
+
+def tone(frequency, sample_rate, seconds=1.0):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return 10000 * np.sin(2 * np.pi * frequency * t)
+
+
+def peak_frequency(samples, sample_rate):
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    return np.fft.rfftfreq(len(samples), 1 / sample_rate)[spectrum.argmax()]
+
+
+def test_resample_preserves_tone():
+    resampled = resample_poly(tone(1000, 44100), 16000, 44100)
+
+    assert len(resampled) == 16000
+    assert abs(peak_frequency(resampled, 16000) - 1000) <= 1
+    # Амплитуда в середине (без краевых эффектов фильтра) сохраняется
+    middle = resampled[1000:-1000]
+    assert abs(np.sqrt(np.mean(middle ** 2)) - 10000 / np.sqrt(2)) < 100
+
+
+def test_resample_removes_tone_above_new_nyquist():
+    resampled = resample_poly(tone(10000, 44100), 16000, 44100)
+
+    # Без фильтра тон 10 кГц отразился бы в 6 кГц почти без ослабления
+    assert np.sqrt(np.mean(resampled[1000:-1000] ** 2)) < 0.01 * 10000
+
+
+def test_decoded_once_and_hit_without_hashing(tmp_path, make_wav, monkeypatch):
+    path = make_wav("call.wav", tone(440, 8000).astype(np.int16), sample_rate=8000)
+    cache = DecodedAudioCache(str(tmp_path / "cache"))
+    hashed = []
+    content_hash = cache.content_hash
+    monkeypatch.setattr(cache, "content_hash", lambda p: hashed.append(p) or content_hash(p))
+
+    first = np.array(cache.get(path))
+    second = np.array(cache.get(path))
+
+    assert len(first) == 16000 and np.array_equal(first, second)
+    assert len(hashed) == 1
+
+    # Измененный файл (другой размер) хэшируется и декодируется заново
+    make_wav("call.wav", tone(440, 8000, 2.0).astype(np.int16), sample_rate=8000)
+    assert len(cache.get(path)) == 32000 and len(hashed) == 2
+
+
+def test_eviction_drops_least_recently_used(tmp_path, make_wav):
+    # Каждый файл - 1 секунда = 32000 байт; лимит - два файла
+    cache = DecodedAudioCache(str(tmp_path / "cache"), max_size_mb=70000 / 2 ** 20)
+    paths = [make_wav(f"{i}.wav", tone(300 + 100 * i, 16000).astype(np.int16)) for i in range(3)]
+
+    cache.get(paths[0])
+    cache.get(paths[1])
+    past = time.time() - 100
+    os.utime(cache._cache_path(cache._key(paths[1])), (past, past))
+    cache.get(paths[0])  # свежее использование
+    cache.get(paths[2])
+
+    cached = set(os.listdir(cache.cache_dir))
+    assert cached == {os.path.basename(cache._cache_path(cache._key(p))) for p in (paths[0], paths[2])}
+    assert cache.stats()["files"] == 2
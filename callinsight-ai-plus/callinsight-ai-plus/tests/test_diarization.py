@@ -0,0 +1,68 @@
+# test_diarization.py - Диаризация на синтетическом звонке
+import pytest
+
+from utils.diarization import MAX_REAL_TIME_FACTOR, SimpleDiarizer, benchmark, synthesize_dialogue
+
+
+def test_engine_speaker_accuracy_on_synthetic_call():
+    # Два синтетических голоса с паузами; доля речи, отнесенная к верному диктору
+    report = benchmark(duration_seconds=120)
+    assert report["segments"] > 0
+    assert report["accuracy"] >= 0.9
+
+
+def test_engine_real_time_factor_within_budget():
+    # Десятая часть часового звонка; первый прогон (импорт sklearn, прогрев) не замеряется
+    benchmark(duration_seconds=30)
+    report = benchmark(duration_seconds=360)
+
+    assert report["real_time_factor"] <= MAX_REAL_TIME_FACTOR, report
+    assert report["within_budget"]
+
+
+def test_diarize_defaults_to_demo_segments_with_text(tmp_path):
+    audio_path = tmp_path / "call.wav"
+    audio_path.write_bytes(b"")
+
+    result = SimpleDiarizer().diarize(str(audio_path))
+
+    assert result["success"]
+    assert all("text" in segment for segment in result["segments"])
+
+
+def test_diarize_missing_file():
+    result = SimpleDiarizer().diarize("нет/такого/файла.wav", method="engine")
+    assert not result["success"]
+
+
+def test_stereo_call_split_by_channel(make_wav, stereo_call):
+    samples, reference = stereo_call(60)
+    path = make_wav("stereo.wav", samples)
+
+    result = SimpleDiarizer().diarize(path, method="engine")
+
+    assert result["success"] and result["method"] == "channel_split"
+    turns = [(s["speaker"], s["start"], s["end"]) for s in result["segments"]]
+    assert len(turns) == len(reference)
+    for (speaker, start, end), (ref_speaker, ref_start, ref_end) in zip(turns, reference):
+        assert speaker == ref_speaker
+        assert abs(start - ref_start) < 0.15 and abs(end - ref_end) < 0.15
+
+    for speaker in ("speaker_1", "speaker_2"):
+        ref_turns = [end - start for ref_speaker, start, end in reference if ref_speaker == speaker]
+        stats = result["speaker_stats"][speaker]
+        assert stats["segment_count"] == len(ref_turns)
+        assert abs(stats["total_duration"] - sum(ref_turns)) < 0.15 * len(ref_turns)
+        assert stats["avg_duration"] == round(stats["total_duration"] / stats["segment_count"], 2)
+
+
+def test_mono_call_falls_back_to_clustering(make_wav, monkeypatch):
+    samples, _ = synthesize_dialogue(30)
+    path = make_wav("mono.wav", samples)
+    diarizer = SimpleDiarizer()
+    monkeypatch.setattr(diarizer, "diarize_stereo", lambda *args: pytest.fail("стерео-путь для моно"))
+
+    result = diarizer.diarize(path, method="engine")
+
+    assert result["success"] and "method" not in result
+    assert set(result["speaker_stats"]) == {"speaker_1", "speaker_2"}
@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from utils.emotion import EmotionAnalyzer
+from utils.inference_cache import InferenceCache
+from utils.long_text import LongTextClassifier
+from utils.model_registry import ModelRegistry
+from utils.onnx_backend import build_test_model
+
+LABELS = ("no_emotion", "joy", "sadness", "surprise", "fear", "anger")
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    return build_test_model(str(tmp_path_factory.mktemp("emotion")), LABELS)
+
+
+def make_analyzer(model_dir, cache=None):
+    analyzer = EmotionAnalyzer(use_cache=False)
+    analyzer.model = ModelRegistry().handle("text-classification", model_dir, top_k=None)
+    analyzer.long_text = LongTextClassifier(analyzer.model)
+    analyzer.cache = cache
+    return analyzer
+
+
+def test_empty_segments_do_not_weigh_in_stats(model_dir):
+    analyzer = make_analyzer(model_dir)
+    segments = [
+        {"text": "Спасибо, всё отлично!", "start": 0.0, "end": 5.0, "speaker": "client"},
+        {"text": "", "start": 5.0, "end": 60.0, "speaker": "client"}
+    ]
+
+    with_pause = analyzer.analyze_emotions(segments)
+    alone = analyzer.analyze_emotions(segments[:1])
+
+    assert with_pause["emotion_stats"] == alone["emotion_stats"]
+    assert with_pause["segments"][1] == {"emotion_eng": "no_emotion", "emotion_ru": "нейтрально", "score": 1.0}
+    assert analyzer.analyze_emotions(segments[1:])["dominant_emotion"] == "нейтрально"
+
+
+def test_probabilities_matrix_and_json_stats(model_dir):
+    result = make_analyzer(model_dir).analyze_emotions([
+        {"text": "Где мой заказ?", "duration": 3.0},
+        {"text": "", "duration": 1.0}
+    ])
+
+    probabilities = result.pop("probabilities")
+    assert isinstance(probabilities, np.ndarray) and probabilities.shape == (2, len(LABELS))
+    assert probabilities[1].tolist() == [1.0, 0, 0, 0, 0, 0]
+    # Остальные поля (статистика для дашборда) сериализуются в JSON как есть
+    json.dumps(result)
+
+
+def test_batch_size_reaches_model_with_cache(model_dir):
+    analyzer = make_analyzer(model_dir, cache=InferenceCache(db_path=None))
+    calls = []
+    classify = analyzer.long_text.classify
+
+    def spy(texts, batch_size=None):
+        calls.append(batch_size)
+        return classify(texts, batch_size)
+
+    analyzer.long_text.classify = spy
+    analyzer.analyze_emotions([{"text": "Первая реплика"}, {"text": "Вторая реплика"}], batch_size=1)
+
+    assert calls == [1]
@@ -0,0 +1,11 @@
+import pytest
+
+from utils.import_benchmark import IMPORT_BUDGETS, check_imports
+
+
+@pytest.mark.parametrize("module_name", sorted(IMPORT_BUDGETS))
+def test_import_stays_light(module_name):
+    passed, (result,) = check_imports({module_name: IMPORT_BUDGETS[module_name]})
+
+    assert result["ok"], f"{module_name} не импортируется"
+    assert passed, f"{module_name} тянет при импорте: {', '.join(result['violations'])}"
@@ -0,0 +1,47 @@
+import os
+
+from huggingface_hub import constants
+
+from utils import inference_cache
+from utils.inference_cache import config_revision, model_revision
+from utils.model_registry import ModelRegistry
+
+
+def test_hub_revision_from_local_cache(tmp_path, monkeypatch):
+    commit = "0123456789abcdef0123456789abcdef01234567"
+    repo = tmp_path / "models--org--tiny-model"
+    (repo / "refs").mkdir(parents=True)
+    (repo / "refs" / "main").write_text(commit)
+    (repo / "snapshots" / commit).mkdir(parents=True)
+    (repo / "snapshots" / commit / "config.json").write_text("{}")
+    monkeypatch.setattr(constants, "HF_HUB_CACHE", str(tmp_path))
+
+    assert config_revision("org/tiny-model") == commit
+    assert config_revision("org/not-downloaded") is None
+
+
+def test_handle_revision_does_not_load_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(inference_cache, "_revisions", {})
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "config.json").write_text("{}")
+    registry = ModelRegistry()
+
+    torch_handle = registry.handle("text-classification", str(model_dir), top_k=None)
+    onnx_handle = registry.handle("text-classification", str(model_dir), backend="onnx")
+    revision = model_revision(torch_handle)
+
+    assert revision.startswith(os.path.abspath(model_dir))
+    assert model_revision(onnx_handle) == f"{revision}:onnx"
+    assert registry.entries == {}
+
+    # Ревизия запоминается: файл больше не читается
+    (model_dir / "config.json").unlink()
+    assert model_revision(torch_handle) == revision
+
+
+def test_default_db_is_inside_package():
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    assert inference_cache.INFERENCE_CACHE_PATH == os.path.join(package_root, "data", "inference_cache.db")
+    assert inference_cache.InferenceCache.__init__.__defaults__[0] == inference_cache.INFERENCE_CACHE_PATH
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from utils.embeddings import LabelPrototypes
+from utils.intent import IntentDetector, MLIntentDetector
+
+TEXTS = [
+    "Здравствуйте, у меня не работает интернет, помогите разобраться",
+    "Хочу заказать доставка завтра, сколько стоит? Оплата картой.",
+    "ЖАЛОБА: товар сломался, требую возврат, это кошмар кошмар кошмар",
+    "Где мой заказ? Хочу отследить статус, номер заказа 12345",
+    "Передумал, хочу отменить и вернуть деньги",
+    "Интересуюсь сотрудничеством: оптом со скидкой, договор",
+    "",
+    "   ",
+    "как как как где когда",
+    "Спасибо, всё хорошо, до свидания",
+    "недоволен недоволен, проблема не решена, что делать?"
+]
+
+
+@pytest.fixture
+def detector():
+    return IntentDetector(use_snapshot=False)
+
+
+def test_batch_matches_combined(detector):
+    batch = detector.detect_intent_batch(TEXTS)
+
+    assert batch == [detector.detect_intent_combined(text) for text in TEXTS]
+    assert {result["main_intent"] for result in batch} >= {"жалоба", "заказ", "статус", "отмена"}
+
+
+def test_batch_follows_changed_dictionaries(detector):
+    detector.detect_intent_batch(TEXTS)
+    detector.intent_keywords["статус"].append("трекинг")
+    detector.intent_patterns["отмена"].append(r"расторгнуть")
+    texts = ["трекинг трекинг посылки", "хочу расторгнуть договор"]
+
+    assert detector.detect_intent_batch(texts) == [detector.detect_intent_combined(text) for text in texts]
+
+
+def test_empty_batch(detector):
+    assert detector.detect_intent_batch([]) == []
+
+
+def test_prototypes_default_inside_package():
+    prototype_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "prototypes")
+
+    assert MLIntentDetector(use_ml=False, mode="embedding").prototype_dir == prototype_dir
+    assert LabelPrototypes(None, {}).cache_dir == prototype_dir
+
+
+def test_keywords_match_any_word_form(detector):
+    # "доставку", "оплатой", "заказа" - формы ключевых слов "доставка", "оплата", "заказ"
+    text = "Подскажите по заказу: доставку оплатой картой можно?"
+
+    assert detector.detect_intent_keywords(text)["заказ"] == round(3 * 0.15, 3)
+    assert detector.detect_intent_batch([text]) == [detector.detect_intent_combined(text)]
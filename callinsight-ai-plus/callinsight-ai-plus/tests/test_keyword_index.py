@@ -0,0 +1,61 @@
+import os
+
+from utils.keyword_index import KEYWORD_INDEX_PATH, SECONDS_PER_DAY, KeywordIndex
+
+# Начало недели: свернутые корзины начинаются с дней, кратных 7
+DAY0 = 2858 * 7 * SECONDS_PER_DAY
+
+
+def make_index():
+    index = KeywordIndex(":memory:", lemmatize=False, daily_retention_days=7)
+    for day in range(28):
+        topic = "доставка" if day < 14 else "тариф"
+        index.add_call(f"call-{day}", f"{topic} заказ номер оплата", DAY0 + day * SECONDS_PER_DAY + 3600)
+    index.compact()
+    return index
+
+
+def test_partial_week_counts_calls_of_whole_buckets():
+    index = make_index()
+    # Первые недели уже свернуты; период задевает неделю [0, 7) частично
+    trending = index.trending(start=DAY0 + 3 * SECONDS_PER_DAY, end=DAY0 + 5 * SECONDS_PER_DAY, min_df=1)
+
+    by_term = {item["term"]: item for item in trending}
+    assert by_term["доставка"]["df"] == 7
+    assert all(item["share"] <= 1.0 for item in trending)
+    assert "тариф" not in by_term
+
+
+def test_daily_buckets_stay_exact():
+    index = make_index()
+    trending = index.trending(start=DAY0 + 25 * SECONDS_PER_DAY, end=DAY0 + 26 * SECONDS_PER_DAY, min_df=1)
+
+    assert {item["term"]: item["df"] for item in trending}["тариф"] == 2
+
+
+def test_range_across_compacted_weeks():
+    index = make_index()
+    # Период задевает две свернутые недели [0, 7) и [7, 14) - обе учитываются целиком
+    trending = index.trending(start=DAY0 + 5 * SECONDS_PER_DAY, end=DAY0 + 8 * SECONDS_PER_DAY, min_df=1)
+
+    by_term = {item["term"]: item for item in trending}
+    assert by_term["доставка"]["df"] == 14
+    assert by_term["заказ"]["share"] == 1.0
+    assert "тариф" not in by_term
+
+
+def test_range_across_weekly_and_daily_buckets():
+    index = make_index()
+    # Неделя [7, 14) свернута, дни 14 и 15 - еще по дням: звонков в периоде 7 + 2
+    trending = index.trending(start=DAY0 + 10 * SECONDS_PER_DAY, end=DAY0 + 15 * SECONDS_PER_DAY, min_df=1)
+
+    by_term = {item["term"]: item for item in trending}
+    assert by_term["доставка"]["df"] == 7
+    assert by_term["тариф"]["df"] == 2
+    assert by_term["заказ"]["df"] == 9 and by_term["заказ"]["share"] == 1.0
+    assert all(item["share"] <= 1.0 for item in trending)
+
+
+def test_default_path_is_anchored_to_package():
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert KEYWORD_INDEX_PATH == os.path.join(package_root, "data", "keyword_index.db")
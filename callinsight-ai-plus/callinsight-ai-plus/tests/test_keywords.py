@@ -0,0 +1,100 @@
+import pytest
+
+from utils import keywords
+from utils.keywords import KeywordExtractorRU, group_segments
+
+SENTENCES = [
+    "Клиент жалуется на задержку доставки заказа уже третью неделю.",
+    "Оператор предложил оформить возврат денег на банковскую карту.",
+    "Курьер не приехал в назначенное время и не отвечает на звонки.",
+    "Мобильное приложение не принимает оплату по новому тарифу."
+]
+
+TEXTS = [
+    " ".join(SENTENCES),
+    SENTENCES[0] + " Доставку заказов снова перенесли, доставка заказа сорвана.",
+    SENTENCES[2] + " " + SENTENCES[3],
+    "коротко",
+    ""
+]
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return KeywordExtractorRU()
+
+
+def test_scored_is_ranked_and_unique(extractor):
+    for text in TEXTS[:3]:
+        scored = extractor.extract_keywords_scored(text)
+        phrases = [kw["phrase"] for kw in scored]
+
+        assert scored and len(scored) <= extractor.top
+        assert [kw["score"] for kw in scored] == sorted(kw["score"] for kw in scored)
+        # Формы одной фразы после нормализации - одна запись
+        assert len(set(phrases)) == len(phrases)
+        assert extractor.extract_keywords(text) == phrases
+
+
+def test_short_text_has_no_keywords(extractor):
+    assert extractor.extract_keywords_scored(TEXTS[3]) == []
+    assert extractor.extract_keywords(TEXTS[4]) == []
+
+
+def test_batch_matches_sequential(extractor):
+    sequential = [extractor.extract_keywords_scored(text) for text in TEXTS]
+
+    assert extractor.extract_keywords_batch(TEXTS, max_workers=2) == sequential
+    assert extractor.extract_keywords_batch(TEXTS, max_workers=1) == sequential
+
+
+def test_small_batch_stays_in_process(extractor, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("пул процессов для маленького пакета")
+
+    monkeypatch.setattr(keywords, "ProcessPoolExecutor", no_pool)
+    assert len(extractor.extract_keywords_batch(TEXTS)) == len(TEXTS)
+
+
+def test_group_by_speaker_keeps_first_appearance():
+    segments = [
+        {"start": 0.0, "end": 2.0, "speaker": "operator", "text": "Здравствуйте"},
+        {"start": 2.0, "end": 4.0, "speaker": "client", "text": "Добрый день"},
+        {"start": 4.0, "end": 6.0, "speaker": "operator", "text": " чем помочь? "},
+        {"start": 6.0, "end": 8.0, "speaker": "client", "text": "   "},
+        {"start": 8.0, "end": 9.0, "text": "шум"}
+    ]
+
+    assert group_segments(segments) == [
+        {"speaker": "operator", "text": "Здравствуйте чем помочь?"},
+        {"speaker": "client", "text": "Добрый день"},
+        {"speaker": "unknown", "text": "шум"}
+    ]
+
+
+def test_group_by_window_is_sorted_by_time():
+    segments = [
+        {"start": 400.0, "text": "третье"},
+        {"start": 10.0, "text": "первое"},
+        {"start": 299.0, "text": "второе"}
+    ]
+
+    assert group_segments(segments, by="window", window_minutes=5) == [
+        {"start": 0, "end": 300, "text": "первое второе"},
+        {"start": 300, "end": 600, "text": "третье"}
+    ]
+    with pytest.raises(ValueError):
+        group_segments(segments, by="topic")
+
+
+def test_segments_get_keywords_per_group(extractor):
+    segments = [
+        {"start": 0.0, "end": 20.0, "speaker": "client", "text": SENTENCES[0]},
+        {"start": 20.0, "end": 40.0, "speaker": "operator", "text": SENTENCES[1]}
+    ]
+
+    groups = extractor.extract_keywords_segments(segments)
+    assert [group["speaker"] for group in groups] == ["client", "operator"]
+    assert [group["keywords"] for group in groups] == [
+        extractor.extract_keywords_scored(segment["text"]) for segment in segments
+    ]
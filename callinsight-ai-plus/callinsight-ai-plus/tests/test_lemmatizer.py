@@ -0,0 +1,84 @@
+import sys
+import types
+import threading
+
+import pytest
+
+from utils import lemmatizer
+from utils.lemmatizer import Lemmatizer, get_lemmatizer, get_morph_analyzer
+
+
+class CountingMorph:
+    """Разбор-заглушка: нормальная форма - слово без последней буквы"""
+
+    def __init__(self):
+        self.parsed = []
+
+    def parse(self, word):
+        self.parsed.append(word)
+        return [types.SimpleNamespace(normal_form=word[:-1])]
+
+
+@pytest.fixture
+def morph(monkeypatch):
+    morph = CountingMorph()
+    monkeypatch.setattr(lemmatizer, "get_morph_analyzer", lambda: morph)
+    return morph
+
+
+def test_bulk_lemmatize_parses_each_word_once(morph):
+    lemmas = Lemmatizer().lemmatize(["Доставку", "доставку", "ДОСТАВКУ", "заказа"])
+
+    assert lemmas == ["доставк", "доставк", "доставк", "заказ"]
+    assert morph.parsed == ["доставку", "заказа"]
+
+
+def test_cache_is_bounded_lru(morph):
+    cached = Lemmatizer(cache_size=3)
+    cached.lemmatize(["раз", "два", "три"])
+    cached.lemma("раз")  # свежее использование
+    cached.lemmatize(["четыре", "пять"])
+
+    assert list(cached.cache) == ["раз", "четыре", "пять"]
+    assert cached.stats() == {"cache_entries": 3, "hits": 1, "misses": 5, "hit_rate": 0.167}
+
+    morph.parsed.clear()
+    cached.lemmatize(["раз", "два"])
+    assert morph.parsed == ["два"]
+
+
+def test_preload_fills_cache_without_parsing(morph):
+    cached = Lemmatizer(cache_size=2)
+    cached.preload({"доставку": "доставка", "заказа": "заказ", "цены": "цена"})
+
+    assert cached.lemmatize(["заказа", "цены"]) == ["заказ", "цена"]
+    assert morph.parsed == [] and len(cached.cache) == 2
+
+
+def test_single_morph_analyzer_per_process(monkeypatch):
+    created = []
+
+    class SlowMorph:
+        def __init__(self):
+            created.append(self)
+
+    monkeypatch.setattr(lemmatizer, "_morph_analyzer", None)
+    monkeypatch.setitem(sys.modules, "pymorphy2", types.SimpleNamespace(MorphAnalyzer=SlowMorph))
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_morph_analyzer())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1 and all(result is created[0] for result in results)
+
+
+def test_analyzers_share_one_lemmatizer():
+    from utils.intent import IntentDetector
+    from utils.lexicon import LexiconMatcher
+
+    assert get_lemmatizer() is get_lemmatizer()
+    assert LexiconMatcher({"a": ["доставка"]}, lemmatize=True).lemmatizer is get_lemmatizer()
+    assert IntentDetector(use_snapshot=False).lemmatizer is get_lemmatizer()
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from utils import lexicon_snapshot, profanity
+from utils.lexicon_snapshot import SNAPSHOT_PATH, LexiconSnapshotStore, build_snapshot, read_snapshot
+from utils.profanity import ProfanityFilter
+
+TEXT = "Это новоеслово в словаре"
+
+
+@pytest.fixture
+def dictionary(tmp_path):
+    path = tmp_path / "dict.txt"
+    path.write_text("новоеслово\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def use_store(monkeypatch):
+    def install(path):
+        store = LexiconSnapshotStore(path, check_interval=0)
+        monkeypatch.setattr(lexicon_snapshot, "_default_store", store)
+        return store
+    return install
+
+
+def test_filter_uses_snapshot(tmp_path, dictionary, use_store):
+    path = str(tmp_path / "snapshot.bin")
+    build_snapshot(path, dictionary)
+    use_store(path)
+
+    profanity_filter = ProfanityFilter()
+
+    assert profanity_filter._snapshot.sync()
+    assert profanity_filter.contains_profanity(TEXT) == (True, ["новоеслово"])
+
+
+def test_snapshot_of_changed_dictionary_is_ignored(tmp_path, dictionary, use_store, caplog):
+    path = str(tmp_path / "snapshot.bin")
+    build_snapshot(path, dictionary)
+    with open(dictionary, "a", encoding="utf-8") as f:
+        f.write("другоеслово\n")
+
+    store = use_store(path)
+
+    assert store.current() is None
+    assert "собран из других исходников" in store.load_error
+    assert store.load_error in caplog.text
+
+
+def test_filter_without_snapshot_loads_default_dictionary(tmp_path, dictionary, use_store, monkeypatch):
+    monkeypatch.setattr(profanity, "PROFANITY_DICTIONARY", dictionary)
+    use_store(str(tmp_path / "missing.bin"))
+
+    profanity_filter = ProfanityFilter()
+
+    assert not profanity_filter._snapshot.sync()
+    assert profanity_filter.contains_profanity(TEXT) == (True, ["новоеслово"])
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="права файлов POSIX")
+def test_writable_snapshot_is_refused(tmp_path, dictionary):
+    path = str(tmp_path / "snapshot.bin")
+    build_snapshot(path, dictionary)
+    os.chmod(path, 0o666)
+
+    with pytest.raises(ValueError, match="на запись"):
+        read_snapshot(path)
+
+
+def test_snapshot_stores_pattern_source(tmp_path, dictionary):
+    path = str(tmp_path / "snapshot.bin")
+    build_snapshot(path, dictionary)
+
+    # Выражения компилируются при загрузке, в снимке - только их текст
+    data = read_snapshot(path).data
+    assert isinstance(data["profanity"]["pattern"], str)
+    assert all(isinstance(pattern, str) for patterns in data["ner"]["source"].values() for pattern in patterns)
+
+
+def test_default_path_is_anchored_to_package():
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert SNAPSHOT_PATH == os.path.join(package_root, "data", "lexicon_snapshot.bin")
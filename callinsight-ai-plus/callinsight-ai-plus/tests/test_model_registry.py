@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from utils.long_text import LongTextClassifier
+from utils.model_registry import ModelRegistry
+from utils.onnx_backend import build_test_model
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    return build_test_model(str(tmp_path_factory.mktemp("model")))
+
+
+def hits(registry):
+    return [model["hits"] for model in registry.report()["models"]]
+
+
+def test_attribute_access_is_not_a_hit(model_dir):
+    registry = ModelRegistry()
+    handle = registry.handle("text-classification", model_dir, top_k=None)
+
+    handle.tokenizer, handle.model.config
+    assert hits(registry) == [0]
+
+    handle.get()
+    handle("Спасибо!")
+    assert hits(registry) == [2]
+
+
+def test_one_hit_per_long_text_batch(model_dir):
+    registry = ModelRegistry()
+    classifier = LongTextClassifier(registry.handle("text-classification", model_dir, top_k=None), batch_size=2)
+
+    classifier.predict_proba(["Первый текст", "Второй текст", "Третий текст " * 300])
+
+    assert hits(registry) == [1]
+
+
+def test_budget_overrun_is_reported(model_dir, tmp_path, capsys):
+    # Бюджет меньше одной модели: вытеснять нечего, превышение видно в report()
+    registry = ModelRegistry(memory_budget_mb=0.01)
+    registry.get("text-classification", model_dir, top_k=None)
+
+    report = registry.report()
+    assert report["over_budget"] and report["budget_overruns"] == 1
+    assert capsys.readouterr().out == ""
+
+    second = build_test_model(str(tmp_path / "second"), seed=1)
+    registry.get("text-classification", second, top_k=None)
+    report = registry.report()
+    # Первая модель вытеснена, вторая одна все равно больше бюджета
+    assert report["evictions"] == 1 and len(report["models"]) == 1
+    assert report["over_budget"] and report["budget_overruns"] == 2
+
+    assert not ModelRegistry(memory_budget_mb=100).report()["over_budget"]
@@ -0,0 +1,85 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+
+from transformers import pipeline
+
+from utils import onnx_backend
+from utils.onnx_backend import (SAMPLE_TEXTS, OnnxClassifier, OnnxTokenizer, OnnxZeroShotClassifier,
+                                build_test_model, check_parity, export_onnx)
+
+CANDIDATE_LABELS = ["возврат", "жалоба", "благодарность"]
+
+
+def export_test_model(root, labels):
+    model_dir = build_test_model(os.path.join(root, "model"), labels)
+    return model_dir, export_onnx(model_dir, os.path.join(root, "onnx"))
+
+
+@pytest.fixture(scope="module")
+def classifier_dirs(tmp_path_factory):
+    return export_test_model(str(tmp_path_factory.mktemp("classifier")), ("NEGATIVE", "NEUTRAL", "POSITIVE"))
+
+
+@pytest.mark.parametrize("quantized, atol", [(False, 1e-4), (True, 0.05)])
+def test_classifier_parity(classifier_dirs, quantized, atol):
+    report = check_parity(*classifier_dirs, atol=atol, quantized=quantized)
+
+    assert report["passed"], report
+
+
+# Порядок меток NLI-моделей разный: противоречие первым или последним
+@pytest.mark.parametrize("labels", [
+    ("contradiction", "neutral", "entailment"),
+    ("entailment", "neutral", "contradiction")
+])
+@pytest.mark.parametrize("multi_label", [False, True])
+def test_zero_shot_parity(tmp_path, labels, multi_label):
+    model_dir, onnx_dir = export_test_model(str(tmp_path), labels)
+    reference = pipeline("zero-shot-classification", model=model_dir)
+    classifier = OnnxZeroShotClassifier(onnx_dir, quantized=False)
+
+    for text in SAMPLE_TEXTS[:3]:
+        expected = reference(text, candidate_labels=CANDIDATE_LABELS, multi_label=multi_label)
+        result = classifier(text, candidate_labels=CANDIDATE_LABELS, multi_label=multi_label)
+
+        expected_scores = dict(zip(expected["labels"], expected["scores"]))
+        for label, score in zip(result["labels"], result["scores"]):
+            assert score == pytest.approx(expected_scores[label], abs=1e-4)
+
+
+def test_tokenizer_truncation_is_per_call_and_thread_safe(classifier_dirs):
+    tokenizer = OnnxTokenizer(classifier_dirs[1])
+    texts = SAMPLE_TEXTS * 4
+    settings = [{}, {"truncation": True, "max_length": 8}, {"truncation": True, "max_length": 16, "stride": 2,
+                                                             "return_overflowing_tokens": True}]
+    expected = [tokenizer(texts, **kwargs) for kwargs in settings]
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(lambda i: tokenizer(texts, **settings[i % 3]), range(60)))
+
+    assert all(result == expected[i % 3] for i, result in enumerate(results))
+    assert max(len(ids) for ids in expected[0]["input_ids"]) > 8
+    assert max(len(ids) for ids in expected[1]["input_ids"]) == 8
+
+
+def test_from_model_name_requires_build_step(classifier_dirs, tmp_path, monkeypatch):
+    monkeypatch.setattr(onnx_backend, "export_onnx", lambda *args, **kwargs: pytest.fail("экспорт во время работы"))
+
+    with pytest.raises(FileNotFoundError, match="--export"):
+        OnnxClassifier.from_model_name("org/not-exported", onnx_root=str(tmp_path))
+
+    # Уже экспортированная модель загружается, шаг сборки ее не экспортирует повторно
+    os.symlink(classifier_dirs[1], tmp_path / "org__tiny")
+    assert OnnxClassifier.from_model_name("org/tiny", onnx_root=str(tmp_path)).config.num_labels == 3
+    assert onnx_backend.export_models(["org/tiny"], onnx_root=str(tmp_path)) == {"org/tiny": str(tmp_path / "org__tiny")}
+
+
+def test_onnx_root_inside_package():
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert onnx_backend.ONNX_ROOT == os.path.join(package_root, "data", "onnx")
@@ -0,0 +1,46 @@
+from utils.profanity import ProfanityFilter
+
+
+def make_filter(tmp_path, stems):
+    path = tmp_path / "dict.txt"
+    path.write_text("\n".join(stems), encoding="utf-8")
+    return ProfanityFilter(str(path), use_snapshot=False)
+
+
+def test_word_matching_several_stems_counts_once(tmp_path):
+    profanity_filter = make_filter(tmp_path, ["бля", "блять", "херн"])
+    text = "Блять, это херня какая-то. Блять!"
+
+    found, words = profanity_filter.contains_profanity(text)
+
+    # Прежний поиск по выражению на основу давал ['Блять', 'Блять', 'Блять', 'Блять', 'херня']
+    assert found and words == ["Блять", "херня", "Блять"]
+    assert profanity_filter.mask_profanity(text) == "*****, это ***** какая-то. *****!"
+
+
+def test_conversation_counts_occurrences(tmp_path):
+    profanity_filter = make_filter(tmp_path, ["бля", "блять", "херн"])
+    dialog = [
+        {"speaker": "client", "text": "Блять, опять херня с доставкой"},
+        {"speaker": "operator", "text": "Понимаю, сейчас проверю"}
+    ]
+
+    stats = profanity_filter.analyze_conversation(dialog)
+
+    assert stats["total_profanity_count"] == 2
+    assert stats["profanity_by_speaker"] == {"operator": 0, "client": 2}
+    assert stats["masked_dialog"][0]["profanity_spans"] == [
+        {"word": "Блять", "start": 0, "end": 5},
+        {"word": "херня", "start": 13, "end": 18}
+    ]
+
+
+def test_single_pass_matches_per_stem_masking(tmp_path):
+    profanity_filter = make_filter(tmp_path, ["бля", "херн", "дерьм", "сволоч"])
+    text = "Сволочи! Дерьмовый сервис, херня полная, бляха"
+
+    masked = text
+    for pattern in profanity_filter.patterns:
+        masked = pattern.sub(lambda match: "*" * len(match.group()), masked)
+
+    assert profanity_filter.mask_profanity(text) == masked
@@ -0,0 +1,222 @@
+import numpy as np
+import pytest
+
+from utils.lexicon import LexiconMatcher
+from utils.sentiment import AdvancedSentimentAnalyzer, SentimentAnalyzer, SentimentTimeline
+
+TEXTS = [
+    "Спасибо, всё отлично, очень доволен!",
+    "",
+    "Товар сломался, это ужасно.",
+    "ок",
+    "Здравствуйте, у меня не работает интернет уже третий день, помогите разобраться.",
+    "Доставка вовремя."
+]
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from utils.onnx_backend import build_test_model
+    return build_test_model(str(tmp_path_factory.mktemp("sentiment")))
+
+
+@pytest.fixture
+def rules_analyzer():
+    analyzer = SentimentAnalyzer(use_cache=False, use_snapshot=False)
+    analyzer._model_loaded = False
+    return analyzer
+
+
+def test_transformers_batch_matches_single_texts(model_dir):
+    analyzer = SentimentAnalyzer(model_name=model_dir, use_cache=False, use_snapshot=False)
+
+    batch = analyzer.analyze_sentiment_transformers_batch(TEXTS, batch_size=2)
+
+    assert batch == [analyzer.analyze_sentiment_transformers(text) for text in TEXTS]
+    assert batch[1] == batch[3] == {"label": "NEUTRAL", "score": 0.5, "sentiment_ru": "нейтрально"}
+    assert analyzer.analyze_sentiment_transformers_batch(TEXTS, batch_size=16) == batch
+
+
+def test_transformers_batch_falls_back_to_rules(model_dir, rules_analyzer, monkeypatch):
+    analyzer = SentimentAnalyzer(model_name=model_dir, use_cache=False, use_snapshot=False)
+
+    def broken(texts, batch_size=None):
+        raise RuntimeError("нет памяти")
+    monkeypatch.setattr(analyzer, "_model_batch", broken)
+
+    assert analyzer.analyze_sentiment_transformers_batch(TEXTS) == rules_analyzer.analyze_sentiment_rules_batch(TEXTS)
+
+
+def test_rules_batch_matches_single_texts(rules_analyzer):
+    batch = rules_analyzer.analyze_sentiment_batch(TEXTS)
+
+    assert batch == [rules_analyzer.analyze_sentiment_rules(text) for text in TEXTS]
+    assert [result["label"] for result in batch[:3]] == ["POSITIVE", "NEUTRAL", "NEGATIVE"]
+
+
+def test_timeline_scores_all_segments_in_one_batch(rules_analyzer, monkeypatch):
+    calls = []
+    batch = rules_analyzer.analyze_sentiment_batch
+    monkeypatch.setattr(rules_analyzer, "analyze_sentiment_batch",
+                        lambda texts, batch_size=None: calls.append(list(texts)) or batch(texts))
+    segments = [{"start": float(i), "text": text, "speaker": "client"} for i, text in enumerate(TEXTS)]
+
+    timeline = rules_analyzer.analyze_sentiment_timeline(segments)
+
+    assert calls == [[text for text in TEXTS if text.strip()]]
+    assert [point["time"] for point in timeline] == [0.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_lexicon_negation_flips_polarity():
+    matcher = LexiconMatcher({"positive": ["хорошо"], "negative": ["плохо"]})
+    flip = {"positive": "negative", "negative": "positive"}
+
+    assert matcher.count("Всё хорошо", flip)[0] == {"positive": 1}
+    assert matcher.count("Совсем не хорошо", flip)[0] == {"negative": 1}
+    assert matcher.count("Не очень плохо", flip)[0] == {"positive": 1}
+    # Отрицание дальше negation_window слов не действует
+    assert matcher.count("Не то чтобы хорошо", flip)[0] == {"positive": 1}
+
+
+def test_lexicon_multi_word_phrases_and_word_boundaries():
+    matcher = LexiconMatcher({"negative": ["не работает", "плохо"], "positive": ["хорошо"]})
+
+    hits = matcher.find("Интернет НЕ работает, и это нехорошо. Плохо!")
+
+    assert [(hit["phrase"], hit["start"], hit["end"]) for hit in hits] == [
+        ("не работает", 9, 20), ("плохо", 38, 43)
+    ]
+    # Отрицание внутри самой фразы не переворачивает ее
+    assert not hits[0]["negated"]
+
+
+def test_lexicon_longest_phrase_wins():
+    matcher = LexiconMatcher({"aspect": ["срок"], "problem": ["срок доставки"]})
+
+    hits = matcher.find("Срок доставки сорван, срок истек")
+
+    assert [(hit["category"], hit["token_start"], hit["token_end"]) for hit in hits] == [
+        ("problem", 0, 2), ("aspect", 3, 4)
+    ]
+
+
+def test_rules_match_inflected_forms(rules_analyzer):
+    result = rules_analyzer.analyze_sentiment_rules("Клиентка недовольна, ноутбук сломался, проблемы с зарядкой")
+
+    assert result["neg_count"] == 3 and result["pos_count"] == 0
+    assert [hit["phrase"] for hit in result["hits"]] == ["недоволен", "сломался", "проблема"]
+    assert rules_analyzer.analyze_sentiment_rules("Она была довольна")["pos_count"] == 1
+
+
+@pytest.fixture
+def aspect_analyzer(monkeypatch):
+    """Аспектный анализатор, записывающий пакеты контекстов; оценка - 0.2 для "плохо", иначе 0.8"""
+    analyzer = AdvancedSentimentAnalyzer(use_cache=False, use_snapshot=False)
+    analyzer.batches = []
+
+    def score(texts, batch_size=None):
+        analyzer.batches.append(list(texts))
+        return [{"score": 0.2 if "плохо" in text else 0.8, "sentiment_ru": ""} for text in texts]
+    monkeypatch.setattr(analyzer, "analyze_sentiment_batch", score)
+    return analyzer
+
+
+def test_aspect_overlapping_windows_merge(aspect_analyzer):
+    text = "Доставка плохо, курьер опоздал " + "и " * 20 + "доставку потом все же привезли"
+
+    result = aspect_analyzer.analyze_aspect_sentiment(text, context_words=2)
+
+    # Два близких упоминания доставки - одно окно, дальнее - отдельное; один вызов модели
+    assert aspect_analyzer.batches == [["Доставка плохо, курьер опоздал и", "и и доставку потом все"]]
+    assert result["доставка"] == {"mentioned": True, "score": 0.5, "sentiment": "нейтральный"}
+    assert result["цена"] == {"mentioned": False, "score": 0.5, "sentiment": "нейтральный"}
+
+
+def test_aspect_shared_window_scored_once(aspect_analyzer):
+    result = aspect_analyzer.analyze_aspect_sentiment("Цена и качество плохо", context_words=5)
+
+    assert aspect_analyzer.batches == [["Цена и качество плохо"]]
+    assert result["цена"]["score"] == result["качество"]["score"] == 0.2
+    assert result["цена"]["sentiment"] == "негативный"
+
+
+def test_aspect_without_mentions_skips_model(aspect_analyzer):
+    result = aspect_analyzer.analyze_aspect_sentiment("Здравствуйте, меня зовут Анна")
+
+    assert aspect_analyzer.batches == []
+    assert not any(aspect["mentioned"] for aspect in result.values())
+
+
+class ScoreByText:
+    """Анализатор-заглушка: оценка записана в тексте сегмента"""
+
+    def analyze_sentiment(self, text):
+        return {"score": float(text), "sentiment_ru": ""}
+
+
+SCORES = [0.9, 0.1, 0.5, 0.7, 0.2, 0.8, 0.3]
+
+
+def naive_smooth(scores, window_size, center):
+    half = window_size // 2
+    if center:
+        windows = [scores[max(0, i - half):i + half + 1] for i in range(len(scores))]
+    else:
+        windows = [scores[max(0, i - window_size + 1):i + 1] for i in range(len(scores))]
+    return [float(np.mean(window)) for window in windows]
+
+
+@pytest.mark.parametrize("center", [False, True])
+@pytest.mark.parametrize("window_size", [1, 3, 4, 5])
+def test_smooth_matches_naive_mean(window_size, center):
+    smoothed = SentimentTimeline.smooth(SCORES, window_size, center=center)
+
+    assert np.allclose(smoothed, naive_smooth(SCORES, window_size, center))
+
+
+def test_trailing_timeline_emits_each_point_immediately():
+    timeline = SentimentTimeline(ScoreByText(), window_size=3)
+
+    emitted = [timeline.add_segment({"start": float(i), "text": str(score)}) for i, score in enumerate(SCORES)]
+
+    assert [len(points) for points in emitted] == [1] * len(SCORES)
+    assert timeline.close() == []
+    expected = [round(score, 3) for score in naive_smooth(SCORES, 3, center=False)]
+    assert [point["smoothed_score"] for point in timeline.points] == expected
+
+
+def test_centered_timeline_waits_for_right_half_of_window():
+    timeline = SentimentTimeline(ScoreByText(), window_size=5, center=True)
+
+    emitted = [len(timeline.add_segment({"text": str(score)})) for score in SCORES]
+    tail = timeline.close()
+
+    # Точка выдается, когда известны window_size // 2 следующих; остаток - при close
+    assert emitted == [0, 0, 1, 1, 1, 1, 1] and len(tail) == 2
+    expected = [round(score, 3) for score in naive_smooth(SCORES, 5, center=True)]
+    assert [point["smoothed_score"] for point in timeline.points] == expected
+    assert [point["time"] for point in timeline.points] == list(range(len(SCORES)))
+
+
+def test_timeline_skips_empty_segments_and_labels_smoothed_sentiment():
+    timeline = SentimentTimeline(ScoreByText(), window_size=2)
+
+    assert timeline.add_segment({"text": "   "}) == []
+    point = timeline.add_segment({"text": "0.9", "speaker": "client"})[0]
+    point_2 = timeline.add_segment({"text": "0.1"})[0]
+
+    assert point["smoothed_sentiment"] == "позитивный" and point["speaker"] == "client"
+    assert point_2["smoothed_score"] == 0.5 and point_2["smoothed_sentiment"] == "нейтральный"
+
+
+def test_live_timeline_matches_offline(rules_analyzer):
+    segments = [{"start": float(i), "text": text, "speaker": "client"} for i, text in enumerate(TEXTS)]
+    live = rules_analyzer.create_timeline(window_size=3, center=True)
+
+    for segment in segments:
+        live.add_segment(segment)
+    live.close()
+
+    assert live.points == rules_analyzer.analyze_sentiment_timeline(segments, window_size=3)
@@ -0,0 +1,173 @@
+import struct
+
+import numpy as np
+import pytest
+
+from utils.diarization import synthesize_dialogue
+from utils.transcribe import AudioTranscriber, DemoBackend, probe_wav_header
+from utils.vad import VoiceActivityDetector
+
+
+def transcriber(**kwargs):
+    return AudioTranscriber(backend=DemoBackend(utterance_seconds=5.0), **kwargs)
+
+
+def test_stream_segments_cover_file(make_wav):
+    path = make_wav("call.wav", np.zeros(16000 * 12, dtype=np.int16))
+
+    segments = list(transcriber(chunk_seconds=0.7).iter_segments(path))
+
+    assert [(s["start"], s["end"]) for s in segments] == [(0.0, 5.0), (5.0, 10.0), (10.0, 12.0)]
+    assert all(set(s) == {"start", "end", "text", "duration"} for s in segments)
+
+
+def test_chunk_size_does_not_change_segments(make_wav):
+    path = make_wav("call.wav", np.zeros(16000 * 12, dtype=np.int16))
+
+    small = list(transcriber(chunk_seconds=0.1).iter_segments(path))
+    large = list(transcriber(chunk_seconds=30).iter_segments(path))
+
+    assert small == large
+
+
+def test_stereo_is_downmixed(make_wav):
+    path = make_wav("stereo.wav", np.zeros((16000 * 6, 2), dtype=np.int16))
+
+    segments = list(transcriber().iter_segments(path))
+
+    assert [(s["start"], s["end"]) for s in segments] == [(0.0, 5.0), (5.0, 6.0)]
+
+
+def test_intervals_get_absolute_time(make_wav):
+    path = make_wav("call.wav", np.zeros(16000 * 30, dtype=np.int16))
+    intervals = [{"start": 2.0, "end": 4.0}, {"start": 20.5, "end": 27.0}]
+
+    segments = list(transcriber().iter_segments(path, intervals))
+
+    assert [(s["start"], s["end"]) for s in segments] == [(2.0, 4.0), (20.5, 25.5), (25.5, 27.0)]
+
+
+def test_only_16_bit_pcm(make_wav):
+    path = make_wav("8bit.wav", np.zeros(8000, dtype=np.uint8), sample_width=1)
+
+    with pytest.raises(ValueError, match="16-битный"):
+        list(transcriber().iter_segments(path))
+
+
+def test_shift_segment_moves_words():
+    segment = {"start": 1.0, "end": 2.0, "text": "да", "duration": 1.0,
+               "words": [{"word": "да", "start": 1.2, "end": 1.8, "conf": 1.0}]}
+
+    shifted = transcriber()._shift_segment(segment, 10.0)
+
+    assert (shifted["start"], shifted["end"], shifted["duration"]) == (11.0, 12.0, 1.0)
+    assert shifted["words"] == [{"word": "да", "start": 11.2, "end": 11.8, "conf": 1.0}]
+    assert segment["start"] == 1.0 and transcriber()._shift_segment(segment, 0) is segment
+
+
+def test_transcribe_stream_method(make_wav):
+    path = make_wav("call.wav", np.zeros(16000 * 7, dtype=np.int16))
+
+    result = transcriber().transcribe(path, method="stream")
+
+    assert result["method"] == "stream" and "error" not in result
+    assert result["text"] == " ".join(s["text"] for s in result["segments"])
+    assert len(result["segments"]) == 2
+
+
+def riff(*chunks):
+    body = b"WAVE" + b"".join(struct.pack("<4sI", chunk_id, len(data)) + data + b"\0" * (len(data) % 2)
+                              for chunk_id, data in chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def fmt_chunk(format_tag=1, channels=1, rate=16000, bits=16):
+    block_align = channels * bits // 8
+    return b"fmt ", struct.pack("<HHIIHH", format_tag, channels, rate, rate * block_align, block_align, bits)
+
+
+def test_probe_valid_pcm_with_extra_chunks(tmp_path):
+    path = tmp_path / "ok.wav"
+    path.write_bytes(riff(fmt_chunk(channels=2), (b"LIST", b"INFOabc"), (b"data", b"\0" * 16000 * 4 * 2)))
+
+    row = probe_wav_header(str(path))
+
+    assert row["valid"] and row["error"] is None
+    assert (row["channels"], row["sample_rate"], row["sample_width"], row["duration_seconds"]) == (2, 16000, 2, 2.0)
+
+
+def test_probe_truncated_file(tmp_path):
+    path = tmp_path / "cut.wav"
+    path.write_bytes(riff(fmt_chunk(), (b"data", b"\0" * 32000))[:-16000])
+
+    row = probe_wav_header(str(path))
+
+    assert not row["valid"] and row["error"] == "файл обрезан"
+    assert row["duration_seconds"] == 0.5
+
+
+@pytest.mark.parametrize("content, error", [
+    (b"ID3\x03not a wave file", "не RIFF/WAVE файл"),
+    (b"RIF", "не RIFF/WAVE файл"),
+    (riff((b"data", b"\0" * 8)), "секция data перед секцией fmt"),
+    (riff(fmt_chunk()), "секция data не найдена"),
+    (riff(fmt_chunk(format_tag=3, bits=32), (b"data", b"\0" * 8)), "неподдерживаемый формат 0x0003"),
+])
+def test_probe_rejects(tmp_path, content, error):
+    path = tmp_path / "bad.wav"
+    path.write_bytes(content)
+
+    row = probe_wav_header(str(path))
+
+    assert not row["valid"] and row["error"] == error
+
+
+def test_probe_audio_batch_folder(tmp_path, make_wav):
+    make_wav("a.wav", np.zeros(16000 * 3, dtype=np.int16))
+    make_wav("b.WAV", np.zeros(8000, dtype=np.int16))
+    (tmp_path / "broken.wav").write_bytes(b"garbage")
+    (tmp_path / "notes.txt").write_text("не аудио")
+
+    report = transcriber().probe_audio_batch(str(tmp_path))
+
+    assert report["total_files"] == 3 and report["valid_count"] == 2
+    assert report["rejected"] == [str(tmp_path / "broken.wav")]
+    assert report["total_duration_seconds"] == 3.5
+
+
+@pytest.mark.parametrize("value", [0, -5])
+def test_max_chunk_seconds_must_be_positive(value):
+    with pytest.raises(ValueError):
+        AudioTranscriber(max_chunk_seconds=value)
+
+
+def test_parallel_matches_sequential(make_wav):
+    samples, _ = synthesize_dialogue(60)
+    path = make_wav("call.wav", samples)
+    vad = VoiceActivityDetector()
+
+    stream = transcriber(vad=vad).transcribe(path, method="stream")
+    parallel = transcriber(vad=vad, max_workers=2, max_chunk_seconds=15).transcribe(path, method="parallel")
+
+    assert "error" not in parallel
+    assert len(parallel["segments"]) > 1
+    assert parallel["segments"] == stream["segments"]
+
+
+def test_parallel_without_vad_cuts_in_pauses(make_wav):
+    samples, _ = synthesize_dialogue(60)
+    path = make_wav("call.wav", samples)
+    speech = VoiceActivityDetector().detect_file(path)["intervals"]
+    parallel = transcriber(max_workers=2, max_chunk_seconds=15)
+
+    chunks = parallel.plan_chunks(VoiceActivityDetector().detect_file(path), voiced_only=False)
+    segments = list(parallel.iter_segments_parallel(path))
+
+    assert len(chunks) > 1
+    for chunk in chunks[1:]:
+        cut = chunk[0]["start"]
+        assert not any(interval["start"] < cut < interval["end"] for interval in speech)
+    # Фрагменты покрывают всю запись, сегменты идут подряд в абсолютном времени
+    assert segments[0]["start"] == 0.0 and segments[-1]["end"] == 60.0
+    assert all(a["end"] == b["start"] for a, b in zip(segments, segments[1:]))
+    assert all(set(s) == {"start", "end", "text", "duration"} for s in segments)
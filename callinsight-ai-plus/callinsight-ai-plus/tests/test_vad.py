@@ -0,0 +1,23 @@
+# test_vad.py - Детектор речи на плотном диалоге (тишины меньше 10% записи)
+import numpy as np
+
+from utils.diarization import synthesize_dialogue
+from utils.vad import VoiceActivityDetector
+
+
+def test_dense_dialogue_speech_ratio():
+    samples, reference = synthesize_dialogue(60, seed=0)
+    speech_seconds = sum(end - start for _, start, end in reference)
+
+    result = VoiceActivityDetector().detect(samples)
+
+    assert abs(result["speech_duration"] - speech_seconds) / speech_seconds < 0.05
+
+
+def test_background_noise_is_not_speech():
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 50, 16000 * 5).astype(np.int16)
+
+    result = VoiceActivityDetector().detect(samples)
+
+    assert result["intervals"] == []
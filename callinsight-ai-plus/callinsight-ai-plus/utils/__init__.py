@@ -0,0 +1,44 @@
+# utils - Модули анализа звонков
+# Классы доступны как utils.SentimentAnalyzer и т.п., но модуль импортируется
+# только при первом обращении: тяжелые зависимости (transformers/torch, yake,
+# pymorphy2, sklearn) загружаются лишь тем кодом, которому они нужны.
+import importlib
+
+_LAZY_EXPORTS = {
+    "AudioTranscriber": "transcribe",
+    "VoiceActivityDetector": "vad",
+    "SimpleDiarizer": "diarization",
+    "SpeakerDiarizer": "diarization",
+    "SpeakerAligner": "alignment",
+    "align_transcript": "alignment",
+    "analyze_call": "pipeline",
+    "SentimentAnalyzer": "sentiment",
+    "AdvancedSentimentAnalyzer": "sentiment",
+    "EmotionAnalyzer": "emotion",
+    "IntentDetector": "intent",
+    "MLIntentDetector": "intent",
+    "KeywordExtractorRU": "keywords",
+    "KeywordIndex": "keyword_index",
+    "get_keyword_index": "keyword_index",
+    "NamedEntityRecognizer": "ner",
+    "ProfanityFilter": "profanity",
+    "get_model_registry": "model_registry",
+    "get_inference_cache": "inference_cache",
+    "build_snapshot": "lexicon_snapshot",
+    "get_lexicon_store": "lexicon_snapshot",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
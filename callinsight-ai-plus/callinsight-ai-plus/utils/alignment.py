@@ -0,0 +1,155 @@
+# alignment.py - Сопоставление сегментов транскрипции с репликами диаризации
+import numpy as np
+
+# Реплика, которая во столько раз длиннее медианной (медиана берется
+# не меньше секунды), считается длинной (см. SpeakerAligner)
+LONG_TURN_FACTOR = 4.0
+
+
+class SpeakerAligner:
+    """
+    Интервальный индекс по репликам диаризации.
+    Каждому сегменту (или слову) транскрипции назначается диктор
+    с максимальным перекрытием по времени.
+    """
+
+    def __init__(self, turns, speaker_map=None):
+        """
+        Args:
+            turns: реплики диаризации [{speaker, start, end}, ...]
+            speaker_map: переименование дикторов, например
+                         {'speaker_1': 'operator', 'speaker_2': 'client'}
+        """
+        self.speaker_map = speaker_map or {}
+        ordered = sorted(turns, key=lambda turn: turn['start'])
+
+        self.starts = np.array([turn['start'] for turn in ordered], dtype=np.float64)
+        self.ends = np.array([turn['end'] for turn in ordered], dtype=np.float64)
+        self.speakers = [self.speaker_map.get(turn['speaker'], turn['speaker']) for turn in ordered]
+
+        # Обычные реплики ищутся бинарным поиском по началам: пересечься
+        # с интервалом может только реплика, начавшаяся не раньше чем за
+        # max_short секунд до него. Редкие длинные реплики (в LONG_TURN_FACTOR
+        # раз длиннее медианы) хранятся отдельно и проверяются для каждого
+        # интервала, иначе одна такая реплика растягивала бы окно поиска на весь звонок.
+        durations = self.ends - self.starts
+        self.max_short = LONG_TURN_FACTOR * max(float(np.median(durations)), 1.0) if len(ordered) else 0.0
+        is_long = durations > self.max_short
+        self.short_ids = np.flatnonzero(~is_long)
+        self.short_starts = self.starts[self.short_ids]
+        self.long_ids = np.flatnonzero(is_long)
+
+    def assign(self, starts, ends):
+        """
+        Диктор с максимальным перекрытием для набора интервалов
+
+        Args:
+            starts, ends: начала и концы интервалов (секунды)
+
+        Returns:
+            tuple: (список дикторов, доля интервала, покрытая этим диктором)
+        """
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        first = np.searchsorted(self.short_starts, starts - self.max_short, side='right')
+        last = np.searchsorted(self.short_starts, ends, side='left')
+        long_starts = self.starts[self.long_ids]
+        long_ends = self.ends[self.long_ids]
+
+        speakers = []
+        coverage = []
+        for start, end, lo, hi in zip(starts, ends, first, last):
+            candidates = self.short_ids[lo:hi]
+            if len(self.long_ids):
+                crossing = self.long_ids[(long_starts < end) & (long_ends > start)]
+                if len(crossing):
+                    candidates = np.sort(np.concatenate([candidates, crossing]))
+
+            overlaps = {}
+            for i in candidates:
+                overlap = min(end, self.ends[i]) - max(start, self.starts[i])
+                if overlap > 0:
+                    speaker = self.speakers[i]
+                    overlaps[speaker] = overlaps.get(speaker, 0.0) + overlap
+
+            if overlaps:
+                speaker, overlap = max(overlaps.items(), key=lambda x: x[1])
+                speakers.append(speaker)
+                coverage.append(round(overlap / (end - start), 3) if end > start else 1.0)
+            else:
+                speakers.append('unknown')
+                coverage.append(0.0)
+
+        return speakers, coverage
+
+    def align_words(self, words):
+        """Назначение диктора каждому слову [{word, start, end}, ...]"""
+        speakers, _ = self.assign([w['start'] for w in words], [w['end'] for w in words])
+        return [{**word, 'speaker': speaker} for word, speaker in zip(words, speakers)]
+
+    def align_segments(self, segments, word_level=False):
+        """
+        Назначение диктора сегментам транскрипции
+
+        Args:
+            segments: сегменты {start, end, text, ...}
+            word_level: если у сегментов есть слова (words), назначать
+                        дикторов пословно, а сегменту - диктора большинства слов
+
+        Returns:
+            list: копии сегментов с ключами speaker и speaker_overlap
+                  (при word_level - доля длительности слов этого диктора)
+        """
+        speakers, coverage = self.assign(
+            [segment['start'] for segment in segments],
+            [segment['end'] for segment in segments]
+        )
+
+        aligned = []
+        for segment, speaker, share in zip(segments, speakers, coverage):
+            result = {**segment, 'speaker': speaker, 'speaker_overlap': share}
+
+            if word_level and segment.get('words'):
+                words = self.align_words(segment['words'])
+                durations = {}
+                for word in words:
+                    durations[word['speaker']] = durations.get(word['speaker'], 0.0) + \
+                        (word['end'] - word['start'])
+                speaker, duration = max(durations.items(), key=lambda x: x[1])
+                total = sum(durations.values())
+                result['words'] = words
+                result['speaker'] = speaker
+                # Доля времени слов сегмента, сказанных этим диктором
+                result['speaker_overlap'] = round(duration / total, 3) if total > 0 else 1.0
+
+            aligned.append(result)
+
+        return aligned
+
+
+def align_transcript(transcription, diarization, speaker_map=None, word_level=False):
+    """
+    Сегменты AudioTranscriber.transcribe с дикторами из SimpleDiarizer.diarize
+
+    Returns:
+        list: сегменты с ключом speaker
+    """
+    aligner = SpeakerAligner(diarization.get('segments', []), speaker_map)
+    return aligner.align_segments(transcription.get('segments', []), word_level)
+
+
+if __name__ == "__main__":
+    turns = [
+        {'speaker': 'speaker_1', 'start': 0.0, 'end': 10.0},
+        {'speaker': 'speaker_2', 'start': 10.0, 'end': 30.0},
+        {'speaker': 'speaker_1', 'start': 30.0, 'end': 42.0}
+    ]
+    segments = [
+        {'start': 0.5, 'end': 9.0, 'text': 'Здравствуйте, служба поддержки.'},
+        {'start': 8.0, 'end': 25.0, 'text': 'У меня проблема с заказом.'},
+        {'start': 31.0, 'end': 40.0, 'text': 'Давайте проверим статус.'}
+    ]
+
+    aligner = SpeakerAligner(turns, {'speaker_1': 'operator', 'speaker_2': 'client'})
+    for segment in aligner.align_segments(segments):
+        print(f"{segment['speaker']} ({segment['speaker_overlap']:.0%}): {segment['text']}")
@@ -0,0 +1,274 @@
+# audio_cache.py - Кэш декодированного аудио (моно, 16 кГц, int16)
+import os
+import wave
+import hashlib
+import tempfile
+import threading
+from math import gcd
+from collections import OrderedDict
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+
+# Кэш лежит в data/ пакета, а не в текущем каталоге процесса
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIO_CACHE_DIR = os.path.join(PACKAGE_ROOT, "data", "audio_cache")
+
+
+def _pcm_to_int16(data, sample_width):
+    """Приведение PCM произвольной разрядности к int16"""
+    if sample_width == 2:
+        return np.frombuffer(data, dtype='<i2')
+    if sample_width == 1:
+        # 8-битный WAV хранится беззнаковым
+        return ((np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128) << 8)
+    if sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        # Берем два старших байта 24-битного сэмпла
+        return raw[:, 1:].copy().view('<i2').ravel()
+    if sample_width == 4:
+        return (np.frombuffer(data, dtype='<i4') >> 16).astype(np.int16)
+    raise ValueError(f"Неподдерживаемая разрядность: {sample_width * 8} бит")
+
+
+def _design_lowpass(up, down, half_taps=16):
+    """Оконный sinc-фильтр для полифазной передискретизации"""
+    factor = max(up, down)
+    n_taps = 2 * half_taps * factor + 1
+    t = np.arange(n_taps) - (n_taps - 1) / 2
+    cutoff = 1.0 / factor
+    h = cutoff * np.sinc(cutoff * t) * np.kaiser(n_taps, 5.0)
+    return (h * up / h.sum()).astype(np.float32)
+
+
+def resample_poly(x, up, down):
+    """
+    Полифазная передискретизация в up/down раз.
+    Выходные отсчеты с одинаковой фазой фильтра идут с шагом down по входу,
+    поэтому каждая фаза считается как сумма срезов с шагом - без выборки
+    по индексам и без вычисления нулевых отсчетов апсемплинга.
+
+    Args:
+        x: одномерный массив сэмплов
+        up, down: коэффициенты интерполяции и децимации
+
+    Returns:
+        np.ndarray: float32 массив длины ceil(len(x) * up / down)
+    """
+    divisor = gcd(up, down)
+    up, down = up // divisor, down // divisor
+    x = np.asarray(x, dtype=np.float32)
+    if up == down:
+        return x.copy()
+
+    h = _design_lowpass(up, down)
+    delay = (len(h) - 1) // 2
+    taps_per_phase = -(-len(h) // up)
+    h = np.pad(h, (0, taps_per_phase * up - len(h)))
+    # phases[p, j] = h[p + j * up]
+    phases = h.reshape(taps_per_phase, up).T
+
+    n_out = -(-len(x) * up // down)
+    # Дополняем вход нулями, чтобы индексы x[i - j] не выходили за границы
+    padded = np.concatenate([
+        np.zeros(taps_per_phase, dtype=np.float32),
+        x,
+        np.zeros(taps_per_phase + delay // up + down + 1, dtype=np.float32)
+    ])
+
+    y = np.empty(n_out, dtype=np.float32)
+    for r in range(min(up, n_out)):
+        # Отсчеты y[r], y[r + up], ... : позиция во входе растет на down
+        count = len(range(r, n_out, up))
+        n = r * down + delay
+        phase = phases[n % up]
+        base = n // up + taps_per_phase
+
+        acc = np.zeros(count, dtype=np.float32)
+        for j in range(taps_per_phase):
+            start = base - j
+            acc += phase[j] * padded[start:start + count * down:down]
+        y[r::up] = acc
+
+    return y
+
+
+def decode_to_mono16k(audio_path, target_rate=TARGET_SAMPLE_RATE, block_seconds=30):
+    """
+    Декодирование WAV в моно int16 с частотой target_rate.
+    Сведение каналов выполняется поблочно, передискретизация - полифазная.
+    """
+    with wave.open(audio_path, 'rb') as wf:
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        framerate = wf.getframerate()
+        n_frames = wf.getnframes()
+
+        mono = np.empty(n_frames, dtype=np.int16)
+        frames_per_block = max(1, framerate * block_seconds)
+        position = 0
+        while True:
+            data = wf.readframes(frames_per_block)
+            if not data:
+                break
+            samples = _pcm_to_int16(data, sample_width)
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            mono[position:position + len(samples)] = samples
+            position += len(samples)
+        mono = mono[:position]
+
+    if framerate == target_rate:
+        return mono
+
+    resampled = resample_poly(mono, target_rate, framerate)
+    return np.clip(np.rint(resampled), -32768, 32767).astype(np.int16)
+
+
+class DecodedAudioCache:
+    """
+    Дисковый кэш декодированного аудио с адресацией по содержимому.
+    Каждая загрузка декодируется один раз; потребители (транскрибация,
+    диаризация, акустические метрики) получают np.memmap только для чтения.
+    Размер кэша ограничен, вытесняются давно не использованные файлы (LRU по mtime).
+    Повторное обращение к неизмененному файлу находится по (путь, размер,
+    mtime) без чтения файла; хэш содержимого считается только при промахе.
+    """
+
+    def __init__(self, cache_dir=AUDIO_CACHE_DIR, max_size_mb=2048,
+                 target_rate=TARGET_SAMPLE_RATE, max_index_entries=4096):
+        # Относительный путь считается от корня пакета
+        cache_dir = os.path.join(PACKAGE_ROOT, cache_dir)
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.target_rate = target_rate
+        # (путь, размер, mtime) -> хэш содержимого
+        self.index = OrderedDict()
+        self.max_index_entries = max_index_entries
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def content_hash(self, audio_path, block_size=1 << 20):
+        """Хэш содержимого файла и параметров декодирования"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"mono-int16-{self.target_rate}".encode())
+        with open(audio_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def _key(self, audio_path):
+        """Хэш содержимого: по индексу для неизмененного файла, иначе чтением файла"""
+        stat = os.stat(audio_path)
+        file_id = (os.path.abspath(audio_path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            key = self.index.get(file_id)
+            if key is not None:
+                self.index.move_to_end(file_id)
+                return key
+
+        key = self.content_hash(audio_path)
+        with self.lock:
+            self.index[file_id] = key
+            if len(self.index) > self.max_index_entries:
+                self.index.popitem(last=False)
+        return key
+
+    def get(self, audio_path):
+        """
+        Получение декодированного аудио (декодирует при первом обращении)
+
+        Returns:
+            np.ndarray: memmap int16 (моно, target_rate) только для чтения
+        """
+        key = self._key(audio_path)
+        path = self._cache_path(key)
+
+        if os.path.exists(path):
+            # Отмечаем использование для LRU
+            os.utime(path)
+        else:
+            samples = decode_to_mono16k(audio_path, self.target_rate)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                samples.astype('<i2').tofile(f)
+            os.replace(tmp_path, path)
+            self.evict(keep=path)
+
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.int16)
+        return np.memmap(path, dtype='<i2', mode='r')
+
+    def evict(self, keep=None):
+        """Удаление самых старых файлов, пока кэш превышает лимит"""
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith('.pcm'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError:
+                pass
+
+        return total_size
+
+    def stats(self):
+        """Статистика кэша"""
+        files = [entry for entry in os.scandir(self.cache_dir)
+                 if entry.is_file() and entry.name.endswith('.pcm')]
+        total_size = sum(entry.stat().st_size for entry in files)
+        return {
+            "files": len(files),
+            "size_mb": round(total_size / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+            "sample_rate": self.target_rate
+        }
+
+
+_default_cache = None
+
+
+def get_audio_cache():
+    """Общий для процесса экземпляр кэша"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DecodedAudioCache()
+    return _default_cache
+
+
+def load_audio(audio_path):
+    """Моно 16 кГц int16 представление файла из общего кэша"""
+    return get_audio_cache().get(audio_path)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    cache = DecodedAudioCache()
+    test_audio = sys.argv[1] if len(sys.argv) > 1 else "audio_samples/test.wav"
+    if os.path.exists(test_audio):
+        start = time.perf_counter()
+        samples = cache.get(test_audio)
+        print(f"Первое обращение: {time.perf_counter() - start:.3f} с, {len(samples)} сэмплов")
+        start = time.perf_counter()
+        samples = cache.get(test_audio)
+        print(f"Из кэша: {time.perf_counter() - start:.3f} с")
+        print(cache.stats())
+    else:
+        print(f"Тестовый файл не найден: {test_audio}")
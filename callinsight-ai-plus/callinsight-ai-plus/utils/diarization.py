@@ -1,20 +1,347 @@
 # diarization.py (упрощенная версия)
 import os  # ⬅️ ДОБАВИТЬ ЭТУ СТРОКУ!
+import wave
 import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+from .audio_cache import load_audio, _pcm_to_int16, TARGET_SAMPLE_RATE
+
+# Допустимый коэффициент реального времени: час звонка - не дольше 3 минут на одном ядре.
+# Обработка линейна по длине записи, поэтому порог проверяется и на укороченном прогоне
+MAX_REAL_TIME_FACTOR = 0.05
+
+
+def mel_filterbank(n_fft, sample_rate, n_mels=24, fmin=60.0, fmax=4000.0):
+    """Треугольные мел-фильтры: матрица (n_fft // 2 + 1, n_mels)"""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+    
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+    
+    fmax = min(fmax, sample_rate / 2)
+    mel_points = np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2)
+    bins = mel_to_hz(mel_points) * n_fft / sample_rate
+    freqs = np.arange(n_fft // 2 + 1)[:, None]
+    
+    left, center, right = bins[:-2], bins[1:-1], bins[2:]
+    rising = (freqs - left) / (center - left)
+    falling = (right - freqs) / (right - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
 class SimpleDiarizer:
     """
-    Упрощенный диаризатор для демо
+    Диаризатор на CPU: спектральные признаки + кластеризация K-Means
     """
     
-    def __init__(self, n_speakers=2):
+    def __init__(self, n_speakers=2, vad=None, frame_ms=25, hop_ms=10,
+                 window_seconds=1.5, window_hop_seconds=0.5, n_mels=24,
+                 channel_split=True):
+        """
+        Args:
+            n_speakers: число дикторов
+            vad: VoiceActivityDetector (по умолчанию создается стандартный)
+            frame_ms, hop_ms: длина и шаг кадра спектрального анализа
+            window_seconds, window_hop_seconds: окно усреднения признаков для кластеризации
+            n_mels: число мел-полос
+            channel_split: для стереозаписей (оператор и клиент в разных каналах)
+                           определять реплики по энергии каналов, без кластеризации
+        """
         self.n_speakers = n_speakers
+        self.channel_split = channel_split
+        self.vad = vad
+        self.frame_ms = frame_ms
+        self.hop_ms = hop_ms
+        self.window_seconds = window_seconds
+        self.window_hop_seconds = window_hop_seconds
+        self.n_mels = n_mels
+    
+    def _get_vad(self):
+        if self.vad is None:
+            from .vad import VoiceActivityDetector
+            self.vad = VoiceActivityDetector()
+        return self.vad
+    
+    def frame_features(self, samples, sample_rate=TARGET_SAMPLE_RATE, block_frames=20000):
+        """
+        Логарифмические мел-энергии по кадрам.
+        Кадры берутся через sliding_window_view (без копирования сигнала),
+        БПФ и мел-фильтры считаются блоками кадров.
+        
+        Returns:
+            np.ndarray: матрица (n_frames, n_mels)
+        """
+        frame_len = int(sample_rate * self.frame_ms / 1000)
+        hop = int(sample_rate * self.hop_ms / 1000)
+        n_fft = 1 << (frame_len - 1).bit_length()
+        
+        if len(samples) < frame_len:
+            return np.zeros((0, self.n_mels), dtype=np.float32)
+        
+        frames = np.lib.stride_tricks.sliding_window_view(samples, frame_len)[::hop]
+        window = np.hamming(frame_len).astype(np.float32)
+        fbank = mel_filterbank(n_fft, sample_rate, self.n_mels)
+        
+        features = np.empty((len(frames), self.n_mels), dtype=np.float32)
+        for start in range(0, len(frames), block_frames):
+            block = frames[start:start + block_frames].astype(np.float32) * window
+            power = np.abs(np.fft.rfft(block, n=n_fft, axis=1)) ** 2
+            features[start:start + len(block)] = np.log(power @ fbank + 1e-6)
+        
+        # Нормализация среднего по записи (компенсация канала)
+        features -= features.mean(axis=0)
+        return features
+    
+    def window_embeddings(self, features, speech_mask, frames_per_window, frames_per_hop):
+        """
+        Средний спектральный профиль речевых кадров в скользящих окнах.
+        Суммы по окнам считаются через кумулятивные суммы, тишина внутри
+        окна в среднее не попадает.
+        
+        Returns:
+            tuple: (embeddings, speech_fraction, window_starts)
+        """
+        n_frames = len(features)
+        if n_frames < frames_per_window:
+            frames_per_window = n_frames
+        starts = np.arange(0, n_frames - frames_per_window + 1, frames_per_hop)
+        ends = starts + frames_per_window
+        
+        # Убираем общую громкость кадра - остается форма спектра (тембр)
+        shape = features - features.mean(axis=1, keepdims=True)
+        masked = shape * speech_mask[:, None]
+        
+        zeros = np.zeros((1, features.shape[1]), dtype=np.float64)
+        csum = np.concatenate([zeros, np.cumsum(masked, axis=0, dtype=np.float64)])
+        mask_csum = np.concatenate([[0], np.cumsum(speech_mask)])
+        
+        speech_frames = mask_csum[ends] - mask_csum[starts]
+        mean = (csum[ends] - csum[starts]) / np.maximum(speech_frames, 1)[:, None]
+        speech_fraction = speech_frames / frames_per_window
+        
+        return mean.astype(np.float32), speech_fraction, starts
+    
+    def _smooth_labels(self, labels, n_labels, width=5):
+        """Мажоритарный фильтр меток (скользящее окно через cumsum)"""
+        if len(labels) < width:
+            return labels
+        one_hot = np.eye(n_labels, dtype=np.int32)[labels]
+        csum = np.concatenate([np.zeros((1, n_labels), dtype=np.int32), np.cumsum(one_hot, axis=0)])
+        half = width // 2
+        idx = np.arange(len(labels))
+        lo = np.maximum(idx - half, 0)
+        hi = np.minimum(idx + half + 1, len(labels))
+        return np.argmax(csum[hi] - csum[lo], axis=1)
+    
+    def diarize_samples(self, samples, sample_rate=TARGET_SAMPLE_RATE, speech_intervals=None):
+        """
+        Диаризация моно сигнала
+        
+        Args:
+            samples: моно сигнал int16
+            sample_rate: частота дискретизации
+            speech_intervals: интервалы речи [{start, end}]; по умолчанию считаются VAD
+            
+        Returns:
+            dict: сегменты по дикторам и статистика
+        """
+        from sklearn.cluster import KMeans
+        from sklearn.preprocessing import StandardScaler
+        
+        total_duration = len(samples) / sample_rate
+        if speech_intervals is None:
+            speech_intervals = self._get_vad().detect(samples, sample_rate)['intervals']
+        
+        features = self.frame_features(samples, sample_rate)
+        hop_sec = self.hop_ms / 1000
+        
+        # Маска речевых кадров по интервалам VAD
+        frame_times = np.arange(len(features)) * hop_sec
+        starts = np.array([interval['start'] for interval in speech_intervals])
+        ends = np.array([interval['end'] for interval in speech_intervals])
+        pos = np.searchsorted(starts, frame_times, side='right') - 1
+        speech_mask = (pos >= 0) & (frame_times < ends[np.maximum(pos, 0)]) if len(starts) else \
+            np.zeros(len(features), dtype=bool)
+        
+        frames_per_window = max(1, int(self.window_seconds / hop_sec))
+        frames_per_hop = max(1, int(self.window_hop_seconds / hop_sec))
+        
+        segments = []
+        if len(features):
+            embeddings, speech_fraction, window_starts = self.window_embeddings(
+                features, speech_mask, frames_per_window, frames_per_hop
+            )
+            voiced = np.flatnonzero(speech_fraction >= 0.5)
+            
+            if len(voiced) >= self.n_speakers:
+                X = StandardScaler().fit_transform(embeddings[voiced])
+                kmeans = KMeans(n_clusters=self.n_speakers, n_init=4, random_state=0)
+                labels = self._smooth_labels(kmeans.fit_predict(X), self.n_speakers)
+            else:
+                labels = np.zeros(len(voiced), dtype=int)
+            
+            segments = self._labels_to_segments(
+                voiced, labels, window_starts, frames_per_window, frames_per_hop, hop_sec
+            )
+        
+        return self._build_result(segments, total_duration)
+    
+    def _labels_to_segments(self, voiced, labels, window_starts, frames_per_window,
+                            frames_per_hop, hop_sec):
+        """Склейка соседних окон с одинаковой меткой в реплики"""
+        if len(voiced) == 0:
+            return []
+        
+        # Каждое окно отвечает за участок шириной в шаг вокруг своего центра
+        centers = (window_starts[voiced] + frames_per_window / 2) * hop_sec
+        half_cell = frames_per_hop * hop_sec / 2
+        cell_starts = np.maximum(centers - half_cell, 0.0)
+        cell_ends = centers + half_cell
+        
+        # Новая реплика начинается при смене метки или разрыве между окнами
+        breaks = np.flatnonzero((np.diff(labels) != 0) | (np.diff(voiced) > 1)) + 1
+        run_starts = np.concatenate([[0], breaks])
+        run_ends = np.concatenate([breaks, [len(voiced)]]) - 1
+        
+        # Дикторы нумеруются в порядке первого появления
+        order = {}
+        for label in labels[run_starts]:
+            order.setdefault(int(label), f"speaker_{len(order) + 1}")
+        
+        segments = []
+        for first, last in zip(run_starts, run_ends):
+            start = float(cell_starts[first])
+            end = float(cell_ends[last])
+            segments.append({
+                'speaker': order[int(labels[first])],
+                'start': round(start, 2),
+                'end': round(end, 2),
+                'duration': round(end - start, 2)
+            })
+        return segments
+    
+    def channel_envelopes(self, audio_path, block_seconds=60):
+        """
+        Энергия каждого канала по кадрам (dBFS) за один проход по файлу
+        
+        Returns:
+            tuple: (energy_db (n_frames, n_channels), длительность кадра, длительность записи)
+        """
+        with wave.open(audio_path, 'rb') as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            framerate = wf.getframerate()
+            n_frames_total = wf.getnframes()
+            
+            frame_len = max(1, int(framerate * self.hop_ms / 1000))
+            frames_per_block = frame_len * max(1, int(block_seconds * 1000 / self.hop_ms))
+            
+            blocks = []
+            while True:
+                data = wf.readframes(frames_per_block)
+                if not data:
+                    break
+                samples = _pcm_to_int16(data, sample_width)
+                n = len(samples) // (channels * frame_len)
+                if n == 0:
+                    break
+                block = samples[:n * frame_len * channels].reshape(n, frame_len, channels)
+                power = np.einsum('ijk,ijk->ik', block, block, dtype=np.int64) / frame_len
+                blocks.append(10 * np.log10(power / 32768.0 ** 2 + 1e-10))
+        
+        energy_db = np.concatenate(blocks) if blocks else np.zeros((0, channels))
+        return energy_db, frame_len / framerate, n_frames_total / framerate
+    
+    def diarize_stereo(self, audio_path):
+        """
+        Диаризация стереозаписи АТС: канал = диктор.
+        Активный диктор в кадре - канал, энергия которого сильнее всего
+        превышает собственный уровень шума. Сложность O(samples).
+        """
+        vad = self._get_vad()
+        energy_db, frame_sec, total_duration = self.channel_envelopes(audio_path)
+        n_frames, n_channels = energy_db.shape
+        
+        if n_frames == 0:
+            return self._build_result([], total_duration)
+        
+        noise_floor = np.percentile(energy_db, 10, axis=0)
+        threshold = np.maximum(noise_floor + vad.energy_margin_db, vad.min_energy_db)
+        excess = energy_db - threshold
+        
+        # n_channels - тишина во всех каналах, иначе номер доминирующего канала
+        labels = np.where(excess.max(axis=1) > 0, excess.argmax(axis=1), n_channels)
+        labels = self._smooth_labels(labels, n_channels + 1, width=max(3, int(0.1 / frame_sec) | 1))
+        
+        breaks = np.flatnonzero(np.diff(labels) != 0) + 1
+        run_starts = np.concatenate([[0], breaks])
+        run_ends = np.concatenate([breaks, [n_frames]])
+        
+        segments = []
+        for first, end in zip(run_starts, run_ends):
+            channel = int(labels[first])
+            if channel == n_channels:
+                continue
+            start, stop = int(first) * frame_sec, int(end) * frame_sec
+            speaker = f"speaker_{channel + 1}"
+            # Короткую паузу внутри реплики одного диктора склеиваем
+            if segments and segments[-1]['speaker'] == speaker and \
+                    start - segments[-1]['end'] < vad.min_silence_ms / 1000:
+                segments[-1]['end'] = stop
+                continue
+            segments.append({'speaker': speaker, 'start': start, 'end': stop})
+        
+        min_duration = vad.min_speech_ms / 1000
+        segments = [
+            {
+                'speaker': segment['speaker'],
+                'start': round(segment['start'], 2),
+                'end': round(segment['end'], 2),
+                'duration': round(segment['end'] - segment['start'], 2)
+            }
+            for segment in segments
+            if segment['end'] - segment['start'] >= min_duration
+        ]
+        
+        result = self._build_result(segments, total_duration)
+        result['method'] = 'channel_split'
+        return result
+    
+    def _build_result(self, segments, total_duration):
+        speaker_stats = {}
+        for segment in segments:
+            stats = speaker_stats.setdefault(segment['speaker'], {
+                'total_duration': 0.0,
+                'segment_count': 0,
+                'avg_duration': 0.0
+            })
+            stats['total_duration'] += segment['duration']
+            stats['segment_count'] += 1
+        
+        for stats in speaker_stats.values():
+            stats['total_duration'] = round(stats['total_duration'], 2)
+            stats['avg_duration'] = round(stats['total_duration'] / stats['segment_count'], 2)
+        
+        return {
+            'success': True,
+            'segments': segments,
+            'speaker_count': len(speaker_stats),
+            'speaker_stats': speaker_stats,
+            'total_duration': round(total_duration, 2)
+        }
     
-    def diarize(self, audio_path):
+    def diarize(self, audio_path, method="demo"):
         """
-        Демо-версия диаризации
+        Диаризация аудиофайла
+        
+        Args:
+            audio_path: путь к WAV-файлу
+            method: "demo" - демо-данные (сегменты с полем 'text');
+                    "engine" - разделение по каналам для стерео, иначе кластеризация
+                    спектральных признаков (сегменты без 'text': текст
+                    привязывается к дикторам через alignment.align_transcript)
         """
         # Проверяем существует ли файл
         if not os.path.exists(audio_path):
@@ -25,6 +352,23 @@ class SimpleDiarizer:
                 'speaker_stats': {}
             }
         
+        if method == "engine":
+            try:
+                if self.channel_split:
+                    with wave.open(audio_path, 'rb') as wf:
+                        channels = wf.getnchannels()
+                    if channels == 2:
+                        return self.diarize_stereo(audio_path)
+                
+                return self.diarize_samples(load_audio(audio_path), TARGET_SAMPLE_RATE)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'segments': [],
+                    'speaker_stats': {}
+                }
+        
         # Возвращаем демо-данные
         segments = [
             {
@@ -75,14 +419,97 @@ class SpeakerDiarizer(SimpleDiarizer):
     """Алиас для совместимости"""
     pass
 
+
+def synthesize_dialogue(duration_seconds, sample_rate=TARGET_SAMPLE_RATE, seed=0):
+    """
+    Синтетический диалог двух "голосов" (разная частота основного тона и тембр)
+    с паузами между репликами. Используется для бенчмарка.
+    
+    Returns:
+        tuple: (samples int16, эталонные реплики [(speaker, start, end)])
+    """
+    rng = np.random.default_rng(seed)
+    voices = [(120.0, [1.0, 0.6, 0.3, 0.1]), (230.0, [0.4, 1.0, 0.2, 0.5])]
+    samples = np.zeros(int(duration_seconds * sample_rate), dtype=np.float32)
+    reference = []
+    
+    t, speaker = 0.0, 0
+    while t < duration_seconds:
+        turn = rng.uniform(2.0, 10.0)
+        start, end = t, min(t + turn, duration_seconds)
+        i0, i1 = int(start * sample_rate), int(end * sample_rate)
+        time = np.arange(i1 - i0, dtype=np.float32) / sample_rate
+        f0, harmonics = voices[speaker]
+        f0_track = f0 * (1 + 0.05 * np.sin(2 * np.pi * 0.7 * time))
+        phase = 2 * np.pi * np.cumsum(f0_track) / sample_rate
+        voice = sum(amp * np.sin((k + 1) * phase) for k, amp in enumerate(harmonics))
+        envelope = 0.6 + 0.4 * np.abs(np.sin(2 * np.pi * 2.5 * time))
+        samples[i0:i1] = 6000 * voice * envelope
+        reference.append((f"speaker_{speaker + 1}", start, end))
+        
+        t = end + rng.uniform(0.3, 1.5)
+        speaker = 1 - speaker
+    
+    samples += rng.normal(0, 50, len(samples)).astype(np.float32)
+    return np.clip(samples, -32768, 32767).astype(np.int16), reference
+
+
+def benchmark(duration_seconds=3600, n_speakers=2):
+    """
+    Замер скорости диаризации на синтетическом звонке.
+    
+    Returns:
+        dict: время обработки, коэффициент реального времени, точность по времени
+              и within_budget - уложился ли прогон в MAX_REAL_TIME_FACTOR
+    """
+    import time
+    
+    samples, reference = synthesize_dialogue(duration_seconds)
+    diarizer = SimpleDiarizer(n_speakers=n_speakers)
+    
+    start = time.perf_counter()
+    result = diarizer.diarize_samples(samples)
+    elapsed = time.perf_counter() - start
+    
+    # Доля эталонной речи, отнесенная к правильному диктору (по сетке 10 мс)
+    grid = np.arange(0, duration_seconds, 0.01)
+    truth = np.zeros(len(grid), dtype=int)
+    for speaker, seg_start, seg_end in reference:
+        truth[(grid >= seg_start) & (grid < seg_end)] = int(speaker[-1])
+    predicted = np.zeros(len(grid), dtype=int)
+    for segment in result['segments']:
+        predicted[(grid >= segment['start']) & (grid < segment['end'])] = int(segment['speaker'][-1])
+    voiced = truth > 0
+    accuracy = np.mean(truth[voiced] == predicted[voiced]) if voiced.any() else 0.0
+    
+    return {
+        'audio_seconds': duration_seconds,
+        'processing_seconds': round(elapsed, 2),
+        'real_time_factor': round(elapsed / duration_seconds, 4),
+        'within_budget': elapsed / duration_seconds <= MAX_REAL_TIME_FACTOR,
+        'segments': len(result['segments']),
+        'accuracy': round(float(accuracy), 3)
+    }
+
+
 if __name__ == "__main__":
+    import sys
+    
+    if "--benchmark" in sys.argv:
+        # python -m utils.diarization --benchmark
+        report = benchmark()
+        print(f"Аудио: {report['audio_seconds']} с, обработка: {report['processing_seconds']} с "
+              f"(RTF {report['real_time_factor']}, порог {MAX_REAL_TIME_FACTOR}), "
+              f"точность: {report['accuracy']:.1%}")
+        sys.exit(0 if report['within_budget'] else 1)
+    
     diarizer = SpeakerDiarizer(n_speakers=2)
-    print("Диаризатор инициализирован (демо-версия)")
+    print("Диаризатор инициализирован")
     
     # Тестирование
     test_audio = "audio_samples/dialogue.wav"
     if os.path.exists(test_audio):
-        result = diarizer.diarize(test_audio)
+        result = diarizer.diarize(test_audio, method="engine")
         print(f"Результат: {result['success']}")
     else:
         print(f"Тестовый файл не найден: {test_audio}")
\ No newline at end of file
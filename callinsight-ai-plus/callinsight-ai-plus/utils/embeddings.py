@@ -0,0 +1,155 @@
+# embeddings.py - Векторы предложений и классификация по прототипам меток
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from .model_registry import get_model_registry
+from .inference_cache import model_revision
+
+# Прототипы лежат в data/ пакета, а не в текущем каталоге процесса
+PROTOTYPE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "prototypes")
+
+
+class SentenceEncoder:
+    """
+    Кодировщик предложений: один проход модели на текст,
+    на выходе L2-нормированные векторы (скалярное произведение = косинус)
+    """
+
+    def __init__(self, model_name="cointegrated/rubert-tiny2", pooling="cls", batch_size=32, max_tokens=512):
+        """
+        Args:
+            model_name: модель-кодировщик (для rubert-tiny2 рекомендуется CLS-токен)
+            pooling: "cls" - вектор первого токена, "mean" - среднее по токенам
+            batch_size: число текстов в одном прогоне модели
+            max_tokens: длина текста в токенах, дальше обрезается
+        """
+        self.model_name = model_name
+        self.pooling = pooling
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        # Модель из общего реестра, загружается при первом кодировании
+        self.model = get_model_registry().handle("feature-extraction", model_name)
+
+    @property
+    def revision(self):
+        return model_revision(self.model)
+
+    def encode(self, texts, batch_size=None):
+        """
+        Векторы для списка текстов
+
+        Returns:
+            np.ndarray: матрица (len(texts), размерность), строки нормированы
+        """
+        import torch
+
+        texts = list(texts)
+        pipe = self.model.get()
+        model, tokenizer = pipe.model, pipe.tokenizer
+        batch_size = batch_size or self.batch_size
+
+        vectors = np.zeros((len(texts), model.config.hidden_size), dtype=np.float32)
+        # Батчи из текстов близкой длины - меньше паддинга
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            batch = tokenizer(
+                [texts[i] for i in batch_idx],
+                padding=True,
+                truncation=True,
+                max_length=self.max_tokens,
+                return_tensors="pt"
+            ).to(model.device)
+
+            with torch.no_grad():
+                hidden = model(**batch).last_hidden_state
+
+            if self.pooling == "mean":
+                mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+            else:
+                pooled = hidden[:, 0]
+            vectors[batch_idx] = pooled.float().cpu().numpy()
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class LabelPrototypes:
+    """
+    Векторы-прототипы меток: нормированное среднее векторов примеров
+    каждой метки. Матрица сохраняется на диск с ключом по модели,
+    ее ревизии и примерам, поэтому считается один раз.
+    """
+
+    def __init__(self, encoder, examples, cache_dir=PROTOTYPE_DIR):
+        """
+        Args:
+            encoder: SentenceEncoder
+            examples: {метка: [пример, ...]}
+            cache_dir: каталог для файлов прототипов (None - без кэша на диске)
+        """
+        self.encoder = encoder
+        self.examples = {label: list(texts) for label, texts in examples.items()}
+        self.cache_dir = cache_dir
+        self.labels = list(self.examples)
+        self._matrix = None
+
+    def cache_key(self):
+        payload = json.dumps({
+            "model": self.encoder.model_name,
+            "revision": self.encoder.revision,
+            "pooling": self.encoder.pooling,
+            "examples": self.examples
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def matrix(self):
+        """Матрица прототипов (число меток, размерность)"""
+        if self._matrix is None:
+            self._matrix = self._load_or_build()
+        return self._matrix
+
+    def _load_or_build(self):
+        path = None
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f"{self.cache_key()}.npz")
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    if list(data["labels"]) == self.labels:
+                        return data["prototypes"]
+
+        # Все примеры всех меток кодируются одним пакетом
+        texts = [text for label in self.labels for text in self.examples[label]]
+        owners = np.repeat(np.arange(len(self.labels)), [len(self.examples[label]) for label in self.labels])
+        vectors = self.encoder.encode(texts)
+
+        prototypes = np.zeros((len(self.labels), vectors.shape[1]), dtype=np.float32)
+        np.add.at(prototypes, owners, vectors)
+        prototypes /= np.maximum(np.linalg.norm(prototypes, axis=1, keepdims=True), 1e-12)
+
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.savez(path, labels=np.array(self.labels), prototypes=prototypes)
+        return prototypes
+
+    def similarities(self, texts):
+        """
+        Косинусная близость текстов к прототипам: один проход кодировщика
+        и одно матричное умножение на весь пакет
+
+        Returns:
+            np.ndarray: (len(texts), число меток)
+        """
+        return self.encoder.encode(texts) @ self.matrix.T
+
+    def predict_proba(self, texts, temperature=0.05):
+        """Распределение по меткам: softmax близостей с температурой"""
+        logits = self.similarities(texts) / temperature
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
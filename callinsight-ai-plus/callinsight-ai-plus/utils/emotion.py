@@ -1,15 +1,24 @@
 # emotion.py - Текстовая модель для русского языка
-from transformers import pipeline
+import numpy as np
+
+from .long_text import LongTextClassifier
+from .inference_cache import get_inference_cache, model_revision
+from .model_registry import get_model_registry
 
 class EmotionAnalyzer:
-    def __init__(self):
+    def __init__(self, use_cache=True, backend="torch", onnx_dir=None):
         # Рассмотрите модель DeepPavlov для русского языка
         # или другую предобученную модель, указанную в поиске[citation:1]
-        self.model = pipeline(
-            "text-classification",
-            model="cointegrated/rubert-tiny2-cedr-emotion-detection",  # Пример модели для русского языка
-            top_k=None
+        self.model_name = "cointegrated/rubert-tiny2-cedr-emotion-detection"  # Пример модели для русского языка
+        # Общий реестр: веса разделяются с MLIntentDetector (тот же чекпойнт)
+        # и загружаются при первом анализе. backend="onnx" - int8-модель на ONNX Runtime
+        self.model = get_model_registry().handle(
+            "text-classification", self.model_name, backend=backend, onnx_dir=onnx_dir, top_k=None
         )
+        # Длинные реплики анализируются окнами по 512 токенов
+        self.long_text = LongTextClassifier(self.model)
+        # Повторяющиеся фразы (скрипты операторов) берутся из кэша
+        self.cache = get_inference_cache() if use_cache else None
         self.emotion_map = {
             'sadness': 'грусть',
             'anger': 'гнев',
@@ -17,15 +26,19 @@ class EmotionAnalyzer:
             'fear': 'страх',
             'joy': 'радость',
             'neutral': 'нейтрально',
+            'no_emotion': 'нейтрально',
             'surprise': 'удивление'
         }
     
+    @property
+    def cache_key(self):
+        return f"emotion:{self.model_name}:{model_revision(self.model)}"
+    
     def analyze_emotion(self, text):
         if not text or len(text.strip()) == 0:
             return {"emotion_ru": "нейтрально", "score": 1.0}
         
-        # Ограничим длину текста для модели
-        results = self.model(text[:512])[0]
+        results = self._classify([text])[0]
         
         # Возвращаем топ-эмоцию
         top_emotion = max(results, key=lambda x: x["score"])
@@ -34,4 +47,105 @@ class EmotionAnalyzer:
             "emotion_eng": top_emotion["label"],
             "emotion_ru": self.emotion_map.get(top_emotion["label"], top_emotion["label"]),
             "score": round(top_emotion["score"], 3)
-        }
\ No newline at end of file
+        }
+    
+    def _classify(self, texts, batch_size=None):
+        """Распределения эмоций для списка текстов (через кэш, если включен)"""
+        def classify(batch):
+            return self.long_text.classify(batch, batch_size)
+        
+        if self.cache is None:
+            return classify(texts)
+        return self.cache.cached_batch(self.cache_key, texts, classify)
+    
+    def analyze_emotions(self, segments, batch_size=None):
+        """
+        Пакетный анализ эмоций по сегментам диалога.
+        Все тексты проходят через модель одним пакетом (окна сортируются
+        по длине), полные распределения вероятностей сохраняются
+        в матрице, статистика по дикторам считается матричными операциями
+        с весом по длительности сегмента.
+        
+        Args:
+            segments: сегменты {text, start, end, duration, speaker}
+            batch_size: размер батча модели
+            
+        Returns:
+            dict: probabilities (np.ndarray (сегменты, labels); для JSON - .tolist()),
+                  эмоции сегментов и emotion_stats в процентах; пустые
+                  сегменты показываются нейтральными, но в статистику не входят
+        """
+        labels = self.long_text.labels
+        label_index = {label: i for i, label in enumerate(labels)}
+        probs = np.zeros((len(segments), len(labels)), dtype=np.float32)
+        
+        texts = [segment.get('text', '') for segment in segments]
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        
+        if indices:
+            if self.cache is None:
+                probs[indices] = self.long_text.predict_proba([texts[i] for i in indices], batch_size)
+            else:
+                for i, result in zip(indices, self._classify([texts[i] for i in indices], batch_size)):
+                    for item in result:
+                        probs[i, label_index[item['label']]] = item['score']
+        
+        # Пустые сегменты показываем нейтральными
+        neutral = next((label_index[label] for label in ('no_emotion', 'neutral') if label in label_index), None)
+        empty = np.ones(len(segments), dtype=bool)
+        empty[indices] = False
+        if neutral is not None:
+            probs[empty, neutral] = 1.0
+        
+        durations = np.array([
+            segment.get('duration', segment.get('end', 0) - segment.get('start', 0)) or 1.0
+            for segment in segments
+        ], dtype=np.float32)
+        # ...но без веса: паузы и нераспознанные участки не добавляют "нейтрально" в статистику
+        durations[empty] = 0.0
+        speakers = [segment.get('speaker', 'unknown') for segment in segments]
+        
+        # Нормируем строки в распределение (модель может быть multi-label)
+        row_sums = probs.sum(axis=1, keepdims=True)
+        distribution = probs / np.maximum(row_sums, 1e-9)
+        weighted = distribution * durations[:, None]
+        
+        speaker_names, speaker_ids = np.unique(np.array(speakers, dtype=object), return_inverse=True) \
+            if segments else (np.array([], dtype=object), np.array([], dtype=int))
+        one_hot = np.zeros((len(speaker_names), len(segments)), dtype=np.float32)
+        one_hot[speaker_ids, np.arange(len(segments))] = 1.0
+        by_speaker = one_hot @ weighted
+        
+        labels_ru = [self.emotion_map.get(label, label) for label in labels]
+        
+        top = probs.argmax(axis=1) if len(segments) else np.array([], dtype=int)
+        segment_emotions = [
+            {
+                "emotion_eng": labels[j],
+                "emotion_ru": labels_ru[j],
+                "score": round(float(probs[i, j]), 3)
+            }
+            for i, j in enumerate(top)
+        ]
+        
+        overall = weighted.sum(axis=0)
+        return {
+            "labels": labels,
+            "labels_ru": labels_ru,
+            "probabilities": probs,
+            "segments": segment_emotions,
+            "emotion_stats": self._to_percentages(overall, labels_ru),
+            "emotion_stats_by_speaker": {
+                str(name): self._to_percentages(row, labels_ru)
+                for name, row in zip(speaker_names, by_speaker)
+            },
+            "dominant_emotion": labels_ru[int(overall.argmax())] if overall.sum() > 0 else "нейтрально"
+        }
+    
+    def _to_percentages(self, totals, labels_ru):
+        """Доли эмоций в процентах; одинаковые русские метки суммируются"""
+        total = float(totals.sum())
+        stats = {}
+        for label, value in zip(labels_ru, totals):
+            stats[label] = stats.get(label, 0.0) + (float(value) / total * 100 if total else 0.0)
+        return {label: round(value, 1) for label, value in stats.items()}
\ No newline at end of file
@@ -0,0 +1,106 @@
+# import_benchmark.py - Время импорта модулей utils и контроль тяжелых зависимостей
+import os
+import sys
+import subprocess
+
+# Зависимости, которые не должны загружаться при импорте модуля
+# (их загружает сам анализатор при первом использовании)
+HEAVY_MODULES = ("torch", "transformers", "onnxruntime", "tokenizers", "sklearn", "scipy",
+                 "yake", "pymorphy2", "pymorphy3", "vosk", "librosa")
+
+# Модуль -> тяжелые зависимости, запрещенные при его импорте
+IMPORT_BUDGETS = {
+    "utils.ner": HEAVY_MODULES,
+    "utils.profanity": HEAVY_MODULES,
+    "utils.sentiment": HEAVY_MODULES,
+    "utils.emotion": HEAVY_MODULES,
+    "utils.intent": HEAVY_MODULES,
+    "utils.keywords": HEAVY_MODULES,
+    "utils.keyword_index": HEAVY_MODULES,
+    "utils.lexicon_snapshot": HEAVY_MODULES,
+    "utils.diarization": HEAVY_MODULES,
+    "utils.transcribe": HEAVY_MODULES,
+    "utils.pipeline": HEAVY_MODULES,
+}
+
+
+def parse_importtime(stderr):
+    """
+    Разбор вывода python -X importtime
+
+    Returns:
+        dict: {модуль: (собственное время, накопленное время) в микросекундах}
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module_name, heavy_modules=HEAVY_MODULES):
+    """
+    Импорт модуля в чистом интерпретаторе
+
+    Args:
+        module_name: имя модуля
+        heavy_modules: пакеты, загрузку которых нужно отметить
+
+    Returns:
+        dict: время импорта (мс), число загруженных модулей и найденные тяжелые зависимости
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=package_root, capture_output=True, text=True
+    )
+    timings = parse_importtime(completed.stderr)
+
+    heavy = sorted({name.split(".")[0] for name in timings if name.split(".")[0] in heavy_modules})
+    cumulative_us = timings.get(module_name, (0, 0))[1]
+    return {
+        "module": module_name,
+        "ok": completed.returncode == 0,
+        "import_ms": round(cumulative_us / 1000, 1),
+        "modules_loaded": len(timings),
+        "heavy_imports": heavy
+    }
+
+
+def check_imports(budgets=None):
+    """
+    Проверка, что импорт модулей не тянет запрещенные зависимости
+
+    Returns:
+        tuple: (все проверки пройдены, результаты по модулям)
+    """
+    budgets = budgets or IMPORT_BUDGETS
+    results = []
+    passed = True
+
+    for module_name, forbidden in budgets.items():
+        result = measure_import(module_name, tuple(HEAVY_MODULES) + tuple(forbidden))
+        result["violations"] = [name for name in result["heavy_imports"] if name in forbidden]
+        if not result["ok"] or result["violations"]:
+            passed = False
+        results.append(result)
+
+    return passed, results
+
+
+if __name__ == "__main__":
+    # python -m utils.import_benchmark [модуль ...] - код возврата 1 при нарушении
+    modules = sys.argv[1:]
+    budgets = {name: IMPORT_BUDGETS.get(name, HEAVY_MODULES) for name in modules} if modules else None
+    passed, results = check_imports(budgets)
+
+    print(f"{'модуль':<20} {'импорт, мс':>11} {'модулей':>8}  тяжелые зависимости")
+    for result in results:
+        status = "ОШИБКА ИМПОРТА" if not result["ok"] else ", ".join(result["heavy_imports"]) or "-"
+        print(f"{result['module']:<20} {result['import_ms']:>11} {result['modules_loaded']:>8}  {status}")
+
+    if not passed:
+        print("Импорт тянет тяжелые зависимости - перенесите импорт внутрь анализатора")
+        sys.exit(1)
@@ -0,0 +1,253 @@
+# inference_cache.py - Двухуровневый кэш результатов текстовых моделей
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# База лежит в data/ пакета, а не в текущем каталоге процесса
+INFERENCE_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    "data", "inference_cache.db")
+
+
+def normalize_text(text):
+    """Нормализация текста для ключа кэша (Unicode NFC, схлопывание пробелов)"""
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+# (модель, бэкенд, каталог ONNX) -> ревизия; определяется один раз на процесс
+_revisions = {}
+
+
+def config_revision(model_name):
+    """
+    Ревизия модели по файлам на диске, без загрузки весов: для локальной
+    модели - путь и время изменения config.json, для модели хаба - хэш
+    коммита из локального кэша (каталог снимка snapshots/<commit>/)
+
+    Returns:
+        str или None, если модель еще не скачана
+    """
+    config_path = os.path.join(model_name, "config.json")
+    if os.path.isfile(config_path):
+        return f"{os.path.abspath(model_name)}@{os.stat(config_path).st_mtime_ns}"
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        cached = try_to_load_from_cache(model_name, "config.json")
+    except (ImportError, ValueError):
+        return None
+    return os.path.basename(os.path.dirname(cached)) if isinstance(cached, str) else None
+
+
+def model_revision(pipe):
+    """
+    Ревизия модели для ключа кэша. Для ModelHandle реестра определяется
+    без загрузки модели (config_revision) и запоминается, поэтому звонок,
+    целиком найденный в кэше, не загружает модель. Модель, которой еще
+    нет на диске, и готовые пайплайны - по хэшу коммита в конфигурации.
+    """
+    from .model_registry import ModelHandle
+    if isinstance(pipe, ModelHandle):
+        key = (pipe.model_name, pipe.backend, pipe.onnx_dir)
+        revision = _revisions.get(key)
+        if revision is None:
+            revision = config_revision(pipe.model_name) or model_revision(pipe.get())
+            if pipe.backend != "torch":
+                revision = f"{revision}:{pipe.backend}"
+            _revisions[key] = revision
+        return revision
+
+    config = getattr(pipe, "config", None) or pipe.model.config
+    return getattr(config, "_commit_hash", None) or getattr(config, "_name_or_path", "") or "unknown"
+
+
+class InferenceCache:
+    """
+    Кэш результатов моделей: LRU в памяти процесса + SQLite на диске.
+    Ключ - хэш нормализованного текста, имени и ревизии модели.
+    Значения хранятся в JSON, поэтому кэшировать можно только
+    сериализуемые результаты (словари, списки, числа).
+    """
+
+    def __init__(self, db_path=INFERENCE_CACHE_PATH, memory_size=10000,
+                 max_disk_entries=1000000):
+        """
+        Args:
+            db_path: путь к файлу SQLite (None - только кэш в памяти)
+            memory_size: число записей в LRU процесса
+            max_disk_entries: лимит записей на диске, старые вытесняются
+        """
+        self.memory_size = memory_size
+        self.max_disk_entries = max_disk_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats_counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._writes_since_evict = 0
+
+        self.db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)")
+            self.db.commit()
+
+    def make_key(self, model_key, text):
+        digest = hashlib.sha1()
+        digest.update(model_key.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(normalize_text(text).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model_key, texts):
+        """
+        Поиск результатов для списка текстов
+
+        Returns:
+            tuple: (результаты, None для промахов; ключи кэша)
+        """
+        keys = [self.make_key(model_key, text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    results[i] = self.memory[key]
+                    self.stats_counters["memory_hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing and self.db is not None:
+                found = {}
+                key_list = list(missing)
+                for start in range(0, len(key_list), 500):
+                    chunk = key_list[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self.db.execute(
+                        f"SELECT key, value FROM results WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    found.update(rows)
+
+                if found:
+                    now = time.time()
+                    self.db.executemany(
+                        "UPDATE results SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in found]
+                    )
+                    self.db.commit()
+
+                for key, raw in found.items():
+                    value = json.loads(raw)
+                    self._remember(key, value)
+                    for i in missing.pop(key):
+                        results[i] = value
+                        self.stats_counters["disk_hits"] += 1
+
+            self.stats_counters["misses"] += sum(len(indices) for indices in missing.values())
+
+        return results, keys
+
+    def put_many(self, keys, values):
+        """Сохранение результатов по ключам из get_many"""
+        with self.lock:
+            for key, value in zip(keys, values):
+                self._remember(key, value)
+
+            if self.db is not None:
+                now = time.time()
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)",
+                    [(key, json.dumps(value, ensure_ascii=False), now) for key, value in zip(keys, values)]
+                )
+                self.db.commit()
+                self._writes_since_evict += len(keys)
+                if self._writes_since_evict >= 1000:
+                    self._evict_disk()
+
+    def _evict_disk(self):
+        """Удаление давно не использованных записей сверх лимита"""
+        self._writes_since_evict = 0
+        (count,) = self.db.execute("SELECT COUNT(*) FROM results").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            self.db.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,)
+            )
+            self.db.commit()
+
+    def cached_batch(self, model_key, texts, compute):
+        """
+        Результаты модели для списка текстов с использованием кэша
+
+        Args:
+            model_key: имя модели, задача и ревизия (часть ключа)
+            texts: список текстов
+            compute: функция, считающая результаты для списка текстов-промахов
+
+        Returns:
+            list: результаты в порядке texts
+        """
+        results, keys = self.get_many(model_key, texts)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        # Повторяющиеся в пакете тексты считаем один раз
+        unique = {}
+        for i in missing:
+            unique.setdefault(keys[i], i)
+
+        computed = compute([texts[i] for i in unique.values()])
+        self.put_many(list(unique), computed)
+
+        by_key = dict(zip(unique, computed))
+        for i in missing:
+            results[i] = by_key[keys[i]]
+        return results
+
+    def stats(self):
+        """Счетчики попаданий и промахов"""
+        with self.lock:
+            counters = dict(self.stats_counters)
+            disk_entries = None
+            if self.db is not None:
+                (disk_entries,) = self.db.execute("SELECT COUNT(*) FROM results").fetchone()
+
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": disk_entries
+        }
+
+
+_default_cache = None
+
+
+def get_inference_cache():
+    """Общий для процесса экземпляр кэша"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = InferenceCache()
+    return _default_cache
@@ -2,12 +2,93 @@
 import re
 from collections import Counter
 
+import numpy as np
+
+from .lexicon import TOKEN_RE, trie_regex
+from .lemmatizer import get_lemmatizer
+from .embeddings import PROTOTYPE_DIR
+
+# Паттерн без этих символов - обычная строка
+REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+
+
+class IntentPatternMatcher:
+    """
+    Все паттерны намерений, скомпилированные в одно регулярное выражение.
+    Текст сканируется один раз; результат - число совпадений каждого
+    паттерна, как у re.findall по отдельности (перекрытия разных паттернов,
+    например "помощь" внутри "техническая помощь", тоже считаются).
+    """
+    
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: список строк-паттернов (столбцы матрицы счетчиков)
+        """
+        self.patterns = list(patterns)
+        # Литералы ищутся общим автоматом, настоящие регулярные выражения - отдельно
+        literals = sorted({p for p in self.patterns if p and not REGEX_SPECIAL.intersection(p)},
+                          key=len, reverse=True)
+        self.literal_index = {literal: i for i, literal in enumerate(literals)}
+        self.literal_lengths = [len(literal) for literal in literals]
+        self.regex_columns = [(i, re.compile(p)) for i, p in enumerate(self.patterns)
+                              if p not in self.literal_index]
+        self.literal_columns = [[] for _ in literals]
+        for i, p in enumerate(self.patterns):
+            if p in self.literal_index:
+                self.literal_columns[self.literal_index[p]].append(i)
+        
+        # Просмотр вперед проверяет каждую позицию и находит самый длинный литерал;
+        # все совпадающие в этой позиции литералы - его префиксы
+        self.prefixes = {
+            literal: [self.literal_index[other] for other in literals if literal.startswith(other)]
+            for literal in literals
+        }
+        self.regex = re.compile("(?=(" + trie_regex(literals) + "))") if literals else None
+    
+    def count(self, text_lower):
+        """
+        Счетчики совпадений паттернов в тексте (уже в нижнем регистре)
+        
+        Returns:
+            dict: {номер паттерна: число совпадений}, только ненулевые
+        """
+        counts = {}
+        
+        if self.regex is not None:
+            literal_counts = {}
+            # Совпадения одного паттерна не перекрываются, как в re.findall
+            last_end = {}
+            for match in self.regex.finditer(text_lower):
+                pos = match.start()
+                for j in self.prefixes[match.group(1)]:
+                    if pos >= last_end.get(j, 0):
+                        literal_counts[j] = literal_counts.get(j, 0) + 1
+                        last_end[j] = pos + self.literal_lengths[j]
+            
+            for j, n in literal_counts.items():
+                for column in self.literal_columns[j]:
+                    counts[column] = n
+        
+        for i, pattern in self.regex_columns:
+            n = len(pattern.findall(text_lower))
+            if n:
+                counts[i] = n
+        
+        return counts
+
+
 class IntentDetector:
     """
     Детектор намерений для телефонных звонков
     """
     
-    def __init__(self):
+    def __init__(self, use_snapshot=True):
+        """
+        Args:
+            use_snapshot: брать словари и матрицы намерений из снимка data/
+                          (см. lexicon_snapshot) и подхватывать его обновления
+        """
         # Паттерны для определения намерений
         self.intent_patterns = {
             "жалоба": [
@@ -55,7 +136,9 @@ class IntentDetector:
             "сотрудничество": 0.7
         }
         
-        # Ключевые слова для каждого намерения
+        # Ключевые слова для каждого намерения (сравниваются по нормальным
+        # формам: "доставку", "доставкой" находят "доставка")
+        self.lemmatizer = get_lemmatizer()
         self.intent_keywords = {
             "жалоба": ["брак", "неисправность", "возврат", "претензия", "жалоба"],
             "консультация": ["как", "подскажите", "вопрос", "интересно"],
@@ -65,6 +148,81 @@ class IntentDetector:
             "статус": ["статус", "где", "когда", "отследить"],
             "сотрудничество": ["оптом", "партнер", "сотрудничество", "скидка"]
         }
+        
+        # Готовые словари и матрицы из снимка заменяют встроенные
+        self._snapshot = None
+        if use_snapshot:
+            from .lexicon_snapshot import SnapshotLink
+            self._snapshot = SnapshotLink(self._apply_snapshot)
+            self._snapshot.sync()
+    
+    def snapshot_state(self):
+        """Раздел снимка словарей"""
+        return {"intent": {
+            "intent_patterns": self.intent_patterns,
+            "intent_weights": self.intent_weights,
+            "intent_keywords": self.intent_keywords,
+            "compiled": self._compiled()
+        }}
+    
+    def _apply_snapshot(self, data):
+        section = data["intent"]
+        self.intent_patterns = section["intent_patterns"]
+        self.intent_weights = section["intent_weights"]
+        self.intent_keywords = section["intent_keywords"]
+        self._compiled_cache = section["compiled"]
+    
+    def _compiled(self):
+        """
+        Скомпилированные паттерны и словарь ключевых слов.
+        Пересобираются, если intent_patterns или intent_keywords изменили.
+        """
+        if self._snapshot is not None:
+            self._snapshot.sync()
+        source = (
+            tuple((intent, tuple(patterns)) for intent, patterns in self.intent_patterns.items()),
+            tuple((intent, tuple(keywords)) for intent, keywords in self.intent_keywords.items())
+        )
+        compiled = getattr(self, '_compiled_cache', None)
+        if compiled is not None and compiled['source'] == source:
+            return compiled
+        
+        intents = list(dict.fromkeys(
+            list(self.intent_patterns.keys()) + list(self.intent_keywords.keys())
+        ))
+        intent_index = {intent: i for i, intent in enumerate(intents)}
+        
+        # Столбцы - пары (намерение, паттерн) в исходном порядке
+        pattern_columns = [(intent, pattern) for intent, patterns in self.intent_patterns.items()
+                           for pattern in patterns]
+        pattern_to_intent = np.zeros((len(pattern_columns), len(intents)))
+        for i, (intent, _) in enumerate(pattern_columns):
+            pattern_to_intent[i, intent_index[intent]] = 1.0
+        
+        # Ключевые слова - нормальные формы целых слов; повтор слова в списке учитывается дважды
+        vocabulary = {}
+        for keywords in self.intent_keywords.values():
+            for keyword in keywords:
+                vocabulary.setdefault(self._keyword_lemma(keyword), len(vocabulary))
+        keyword_to_intent = np.zeros((len(vocabulary), len(intents)))
+        for intent, keywords in self.intent_keywords.items():
+            for keyword in keywords:
+                keyword_to_intent[vocabulary[self._keyword_lemma(keyword)], intent_index[intent]] += 1.0
+        
+        self._compiled_cache = {
+            'source': source,
+            'intents': intents,
+            'matcher': IntentPatternMatcher([pattern for _, pattern in pattern_columns]),
+            'pattern_columns': pattern_columns,
+            'pattern_to_intent': pattern_to_intent,
+            'vocabulary': vocabulary,
+            'keyword_to_intent': keyword_to_intent
+        }
+        return self._compiled_cache
+    
+    def _keyword_lemma(self, keyword):
+        """Нормальная форма ключевого слова (слова фразы - через пробел)"""
+        return " ".join(self.lemmatizer.lemmatize_text(keyword))
     
     def detect_intent_patterns(self, text):
         """
@@ -73,17 +231,21 @@ class IntentDetector:
         Returns:
             dict: намерения с оценками
         """
-        text_lower = text.lower()
+        compiled = self._compiled()
+        counts = compiled['matcher'].count(text.lower())
+        pattern_counts = {}
+        for column in sorted(counts):
+            intent = compiled['pattern_columns'][column][0]
+            pattern_counts.setdefault(intent, []).append(counts[column])
         intent_scores = {}
         
         for intent, patterns in self.intent_patterns.items():
             score = 0
             
-            for pattern in patterns:
-                matches = re.findall(pattern, text_lower)
-                if matches:
+            for n in pattern_counts.get(intent, []):
+                if n:
                     # Учитываем количество совпадений
-                    score += len(matches) * 0.1
+                    score += n * 0.1
                     # Бонус за точное совпадение
                     score += 0.05
             
@@ -101,8 +263,7 @@ class IntentDetector:
         Returns:
             dict: намерения с оценками
         """
-        words = text.lower().split()
-        word_counts = Counter(words)
+        word_counts = Counter(self.lemmatizer.lemmatize_text(text))
         
         intent_scores = {}
         
@@ -110,9 +271,10 @@ class IntentDetector:
             score = 0
             
             for keyword in keywords:
-                if keyword in word_counts:
+                lemma = self._keyword_lemma(keyword)
+                if lemma in word_counts:
                     # Учитываем частоту ключевых слов
-                    score += word_counts[keyword] * 0.15
+                    score += word_counts[lemma] * 0.15
             
             if score > 0:
                 weighted_score = score * self.intent_weights.get(intent, 1.0)
@@ -131,6 +293,10 @@ class IntentDetector:
         pattern_scores = self.detect_intent_patterns(text)
         keyword_scores = self.detect_intent_keywords(text)
         
+        return self._combine_scores(pattern_scores, keyword_scores)
+    
+    def _combine_scores(self, pattern_scores, keyword_scores):
+        """Итоговый результат по оценкам паттернов и ключевых слов"""
         # Объединяем оценки
         all_intents = set(list(pattern_scores.keys()) + list(keyword_scores.keys()))
         combined_scores = {}
@@ -170,6 +336,63 @@ class IntentDetector:
             "keyword_scores": keyword_scores
         }
     
+    def detect_intent_batch(self, texts):
+        """
+        Пакетное определение намерений. Каждый текст сканируется один раз,
+        счетчики паттернов и ключевых слов собираются в матрицы
+        (тексты x паттерны, тексты x слова), оценки намерений считаются
+        умножением на матрицы принадлежности и вектор intent_weights.
+        
+        Args:
+            texts: список текстов
+            
+        Returns:
+            list: результаты в формате detect_intent_combined, в порядке texts
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        
+        compiled = self._compiled()
+        matcher = compiled['matcher']
+        vocabulary = compiled['vocabulary']
+        intents = compiled['intents']
+        
+        # Слова всех текстов лемматизируются одним вызовом
+        words = [TOKEN_RE.findall(text) for text in texts]
+        lemmas = self.lemmatizer.lemmatize([word for text_words in words for word in text_words])
+        
+        pattern_counts = np.zeros((len(texts), len(matcher.patterns)))
+        keyword_counts = np.zeros((len(texts), len(vocabulary)))
+        offset = 0
+        for row, text in enumerate(texts):
+            for column, n in matcher.count(text.lower()).items():
+                pattern_counts[row, column] = n
+            for lemma in lemmas[offset:offset + len(words[row])]:
+                column = vocabulary.get(lemma)
+                if column is not None:
+                    keyword_counts[row, column] += 1
+            offset += len(words[row])
+        
+        weights = np.array([self.intent_weights.get(intent, 1.0) for intent in intents])
+        # 0.1 за каждое совпадение паттерна и 0.05 за паттерн, найденный хотя бы раз
+        pattern_features = pattern_counts * 0.1 + (pattern_counts > 0) * 0.05
+        pattern_matrix = (pattern_features @ compiled['pattern_to_intent']) * weights
+        keyword_matrix = (keyword_counts @ compiled['keyword_to_intent']) * 0.15 * weights
+        
+        pattern_order = [i for i, intent in enumerate(intents) if intent in self.intent_patterns]
+        keyword_order = [i for i, intent in enumerate(intents) if intent in self.intent_keywords]
+        
+        results = []
+        for row in range(len(texts)):
+            pattern_scores = {intents[i]: round(float(pattern_matrix[row, i]), 3)
+                              for i in pattern_order if pattern_matrix[row, i] > 0}
+            keyword_scores = {intents[i]: round(float(keyword_matrix[row, i]), 3)
+                              for i in keyword_order if keyword_matrix[row, i] > 0}
+            results.append(self._combine_scores(pattern_scores, keyword_scores))
+        
+        return results
+    
     def detect_intent_segments(self, segments):
         """
         Определение намерений по сегментам диалога
@@ -182,22 +405,24 @@ class IntentDetector:
         """
         segment_intents = []
         
-        for i, segment in enumerate(segments):
-            if 'text' in segment and segment['text'].strip():
-                text = segment['text']
-                intent_result = self.detect_intent_combined(text)
-                
-                segment_intent = {
-                    'segment_id': i,
-                    'speaker': segment.get('speaker', 'unknown'),
-                    'start_time': segment.get('start', 0),
-                    'text_preview': text[:100] + "..." if len(text) > 100 else text,
-                    'main_intent': intent_result['main_intent'],
-                    'intent_score': intent_result['main_intent_score'],
-                    'confidence': intent_result['confidence']
-                }
-                
-                segment_intents.append(segment_intent)
+        indexed = [(i, segment) for i, segment in enumerate(segments)
+                   if 'text' in segment and segment['text'].strip()]
+        batch_results = self.detect_intent_batch([segment['text'] for _, segment in indexed])
+        
+        for (i, segment), intent_result in zip(indexed, batch_results):
+            text = segment['text']
+            
+            segment_intent = {
+                'segment_id': i,
+                'speaker': segment.get('speaker', 'unknown'),
+                'start_time': segment.get('start', 0),
+                'text_preview': text[:100] + "..." if len(text) > 100 else text,
+                'main_intent': intent_result['main_intent'],
+                'intent_score': intent_result['main_intent_score'],
+                'confidence': intent_result['confidence']
+            }
+            
+            segment_intents.append(segment_intent)
         
         # Определяем общее намерение звонка
         if segment_intents:
@@ -303,55 +528,158 @@ class IntentDetector:
 
 class MLIntentDetector(IntentDetector):
     """
-    Детектор намерений с ML-компонентами
+    Детектор намерений с ML-компонентами.
+    Режим "zero-shot" - NLI-классификация (один прогон модели на каждую
+    метку-кандидат), режим "embedding" - один вектор на текст и сравнение
+    с векторами-прототипами намерений из примеров intent_patterns.
     """
     
-    def __init__(self, use_ml=True):
+    def __init__(self, use_ml=True, use_cache=True, backend="torch", onnx_dir=None,
+                 mode="zero-shot", encoder_model="cointegrated/rubert-tiny2",
+                 prototype_dir=PROTOTYPE_DIR, temperature=0.05):
+        """
+        Args:
+            use_ml: использовать ML модель
+            use_cache: кэшировать результаты модели
+            backend: "torch" - пайплайн transformers, "onnx" - int8-модель на ONNX Runtime
+                     (только для режима zero-shot)
+            onnx_dir: каталог экспортированной модели (по умолчанию data/onnx/<модель>)
+            mode: "zero-shot" или "embedding"
+            encoder_model: кодировщик предложений для режима embedding
+            prototype_dir: каталог для прототипов намерений на диске
+                           (по умолчанию data/prototypes пакета, None - без кэша на диске)
+            temperature: температура softmax по косинусным близостям (режим embedding)
+        """
         super().__init__()
         self.use_ml = use_ml
+        self.mode = mode
+        self.cache = None
+        self.temperature = temperature
+        self.prototype_dir = prototype_dir
+        self._prototypes = None
+        self._ml_available = None if use_ml else False
         
         if use_ml:
-            try:
-                from transformers import pipeline
+            from .inference_cache import get_inference_cache
+            from .model_registry import get_model_registry
+            
+            if mode == "embedding":
+                from .embeddings import SentenceEncoder
+                self.model_name = encoder_model
+                self.encoder = SentenceEncoder(encoder_model)
+                self.classifier = self.encoder.model
+            else:
                 # Можно использовать модель для классификации текста
-                self.classifier = pipeline(
-                    "zero-shot-classification",
-                    model="cointegrated/rubert-tiny2-cedr-emotion-detection"
+                self.model_name = "cointegrated/rubert-tiny2-cedr-emotion-detection"
+                # Общий реестр: тот же чекпойнт, что у EmotionAnalyzer, загружается один раз
+                self.classifier = get_model_registry().handle(
+                    "zero-shot-classification", self.model_name, backend=backend, onnx_dir=onnx_dir
                 )
-                self.ml_available = True
-            except:
+            if use_cache:
+                self.cache = get_inference_cache()
+    
+    @property
+    def ml_available(self):
+        """Доступна ли ML модель (загружается при первом обращении)"""
+        if self._ml_available is None:
+            try:
+                self.classifier.get(count_hit=False)
+                self._ml_available = True
+            except Exception:
                 print("ML модель не загружена, используется rule-based")
-                self.ml_available = False
-        else:
-            self.ml_available = False
+                self._ml_available = False
+        return self._ml_available
+    
+    @property
+    def prototypes(self):
+        """Прототипы намерений (пересчитываются, если изменили intent_patterns)"""
+        from .embeddings import LabelPrototypes
+        
+        examples = {intent: list(patterns) for intent, patterns in self.intent_patterns.items()}
+        if self._prototypes is None or self._prototypes.examples != examples:
+            self._prototypes = LabelPrototypes(self.encoder, examples, self.prototype_dir)
+        return self._prototypes
+    
+    @property
+    def cache_key(self):
+        from .inference_cache import model_revision
+        if self.mode == "embedding":
+            # Хэш прототипов учитывает модель, ее ревизию и примеры намерений
+            return f"intent-embedding:{self.prototypes.cache_key()}:{self.temperature}"
+        # Набор меток входит в ключ: при его изменении кэш не используется
+        labels = ",".join(self.intent_patterns.keys())
+        return f"zero-shot:{self.model_name}:{model_revision(self.classifier)}:{labels}"
+    
+    def _classify(self, texts):
+        """Метки и оценки для списка текстов, по убыванию оценки"""
+        if self.mode == "embedding":
+            prototypes = self.prototypes
+            probs = prototypes.predict_proba(texts, self.temperature)
+            results = []
+            for row in probs:
+                order = np.argsort(-row)
+                results.append({
+                    "labels": [prototypes.labels[i] for i in order],
+                    "scores": [float(row[i]) for i in order]
+                })
+            return results
+        
+        # Кандидаты намерений
+        candidate_intents = list(self.intent_patterns.keys())
+        results = [
+            self.classifier(item, candidate_labels=candidate_intents, multi_label=False)
+            for item in texts
+        ]
+        return [{"labels": r["labels"], "scores": r["scores"]} for r in results]
     
     def detect_intent_ml(self, text):
         """
         Определение намерений с помощью ML
         """
-        if not self.ml_available or not text.strip():
-            return self.detect_intent_combined(text)
+        return self.detect_intent_ml_batch([text])[0]
+    
+    def detect_intent_ml_batch(self, texts):
+        """
+        Пакетное определение намерений с помощью ML. В режиме embedding
+        каждый текст кодируется один раз, оценки всех намерений для всего
+        пакета - одно матричное умножение на прототипы.
         
-        # Кандидаты намерений
-        candidate_intents = list(self.intent_patterns.keys())
+        Returns:
+            list: результаты в порядке texts
+        """
+        texts = list(texts)
+        if not self.ml_available:
+            return self.detect_intent_batch(texts)
+        
+        indices = [i for i, text in enumerate(texts) if text.strip()]
+        results = [None] * len(texts)
         
         try:
-            result = self.classifier(
-                text,
-                candidate_labels=candidate_intents,
-                multi_label=False
-            )
-            
-            return {
+            items = [texts[i] for i in indices]
+            if self.cache is not None:
+                outputs = self.cache.cached_batch(self.cache_key, items, self._classify)
+            else:
+                outputs = self._classify(items)
+        except Exception as e:
+            print(f"ML детектирование не удалось: {e}")
+            return self.detect_intent_batch(texts)
+        
+        method = "embedding" if self.mode == "embedding" else "ml"
+        for i, result in zip(indices, outputs):
+            results[i] = {
                 "main_intent": result['labels'][0],
                 "main_intent_score": round(result['scores'][0], 3),
                 "confidence": "высокая" if result['scores'][0] > 0.7 else "средняя",
                 "all_intents": dict(zip(result['labels'], result['scores'])),
-                "method": "ml"
+                "method": method
             }
-        except Exception as e:
-            print(f"ML детектирование не удалось: {e}")
-            return self.detect_intent_combined(text)
+        
+        # Пустые тексты - как раньше, через правила
+        empty = [i for i in range(len(texts)) if results[i] is None]
+        for i, result in zip(empty, self.detect_intent_batch([texts[i] for i in empty])):
+            results[i] = result
+        
+        return results
 
 
 if __name__ == "__main__":
@@ -386,4 +714,9 @@ if __name__ == "__main__":
         for intent, score in sorted_intents:
             print(f"  - {intent}: {score}")
         
-        print("-" * 50)
\ No newline at end of file
+        print("-" * 50)    
+    # Пакетный режим дает те же оценки, что и поштучный
+    batch_results = detector.detect_intent_batch(test_texts)
+    same = all(batch == detector.detect_intent_combined(text)
+               for text, batch in zip(test_texts, batch_results))
+    print(f"Пакетный режим совпадает с поштучным: {same}")
\ No newline at end of file
@@ -0,0 +1,361 @@
+# keyword_index.py - Инкрементальный TF-IDF индекс ключевых слов по всем звонкам
+import os
+import math
+import time
+import sqlite3
+import threading
+from collections import Counter
+
+from .lexicon import TOKEN_RE
+
+SECONDS_PER_DAY = 86400
+
+# Индекс лежит в data/ пакета, а не в текущем каталоге процесса
+KEYWORD_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "data", "keyword_index.db")
+
+# Служебные слова разговорной речи (нормальные формы), не бывают ключевыми
+STOPWORDS = frozenset("""
+и в во не что он на я с со как а то все всё она так его но да ты к у же вы за бы по только
+ее её мне было вот от меня еще ещё нет о из ему теперь когда даже ну вдруг ли если уже или
+ни быть был него до вас нибудь опять уж вам ведь там потом себя ничто ей может они тут где
+есть надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже себе под будет
+ж тогда кто этот тот который какой мой наш ваш свой весь это этого того чтобы можно
+очень просто сейчас здравствуйте пожалуйста спасибо алло добрый день хорошо ладно понятно
+да-да угу ага минуточку сказать говорить хотеть мочь знать
+""".split())
+
+
+class KeywordIndex:
+    """
+    Корпусный индекс ключевых слов. Каждый звонок добавляется один раз:
+    его нормальные формы слов сохраняются в разреженном виде (звонок, слово,
+    частота), документные частоты обновляются приращением - глобально
+    и по дневным корзинам. Запросы (отличительные слова звонка, растущие
+    темы за период) читают только агрегаты и не перечитывают транскрипты.
+    Дневные корзины старше daily_retention_days при уплотнении
+    сворачиваются в недельные.
+    """
+
+    def __init__(self, db_path=KEYWORD_INDEX_PATH, min_token_length=3, lemmatize=True,
+                 compact_every=1000, daily_retention_days=60):
+        """
+        Args:
+            db_path: файл SQLite (":memory:" - индекс в памяти)
+            min_token_length: более короткие слова не индексируются
+            lemmatize: индексировать нормальные формы (общий Lemmatizer)
+            compact_every: автоматическое уплотнение после стольких добавлений
+            daily_retention_days: сколько дней хранить дневные корзины
+        """
+        self.min_token_length = min_token_length
+        self.compact_every = compact_every
+        self.daily_retention_days = daily_retention_days
+        self.lemmatizer = None
+        if lemmatize:
+            from .lemmatizer import get_lemmatizer
+            self.lemmatizer = get_lemmatizer()
+
+        self.lock = threading.Lock()
+        self._adds_since_compact = 0
+        self.term_ids = {}
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS terms (
+                term_id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL, df INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS calls (
+                doc_id INTEGER PRIMARY KEY, call_id TEXT UNIQUE NOT NULL,
+                day INTEGER NOT NULL, n_tokens INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS calls_day ON calls(day);
+            CREATE TABLE IF NOT EXISTS call_terms (
+                doc_id INTEGER NOT NULL, term_id INTEGER NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (doc_id, term_id)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS buckets (
+                start_day INTEGER NOT NULL, span INTEGER NOT NULL, term_id INTEGER NOT NULL,
+                df INTEGER NOT NULL, PRIMARY KEY (start_day, span, term_id)) WITHOUT ROWID;
+        """)
+        self.db.commit()
+        self.term_ids = dict(self.db.execute("SELECT term, term_id FROM terms"))
+
+    def terms_of(self, text):
+        """Счетчик нормальных форм значимых слов текста"""
+        tokens = [token.lower() for token in TOKEN_RE.findall(text)]
+        tokens = [token for token in tokens if len(token) >= self.min_token_length and not token.isdigit()]
+        if self.lemmatizer is not None:
+            tokens = self.lemmatizer.lemmatize(tokens)
+        return Counter(token.replace("ё", "е") for token in tokens if token not in STOPWORDS)
+
+    @staticmethod
+    def _day(timestamp):
+        if timestamp is None:
+            timestamp = time.time()
+        elif hasattr(timestamp, "timestamp"):
+            timestamp = timestamp.timestamp()
+        return int(timestamp // SECONDS_PER_DAY)
+
+    def _term_id(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.db.execute("INSERT INTO terms (term, df) VALUES (?, 0)", (term,)).lastrowid
+            self.term_ids[term] = term_id
+        return term_id
+
+    def _bucket_of(self, day):
+        """Корзина, в которую попадает день (дневная или уже свернутая недельная)"""
+        row = self.db.execute(
+            "SELECT start_day, span FROM buckets WHERE start_day <= ? AND start_day + span > ? "
+            "ORDER BY span DESC LIMIT 1", (day, day)
+        ).fetchone()
+        return row or (day, 1)
+
+    def add_call(self, call_id, text, timestamp=None, top_n=10):
+        """
+        Добавление звонка в индекс (повторное добавление заменяет звонок)
+
+        Args:
+            call_id: идентификатор звонка
+            text: транскрипт (или текст реплик)
+            timestamp: время звонка (unix-время или datetime, по умолчанию - сейчас)
+            top_n: число отличительных слов в ответе
+
+        Returns:
+            list: отличительные слова звонка (см. call_keywords)
+        """
+        counts = self.terms_of(text)
+        day = self._day(timestamp)
+
+        with self.lock:
+            self._remove(str(call_id))
+            doc_id = self.db.execute(
+                "INSERT INTO calls (call_id, day, n_tokens) VALUES (?, ?, ?)",
+                (str(call_id), day, sum(counts.values()))
+            ).lastrowid
+
+            rows = [(doc_id, self._term_id(term), tf) for term, tf in counts.items()]
+            term_ids = [(term_id,) for _, term_id, _ in rows]
+            start_day, span = self._bucket_of(day)
+
+            self.db.executemany("INSERT INTO call_terms (doc_id, term_id, tf) VALUES (?, ?, ?)", rows)
+            self.db.executemany("UPDATE terms SET df = df + 1 WHERE term_id = ?", term_ids)
+            self.db.executemany(
+                "INSERT INTO buckets (start_day, span, term_id, df) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (start_day, span, term_id) DO UPDATE SET df = df + 1",
+                [(start_day, span, term_id) for (term_id,) in term_ids]
+            )
+            self.db.commit()
+
+            self._adds_since_compact += 1
+            if self.compact_every and self._adds_since_compact >= self.compact_every:
+                self._compact()
+
+        return self.call_keywords(call_id, top_n)
+
+    def _remove(self, call_id):
+        row = self.db.execute("SELECT doc_id, day FROM calls WHERE call_id = ?", (call_id,)).fetchone()
+        if row is None:
+            return False
+
+        doc_id, day = row
+        term_ids = [(term_id,) for (term_id,) in
+                    self.db.execute("SELECT term_id FROM call_terms WHERE doc_id = ?", (doc_id,))]
+        start_day, span = self._bucket_of(day)
+
+        self.db.executemany("UPDATE terms SET df = df - 1 WHERE term_id = ?", term_ids)
+        self.db.executemany(
+            "UPDATE buckets SET df = df - 1 WHERE start_day = ? AND span = ? AND term_id = ?",
+            [(start_day, span, term_id) for (term_id,) in term_ids]
+        )
+        self.db.execute("DELETE FROM call_terms WHERE doc_id = ?", (doc_id,))
+        self.db.execute("DELETE FROM calls WHERE doc_id = ?", (doc_id,))
+        return True
+
+    def remove_call(self, call_id):
+        """Удаление звонка из индекса"""
+        with self.lock:
+            removed = self._remove(str(call_id))
+            self.db.commit()
+        return removed
+
+    def call_keywords(self, call_id, top_n=10):
+        """
+        Отличительные слова звонка по TF-IDF относительно всего корпуса
+
+        Returns:
+            list: [{term, score, tf, df}] по убыванию score
+        """
+        with self.lock:
+            row = self.db.execute("SELECT doc_id, n_tokens FROM calls WHERE call_id = ?", (str(call_id),)).fetchone()
+            if row is None:
+                return []
+            doc_id, n_tokens = row
+            (n_docs,) = self.db.execute("SELECT COUNT(*) FROM calls").fetchone()
+            rows = self.db.execute(
+                "SELECT t.term, ct.tf, t.df FROM call_terms ct JOIN terms t ON t.term_id = ct.term_id "
+                "WHERE ct.doc_id = ?", (doc_id,)
+            ).fetchall()
+
+        keywords = []
+        for term, tf, df in rows:
+            # Сглаженный idf: слово из каждого звонка получает минимальный вес
+            idf = math.log((n_docs + 1) / (df + 1)) + 1.0
+            keywords.append({
+                "term": term,
+                "score": round(tf / max(n_tokens, 1) * idf, 5),
+                "tf": tf,
+                "df": df
+            })
+
+        keywords.sort(key=lambda item: (-item["score"], item["term"]))
+        return keywords[:top_n]
+
+    def trending(self, start=None, end=None, top_n=20, min_df=2):
+        """
+        Темы, которые за период встречаются заметно чаще, чем в остальном корпусе
+
+        Args:
+            start, end: границы периода (unix-время или datetime; по умолчанию - последние 7 дней).
+                        Период расширяется до границ свернутых недельных корзин,
+                        которые он задевает: звонки и частоты слов считаются
+                        по одним и тем же дням
+            top_n: число слов
+            min_df: минимум звонков периода со словом
+
+        Returns:
+            list: [{term, df, share, baseline_share, lift, score}] по убыванию score
+        """
+        end_day = self._day(end) + 1
+        start_day = self._day(start) if start is not None else end_day - 7
+
+        with self.lock:
+            # Свернутые недельные корзины на границе периода учитываются целиком,
+            # поэтому и звонки считаются по всем дням этих корзин
+            first_day, last_day = self.db.execute(
+                "SELECT MIN(start_day), MAX(start_day + span) FROM buckets "
+                "WHERE start_day < ? AND start_day + span > ?", (end_day, start_day)
+            ).fetchone()
+            if first_day is not None:
+                start_day, end_day = min(start_day, first_day), max(end_day, last_day)
+
+            (n_total,) = self.db.execute("SELECT COUNT(*) FROM calls").fetchone()
+            (n_range,) = self.db.execute(
+                "SELECT COUNT(*) FROM calls WHERE day >= ? AND day < ?", (start_day, end_day)
+            ).fetchone()
+            rows = self.db.execute(
+                "SELECT t.term, SUM(b.df) AS range_df, t.df FROM buckets b "
+                "JOIN terms t ON t.term_id = b.term_id "
+                "WHERE b.start_day < ? AND b.start_day + b.span > ? "
+                "GROUP BY b.term_id HAVING range_df >= ?",
+                (end_day, start_day, min_df)
+            ).fetchall()
+
+        if not n_range:
+            return []
+
+        trending = []
+        n_outside = max(n_total - n_range, 0)
+        for term, range_df, total_df in rows:
+            share = range_df / n_range
+            # Доля вне периода со сглаживанием (новое слово не дает деления на ноль)
+            baseline = (max(total_df - range_df, 0) + 1) / (n_outside + 2)
+            lift = share / baseline
+            trending.append({
+                "term": term,
+                "df": range_df,
+                "share": round(share, 4),
+                "baseline_share": round(baseline, 4),
+                "lift": round(lift, 3),
+                "score": round(lift * math.log1p(range_df), 4)
+            })
+
+        trending.sort(key=lambda item: (-item["score"], item["term"]))
+        return trending[:top_n]
+
+    def _compact(self, vacuum=False):
+        self._adds_since_compact = 0
+        (max_day,) = self.db.execute("SELECT MAX(day) FROM calls").fetchone()
+        if max_day is not None:
+            cutoff = max_day - self.daily_retention_days
+            # Дневные корзины старше порога -> недельные (начало недели кратно 7 дням)
+            self.db.execute(
+                "INSERT INTO buckets (start_day, span, term_id, df) "
+                "SELECT (start_day / 7) * 7, 7, term_id, SUM(df) FROM buckets "
+                "WHERE span = 1 AND start_day < (? / 7) * 7 GROUP BY (start_day / 7) * 7, term_id "
+                "ON CONFLICT (start_day, span, term_id) DO UPDATE SET df = df + excluded.df",
+                (cutoff,)
+            )
+            self.db.execute("DELETE FROM buckets WHERE span = 1 AND start_day < (? / 7) * 7", (cutoff,))
+
+        # Нулевые записи остаются после удаления и замены звонков
+        self.db.execute("DELETE FROM buckets WHERE df <= 0")
+        self.db.execute("DELETE FROM terms WHERE df <= 0")
+        self.db.commit()
+        self.term_ids = dict(self.db.execute("SELECT term, term_id FROM terms"))
+
+        if vacuum:
+            self.db.execute("VACUUM")
+
+    def compact(self, vacuum=True):
+        """Свертка старых дневных корзин, удаление пустых записей и сжатие файла"""
+        with self.lock:
+            self._compact(vacuum)
+
+    def stats(self):
+        """Размер индекса"""
+        with self.lock:
+            counts = {
+                table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("calls", "terms", "call_terms", "buckets")
+            }
+        return counts
+
+
+_default_index = None
+
+
+def get_keyword_index():
+    """Общий для процесса индекс ключевых слов (data/keyword_index.db)"""
+    global _default_index
+    if _default_index is None:
+        _default_index = KeywordIndex()
+    return _default_index
+
+
+if __name__ == "__main__":
+    # Проверка скорости на синтетическом корпусе
+    import random
+    import tempfile
+
+    random.seed(0)
+    common = ["заказ", "оператор", "номер", "телефон", "вопрос", "минута", "адрес", "оплата", "клиент"]
+    topics = ["доставка", "курьер", "возврат", "гарантия", "приложение", "тариф", "скидка", "кабинет"]
+    rare = [f"товар{i}" for i in range(3000)]
+    day = 20000 * SECONDS_PER_DAY
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = KeywordIndex(os.path.join(tmp, "index.db"), lemmatize=False, daily_retention_days=30)
+
+        started = time.perf_counter()
+        n_calls = 5000
+        for i in range(n_calls):
+            call_day = i * 90 // n_calls
+            # В последнюю неделю растет доля жалоб на доставку
+            weights = [5 if topic in ("доставка", "курьер") and call_day >= 83 else 1 for topic in topics]
+            words = random.choices(common, k=60) + random.choices(topics, weights, k=8) + random.sample(rare, 5)
+            index.add_call(f"call-{i}", " ".join(words), day + call_day * SECONDS_PER_DAY)
+        add_ms = (time.perf_counter() - started) / n_calls * 1000
+        index.compact()
+
+        started = time.perf_counter()
+        keywords = index.call_keywords("call-4999", top_n=5)
+        keywords_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        trending = index.trending(start=day + 83 * SECONDS_PER_DAY, end=day + 89 * SECONDS_PER_DAY, top_n=5, min_df=20)
+        trending_ms = (time.perf_counter() - started) * 1000
+
+        print(f"Добавление звонка: {add_ms:.2f} мс, индекс: {index.stats()}")
+        print(f"Слова звонка ({keywords_ms:.1f} мс): {[k['term'] for k in keywords]}")
+        print(f"Растущие темы недели ({trending_ms:.1f} мс): {[(t['term'], t['lift']) for t in trending]}")
@@ -1,39 +1,214 @@
 # keywords.py - Исправленная версия
-from yake import KeywordExtractor
-import pymorphy2
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Минимальная длина текста, из которого имеет смысл извлекать ключевые фразы
+MIN_TEXT_LENGTH = 20
+
+# Меньший пакет по умолчанию обрабатывается в текущем процессе: запуск пула
+# и загрузка словарей в каждом процессе дольше, чем сами ~20 мс на текст
+MIN_PARALLEL_TEXTS = 32
+
 
 class KeywordExtractorRU:
-    def __init__(self):
+    def __init__(self, top=10, max_ngram=3):
+        """
+        Args:
+            top: число ключевых фраз на текст
+            max_ngram: максимальная длина фразы в словах
+        """
+        # yake импортируется только при создании экстрактора
+        from yake import KeywordExtractor
+        from .lemmatizer import get_lemmatizer
+
+        self.top = top
+        self.max_ngram = max_ngram
         self.extractor = KeywordExtractor(
             lan="ru",
-            n=3,  # Максимальная длина фразы
+            n=max_ngram,  # Максимальная длина фразы
             dedupLim=0.9,
-            top=10
+            top=top
         )
-        self.morph = pymorphy2.MorphAnalyzer()
-    
-    def extract_keywords(self, text):
-        if not text or len(text.strip()) < 20:
+        # Общий на процесс MorphAnalyzer с кэшем нормальных форм
+        self.lemmatizer = get_lemmatizer()
+
+    def extract_keywords_scored(self, text):
+        """
+        Ключевые фразы с оценками YAKE (чем меньше, тем важнее фраза)
+
+        Returns:
+            list: [{phrase, score}] - нормальные формы по возрастанию score
+        """
+        if not text or len(text.strip()) < MIN_TEXT_LENGTH:
             return []
-        
+
         # Извлекаем ключевые фразы
         keywords = self.extractor.extract_keywords(text)
-        
-        # Нормализуем слова (приводим к начальной форме)
-        normalized_keywords = []
-        for kw, score in keywords:
-            words = kw.split()
-            normalized_words = []
-            for word in words:
-                parsed = self.morph.parse(word)[0]
-                normalized_words.append(parsed.normal_form)
-            
-            # Сохраняем нормализованную фразу и оценку
-            normalized_phrase = " ".join(normalized_words)
-            normalized_keywords.append((normalized_phrase, score))
-        
+
+        # Нормализуем слова (приводим к начальной форме) одним вызовом для всех фраз
+        phrases = [kw.split() for kw, _ in keywords]
+        lemmas = self.lemmatizer.lemmatize([word for words in phrases for word in words])
+
+        best_scores = {}
+        position = 0
+        for words, (_, score) in zip(phrases, keywords):
+            normalized_phrase = " ".join(lemmas[position:position + len(words)])
+            position += len(words)
+            # Разные формы одной фразы - оставляем лучшую оценку
+            if normalized_phrase not in best_scores or score < best_scores[normalized_phrase]:
+                best_scores[normalized_phrase] = score
+
         # Сортируем по оценке (чем меньше, тем лучше в YAKE)
-        normalized_keywords.sort(key=lambda x: x[1])
-        
-        # Возвращаем только фразы (без оценок для удобства)
-        return [kw for kw, _ in normalized_keywords[:10]]
\ No newline at end of file
+        ranked = sorted(best_scores.items(), key=lambda x: x[1])
+        return [{"phrase": phrase, "score": round(float(score), 6)} for phrase, score in ranked[:self.top]]
+
+    def extract_keywords(self, text):
+        """
+        Ключевые фразы без оценок (порядок extract_keywords_scored).
+        Фразы, совпадающие после приведения к нормальной форме, выдаются
+        один раз, поэтому фраз может быть меньше top
+
+        Returns:
+            list: нормальные формы фраз по убыванию важности
+        """
+        return [kw["phrase"] for kw in self.extract_keywords_scored(text)]
+
+    def extract_keywords_batch(self, texts, max_workers=None, chunksize=None):
+        """
+        Ключевые фразы для многих текстов на пуле процессов. YAKE написан
+        на чистом Python и держит GIL, поэтому потоки не ускоряют обработку;
+        каждый процесс один раз создает свой экстрактор и MorphAnalyzer
+        и обрабатывает ими всю свою часть пакета.
+
+        Args:
+            texts: список текстов
+            max_workers: число процессов (по умолчанию - число ядер, а пакет меньше
+                         MIN_PARALLEL_TEXTS - в текущем процессе; 1 - в текущем процессе)
+            chunksize: число текстов в одной задаче процесса
+
+        Returns:
+            list: для каждого текста - список {phrase, score}, в порядке texts
+        """
+        texts = list(texts)
+        if max_workers is None and len(texts) < MIN_PARALLEL_TEXTS:
+            max_workers = 1
+        max_workers = min(max_workers or os.cpu_count() or 1, len(texts))
+        if max_workers <= 1:
+            return [self.extract_keywords_scored(text) for text in texts]
+
+        # Крупные задачи - меньше пересылок между процессами
+        chunksize = chunksize or max(1, len(texts) // (max_workers * 4))
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_keywords_worker,
+            initargs=(self.top, self.max_ngram)
+        ) as executor:
+            return list(executor.map(_extract_keywords_worker, texts, chunksize=chunksize))
+
+    def extract_keywords_segments(self, segments, by="speaker", window_minutes=5, max_workers=None):
+        """
+        Ключевые фразы по участникам или по временным окнам одного звонка
+
+        Args:
+            segments: сегменты транскрипции [{start, end, text, speaker}]
+            by: "speaker" - по говорящим, "window" - по окнам window_minutes минут
+            window_minutes: длина окна для by="window"
+            max_workers: число процессов (см. extract_keywords_batch; групп звонка
+                         обычно немного, и по умолчанию они обрабатываются в текущем процессе)
+
+        Returns:
+            list: группы {speaker, keywords} или {start, end, keywords}
+        """
+        groups = group_segments(segments, by, window_minutes)
+        keywords = self.extract_keywords_batch([group.pop("text") for group in groups], max_workers)
+        for group, group_keywords in zip(groups, keywords):
+            group["keywords"] = group_keywords
+        return groups
+
+
+def group_segments(segments, by="speaker", window_minutes=5):
+    """
+    Объединение текста сегментов по говорящему или по временному окну
+
+    Returns:
+        list: группы {speaker, text} в порядке первого появления
+              или {start, end, text} по возрастанию времени
+    """
+    groups = {}
+    window = window_minutes * 60
+
+    for segment in segments:
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        if by == "speaker":
+            key = segment.get("speaker", "unknown")
+            group = groups.setdefault(key, {"speaker": key, "parts": []})
+        elif by == "window":
+            key = int(segment.get("start", 0) // window)
+            group = groups.setdefault(key, {"start": key * window, "end": (key + 1) * window, "parts": []})
+        else:
+            raise ValueError(f"Неизвестная группировка: {by}")
+        group["parts"].append(text)
+
+    ordered = sorted(groups) if by == "window" else list(groups)
+    result = []
+    for key in ordered:
+        group = groups[key]
+        group["text"] = " ".join(group.pop("parts"))
+        result.append(group)
+    return result
+
+
+# Экстрактор процесса пула: создается один раз в инициализаторе
+_worker_extractor = None
+
+
+def _init_keywords_worker(top, max_ngram):
+    global _worker_extractor
+    from .lemmatizer import get_morph_analyzer
+    _worker_extractor = KeywordExtractorRU(top=top, max_ngram=max_ngram)
+    # Словари pymorphy загружаются сразу, а не на первом тексте
+    get_morph_analyzer()
+
+
+def _extract_keywords_worker(text):
+    return _worker_extractor.extract_keywords_scored(text)
+
+
+if __name__ == "__main__":
+    # Сравнение последовательной и параллельной обработки пакета
+    import time
+    import random
+
+    random.seed(0)
+    sentences = [
+        "Клиент жалуется на задержку доставки заказа уже третью неделю.",
+        "Оператор предложил оформить возврат денег на банковскую карту.",
+        "Курьер не приехал в назначенное время и не отвечает на звонки.",
+        "Мобильное приложение не принимает оплату по новому тарифу.",
+        "Хочу узнать статус гарантийного ремонта телевизора.",
+        "Личный кабинет не открывается после обновления пароля."
+    ]
+    texts = [" ".join(random.choices(sentences, k=40)) for _ in range(200)]
+    extractor = KeywordExtractorRU()
+
+    started = time.perf_counter()
+    sequential = extractor.extract_keywords_batch(texts, max_workers=1)
+    sequential_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parallel = extractor.extract_keywords_batch(texts)
+    parallel_seconds = time.perf_counter() - started
+
+    print(f"{len(texts)} текстов: последовательно {sequential_seconds:.2f} с, "
+          f"{os.cpu_count()} процессов {parallel_seconds:.2f} с, результаты совпадают: {sequential == parallel}")
+    print(sequential[0][:3])
+
+    segments = [
+        {"start": 0.0, "end": 20.0, "speaker": "client", "text": sentences[0] + " " + sentences[2]},
+        {"start": 20.0, "end": 40.0, "speaker": "operator", "text": sentences[1]},
+        {"start": 400.0, "end": 430.0, "speaker": "client", "text": sentences[3] + " " + sentences[5]}
+    ]
+    for group in extractor.extract_keywords_segments(segments, by="window", max_workers=1):
+        print(group["start"], group["end"], [kw["phrase"] for kw in group["keywords"][:3]])
\ No newline at end of file
@@ -0,0 +1,141 @@
+# lemmatizer.py - Общий лемматизатор с кэшем (один MorphAnalyzer на процесс)
+import threading
+from collections import OrderedDict
+
+_morph_analyzer = None
+_morph_lock = threading.Lock()
+
+
+def get_morph_analyzer():
+    """
+    Единственный на процесс pymorphy2.MorphAnalyzer (загрузка словарей - долгая).
+    pymorphy2 не работает на Python 3.11+, тогда используется совместимый pymorphy3.
+
+    Returns:
+        MorphAnalyzer или None, если ни одна библиотека не установлена
+    """
+    global _morph_analyzer
+    with _morph_lock:
+        if _morph_analyzer is None:
+            try:
+                import pymorphy2
+                _morph_analyzer = pymorphy2.MorphAnalyzer()
+            except Exception:
+                try:
+                    import pymorphy3
+                    _morph_analyzer = pymorphy3.MorphAnalyzer()
+                except ImportError:
+                    print("pymorphy2/pymorphy3 не установлены, лемматизация отключена")
+                    _morph_analyzer = False
+    return _morph_analyzer or None
+
+
+class Lemmatizer:
+    """
+    Приведение слов к нормальной форме с ограниченным LRU-кэшем.
+    По закону Ципфа небольшой кэш покрывает большую часть слов
+    разговорной речи, поэтому разбор pymorphy вызывается редко.
+    """
+
+    def __init__(self, cache_size=100000):
+        """
+        Args:
+            cache_size: число слов в кэше слово -> нормальная форма
+        """
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self):
+        """Есть ли морфологический анализатор (иначе - только нижний регистр)"""
+        return get_morph_analyzer() is not None
+
+    def lemma(self, word):
+        """Нормальная форма одного слова"""
+        return self.lemmatize([word])[0]
+
+    def lemmatize(self, tokens):
+        """
+        Нормальные формы списка слов. Повторы внутри списка разбираются
+        один раз, известные слова берутся из кэша.
+
+        Args:
+            tokens: список слов
+
+        Returns:
+            list: нормальные формы в нижнем регистре, в порядке tokens
+        """
+        words = [token.lower() for token in tokens]
+        lemmas = {}
+        missing = []
+
+        with self.lock:
+            for word in words:
+                if word in lemmas:
+                    continue
+                cached = self.cache.get(word)
+                if cached is None:
+                    lemmas[word] = None
+                    missing.append(word)
+                else:
+                    self.cache.move_to_end(word)
+                    lemmas[word] = cached
+                    self.hits += 1
+            self.misses += len(missing)
+
+        if missing:
+            morph = get_morph_analyzer()
+            parsed = [morph.parse(word)[0].normal_form if morph else word for word in missing]
+
+            with self.lock:
+                for word, lemma in zip(missing, parsed):
+                    lemmas[word] = lemma
+                    self.cache[word] = lemma
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        return [lemmas[word] for word in words]
+
+    def preload(self, lemmas):
+        """Заполнение кэша готовой таблицей {слово: нормальная форма} (например, из снимка словарей)"""
+        with self.lock:
+            for word, lemma in lemmas.items():
+                self.cache[word] = lemma
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def lemmatize_text(self, text):
+        """Нормальные формы слов текста (через общий токенизатор словарей)"""
+        from .lexicon import TOKEN_RE
+        return self.lemmatize(TOKEN_RE.findall(text))
+
+    def stats(self):
+        """Размер кэша и доля попаданий"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache_entries": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+_default_lemmatizer = None
+
+
+def get_lemmatizer():
+    """Общий для процесса лемматизатор"""
+    global _default_lemmatizer
+    if _default_lemmatizer is None:
+        _default_lemmatizer = Lemmatizer()
+    return _default_lemmatizer
+
+
+if __name__ == "__main__":
+    lemmatizer = get_lemmatizer()
+    print(lemmatizer.lemmatize(["Доставку", "доставкой", "недовольна", "работает", "доставкой"]))
+    print(lemmatizer.stats())
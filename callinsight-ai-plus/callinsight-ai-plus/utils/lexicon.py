@@ -0,0 +1,197 @@
+# lexicon.py - Однопроходный поиск словарных слов и фраз (префиксное дерево по токенам)
+import re
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Слова, инвертирующие полярность следующего за ними словарного слова
+NEGATIONS = ("не", "нет", "ни", "без")
+
+
+def normalize_token(token):
+    return token.lower().replace("ё", "е")
+
+
+def trie_regex(literals):
+    """
+    Регулярное выражение в виде префиксного дерева: в каждой позиции
+    проверяются только ветки, начинающиеся с текущего символа, а не
+    все строки подряд. Необязательные хвосты жадные - совпадение самое длинное.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        terminal = "" in node
+        branches = [re.escape(char) + build(child) for char, child in node.items() if char != ""]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if terminal else group
+
+    return build(trie)
+
+
+class LexiconMatcher:
+    """
+    Словарь фраз, скомпилированный в префиксное дерево по токенам.
+    Текст разбивается на слова один раз, на каждой позиции ищется
+    самое длинное совпадение - сложность O(длина текста * длина фразы)
+    и не зависит от размера словаря. Совпадения только по целым словам:
+    "хорошо" не находится внутри "нехорошо". С lemmatize=True словарь
+    и текст сравниваются по нормальным формам ("доставку" = "доставка").
+    """
+
+    def __init__(self, lexicons, negations=NEGATIONS, negation_window=2, normalize=None,
+                 lemmatize=False):
+        """
+        Args:
+            lexicons: {категория: [слово или фраза, ...]}
+            negations: слова-отрицания
+            negation_window: сколько слов перед совпадением проверять на отрицание
+            normalize: функция нормализации токена (по умолчанию - нижний регистр, ё -> е)
+            lemmatize: сравнивать нормальные формы слов (общий Lemmatizer с кэшем)
+        """
+        self.normalize = normalize or normalize_token
+        if lemmatize:
+            from .lemmatizer import get_lemmatizer
+            self.lemmatizer = get_lemmatizer()
+        else:
+            self.lemmatizer = None
+        self.negations = set(self.normalize_tokens(list(negations)))
+        self.negation_window = negation_window
+        self.trie = {}
+
+        for category, phrases in lexicons.items():
+            for phrase in phrases:
+                self.add(phrase, category)
+
+    def to_state(self):
+        """
+        Скомпилированное дерево для снимка словарей. С лемматизацией
+        добавляется таблица нормальных форм слов словаря и отрицаний.
+        """
+        state = {"trie": self.trie, "negations": self.negations,
+                 "negation_window": self.negation_window, "lemmas": None}
+        if self.lemmatizer is not None:
+            words = set()
+            stack = [self.trie]
+            while stack:
+                node = stack.pop()
+                for key, child in node.items():
+                    if key is None:
+                        words.update(token.lower() for token in TOKEN_RE.findall(child[1]))
+                    else:
+                        stack.append(child)
+            words.update(negation.lower() for negation in NEGATIONS)
+            words = sorted(words)
+            state["lemmas"] = dict(zip(words, self.lemmatizer.lemmatize(words)))
+        return state
+
+    @classmethod
+    def from_state(cls, state, normalize=None):
+        """Словарь из снимка без повторного разбора и лемматизации фраз"""
+        matcher = cls.__new__(cls)
+        matcher.normalize = normalize or normalize_token
+        matcher.lemmatizer = None
+        if state["lemmas"] is not None:
+            from .lemmatizer import get_lemmatizer
+            matcher.lemmatizer = get_lemmatizer()
+            matcher.lemmatizer.preload(state["lemmas"])
+        matcher.negations = set(state["negations"])
+        matcher.negation_window = state["negation_window"]
+        matcher.trie = state["trie"]
+        return matcher
+
+    def add(self, phrase, category):
+        """Добавление фразы в дерево"""
+        node = self.trie
+        for token in self.normalize_tokens(TOKEN_RE.findall(phrase)):
+            node = node.setdefault(token, {})
+        # Ключ None хранит категорию и исходную фразу в конечном узле
+        node[None] = (category, phrase)
+
+    def normalize_tokens(self, tokens):
+        """Нормализация списка токенов (с лемматизацией, если включена)"""
+        if self.lemmatizer is not None:
+            tokens = self.lemmatizer.lemmatize(tokens)
+        return [self.normalize(token) for token in tokens]
+
+    def tokenize(self, text):
+        """Нормализованные токены и их позиции в тексте"""
+        matches = list(TOKEN_RE.finditer(text))
+        tokens = self.normalize_tokens([m.group() for m in matches])
+        return tokens, [(m.start(), m.end()) for m in matches]
+
+    def find(self, text):
+        """
+        Поиск всех словарных фраз за один проход
+
+        Returns:
+            list: совпадения (формат см. find_tokens)
+        """
+        tokens, spans = self.tokenize(text)
+        return self.find_tokens(tokens, spans)
+
+    def find_tokens(self, tokens, spans):
+        """
+        Поиск по уже разбитому на токены тексту (см. tokenize)
+
+        Returns:
+            list: совпадения {category, phrase, start, end, token_start, token_end, negated}
+        """
+        hits = []
+        i = 0
+
+        while i < len(tokens):
+            node = self.trie
+            match = None
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if None in node:
+                    match = (j, node[None])
+
+            if match is None:
+                i += 1
+                continue
+
+            end, (category, phrase) = match
+            window = tokens[max(0, i - self.negation_window):i]
+            hits.append({
+                "category": category,
+                "phrase": phrase,
+                "start": spans[i][0],
+                "end": spans[end - 1][1],
+                "token_start": i,
+                "token_end": end,
+                "negated": any(token in self.negations for token in window)
+            })
+            i = end
+
+        return hits
+
+    def count(self, text, flip=None):
+        """
+        Число совпадений по категориям с учетом отрицания
+
+        Args:
+            flip: {категория: категория при отрицании}, например
+                  {"positive": "negative", "negative": "positive"}
+
+        Returns:
+            tuple: (счетчики по категориям, список совпадений)
+        """
+        flip = flip or {}
+        hits = self.find(text)
+        counts = {}
+        for hit in hits:
+            category = flip.get(hit["category"], hit["category"]) if hit["negated"] else hit["category"]
+            counts[category] = counts.get(category, 0) + 1
+        return counts, hits
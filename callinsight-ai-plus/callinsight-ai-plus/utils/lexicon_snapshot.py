@@ -0,0 +1,319 @@
+# lexicon_snapshot.py - Снимок собранных словарей: сборка, загрузка, горячая замена
+#
+# Снимок избавляет от сборки словарей при запуске: префиксных деревьев,
+# лемматизации фраз, матриц намерений. Регулярные выражения в нем хранятся
+# текстом (pickle и сам сохраняет re.Pattern как текст с флагами)
+# и компилируются при загрузке снимка или при первом поиске.
+#
+# Данные снимка - pickle, и его загрузка выполняет код из файла. Снимок
+# должен собирать сам сервис (build_snapshot при развертывании), а каталог
+# data/ (или LEXICON_SNAPSHOT_PATH) не должен быть доступен на запись
+# другим пользователям: read_snapshot отказывается читать файл чужого
+# владельца или файл, открытый на запись группе и остальным.
+import os
+import time
+import pickle
+import logging
+import struct
+import hashlib
+import threading
+
+# Снимок лежит в data/ пакета, а не в текущем каталоге процесса
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "data", "lexicon_snapshot.bin")
+
+# Заголовок: сигнатура, версия формата, длина данных, SHA-1 данных
+MAGIC = b"CILEXSNP"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<8sHQ20s")
+
+logger = logging.getLogger(__name__)
+
+# Модули, в коде которых заданы словари снимка и способ их компиляции
+SOURCE_MODULES = ("profanity.py", "intent.py", "sentiment.py", "ner.py", "lexicon.py", "lemmatizer.py")
+
+
+def source_hash(profanity_dictionary):
+    """
+    Хэш исходников снимка: модулей SOURCE_MODULES (словари в коде)
+    и файла словаря нецензурных слов. Снимок, собранный из других
+    исходников, устарел и не используется.
+    """
+    digest = hashlib.sha1()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in [os.path.join(package_dir, name) for name in SOURCE_MODULES] + [profanity_dictionary]:
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+class LexiconSnapshot:
+    """
+    Загруженный снимок: собранные структуры словарей по разделам
+    ("profanity", "intent", "sentiment", "aspects", "ner") и раздел
+    "source" (хэш исходников и путь словаря). Версия - хэш содержимого,
+    одинаковые словари дают одинаковую версию.
+    """
+
+    def __init__(self, data, version, path=None):
+        self.data = data
+        self.version = version
+        self.path = path
+
+    @property
+    def built_at(self):
+        return self.data.get("built_at")
+
+    def section(self, name):
+        return self.data.get(name)
+
+    def is_current(self):
+        """Собран ли снимок из текущих исходников (см. source_hash)"""
+        source = self.data.get("source") or {}
+        return source.get("hash") == source_hash(source.get("profanity_dictionary", ""))
+
+
+def write_snapshot(data, path=SNAPSHOT_PATH):
+    """
+    Запись снимка. Файл пишется во временный и переименовывается,
+    поэтому читатели видят либо старый, либо новый снимок целиком.
+
+    Returns:
+        LexiconSnapshot
+    """
+    payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    digest = hashlib.sha1(payload).digest()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(payload), digest))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return LexiconSnapshot(data, digest.hex()[:16], path)
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    """
+    Загрузка снимка. Выигрыш - в отсутствии сборки словарей (деревьев,
+    лемматизации), а не в чтении: файл читается целиком и распаковывается
+    pickle. Регулярные выражения компилируются заново - при словаре
+    на тысячи основ это большая часть времени запуска фильтра.
+
+    Returns:
+        LexiconSnapshot
+
+    Raises:
+        ValueError: небезопасные права, чужой файл, другая версия формата или поврежденные данные
+    """
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        # Распаковка pickle выполняет код: файл должен быть нашим и не доступным на запись другим
+        if hasattr(os, "getuid") and (stat.st_uid != os.getuid() or stat.st_mode & 0o022):
+            raise ValueError(f"{path}: файл чужого владельца или доступен на запись другим, не загружается")
+
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path}: файл короче заголовка")
+        magic, format_version, length, digest = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: не снимок словарей")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"{path}: формат {format_version}, ожидается {FORMAT_VERSION} - пересоберите снимок")
+
+        payload = f.read(length)
+        if len(payload) != length or hashlib.sha1(payload).digest() != digest:
+            raise ValueError(f"{path}: данные повреждены")
+
+    return LexiconSnapshot(pickle.loads(payload), digest.hex()[:16], path)
+
+
+def build_snapshot(path=SNAPSHOT_PATH, profanity_dictionary=None):
+    """
+    Сборка снимка из словарей в коде и в data/: все анализаторы создаются
+    без снимка, их собранные структуры (деревья, тексты регулярных
+    выражений, матрицы намерений, таблицы нормальных форм) сохраняются
+
+    Args:
+        path: файл снимка
+        profanity_dictionary: словарь нецензурных слов (по умолчанию data/profanity_dict.txt)
+
+    Returns:
+        LexiconSnapshot
+    """
+    from .profanity import ProfanityFilter, PROFANITY_DICTIONARY
+    from .intent import IntentDetector
+    from .sentiment import AdvancedSentimentAnalyzer
+    from .ner import NamedEntityRecognizer
+
+    profanity_dictionary = os.path.abspath(profanity_dictionary or PROFANITY_DICTIONARY)
+    profanity_filter = ProfanityFilter(profanity_dictionary, use_snapshot=False)
+    intent_detector = IntentDetector(use_snapshot=False)
+    sentiment_analyzer = AdvancedSentimentAnalyzer(use_cache=False, use_snapshot=False)
+    ner = NamedEntityRecognizer(use_snapshot=False)
+
+    data = {
+        "built_at": time.time(),
+        "source": {"hash": source_hash(profanity_dictionary), "profanity_dictionary": profanity_dictionary}
+    }
+    data.update(profanity_filter.snapshot_state())
+    data.update(intent_detector.snapshot_state())
+    data.update(sentiment_analyzer.snapshot_state())
+    data.update(ner.snapshot_state())
+    return write_snapshot(data, path)
+
+
+class LexiconSnapshotStore:
+    """
+    Текущий снимок процесса. Файл проверяется (os.stat) не чаще раза
+    в check_interval секунд при обращении; новый снимок загружается
+    полностью и только потом подменяет старый одним присваиванием,
+    так что параллельные запросы видят либо старую, либо новую версию.
+    Снимок, собранный из других исходников (изменен код словарей или
+    файл словаря), не используется - анализаторы собирают словари сами.
+    Причина, по которой снимок не загружен, пишется в журнал модуля
+    и остается в load_error.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, check_interval=2.0):
+        """
+        Args:
+            path: файл снимка
+            check_interval: период проверки файла, секунды (0 - при каждом обращении)
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.snapshot = None
+        self.reloads = 0
+        self.load_error = None
+        self.lock = threading.Lock()
+        self._file_id = None
+        self._checked_at = None
+
+    def current(self):
+        """Текущий снимок (None, если файла нет или он не загружается)"""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._check()
+        return self.snapshot
+
+    def _check(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        file_id = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if file_id == self._file_id:
+            return
+
+        with self.lock:
+            if file_id == self._file_id:
+                return
+            try:
+                snapshot = read_snapshot(self.path)
+            except (OSError, ValueError, pickle.UnpicklingError) as e:
+                self._file_id = file_id
+                self.load_error = f"Снимок словарей не загружен: {e}"
+                logger.warning(self.load_error)
+                return
+            self._file_id = file_id
+            if not snapshot.is_current():
+                self.load_error = (f"Снимок словарей {self.path} собран из других исходников, "
+                                   f"не используется - пересоберите его (python -m utils.lexicon_snapshot)")
+                logger.warning(self.load_error)
+                return
+            self.load_error = None
+            if self.snapshot is None or snapshot.version != self.snapshot.version:
+                self.snapshot = snapshot
+                self.reloads += 1
+
+
+class SnapshotLink:
+    """
+    Связь анализатора со снимком: при появлении новой версии снимка
+    вызывает apply(data) анализатора. sync() дешевый, его можно
+    вызывать в начале каждого анализа.
+    """
+
+    def __init__(self, apply, store=None):
+        self.apply = apply
+        self.store = store or get_lexicon_store()
+        self.version = None
+
+    def sync(self):
+        """Применение нового снимка; True - словари анализатора взяты из снимка"""
+        snapshot = self.store.current()
+        if snapshot is not None and snapshot.version != self.version:
+            self.apply(snapshot.data)
+            self.version = snapshot.version
+        return self.version is not None
+
+
+_default_store = None
+
+
+def get_lexicon_store():
+    """Общее для процесса хранилище снимка (путь - LEXICON_SNAPSHOT_PATH или SNAPSHOT_PATH)"""
+    global _default_store
+    if _default_store is None:
+        _default_store = LexiconSnapshotStore(os.environ.get("LEXICON_SNAPSHOT_PATH", SNAPSHOT_PATH))
+    return _default_store
+
+
+if __name__ == "__main__":
+    # python -m utils.lexicon_snapshot [путь] - сборка снимка, время запуска анализаторов, горячая замена
+    import sys
+    import subprocess
+    import tempfile
+
+    path = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH)
+    started = time.perf_counter()
+    snapshot = build_snapshot(path)
+    print(f"Снимок {snapshot.version} -> {path} ({os.path.getsize(path) / 1024:.1f} КБ), "
+          f"сборка {time.perf_counter() - started:.2f} с")
+
+    started = time.perf_counter()
+    read_snapshot(path)
+    print(f"Загрузка снимка: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    # Создание всех анализаторов в чистом процессе - как при запуске воркера
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import time; started = time.perf_counter()\n"
+        "from utils.profanity import ProfanityFilter\n"
+        "from utils.intent import IntentDetector\n"
+        "from utils.sentiment import AdvancedSentimentAnalyzer\n"
+        "from utils.ner import NamedEntityRecognizer\n"
+        "ProfanityFilter(); IntentDetector(); AdvancedSentimentAnalyzer(use_cache=False); NamedEntityRecognizer()\n"
+        "print(round((time.perf_counter() - started) * 1000, 1))"
+    )
+    for label, snapshot_path in (("без снимка", path + ".missing"), ("со снимком", path)):
+        completed = subprocess.run(
+            [sys.executable, "-c", code], cwd=package_root, capture_output=True, text=True,
+            env={**os.environ, "LEXICON_SNAPSHOT_PATH": snapshot_path}
+        )
+        print(f"Запуск анализаторов {label}: {completed.stdout.strip() or completed.stderr.strip()} мс")
+
+    # Горячая замена: пересобранный снимок подхватывается без перезапуска процесса
+    from . import lexicon_snapshot
+    from .profanity import ProfanityFilter
+
+    with tempfile.TemporaryDirectory() as tmp:
+        watched = os.path.join(tmp, "lexicon_snapshot.bin")
+        write_snapshot(snapshot.data, watched)
+        lexicon_snapshot._default_store = lexicon_snapshot.LexiconSnapshotStore(watched, check_interval=0)
+        profanity_filter = ProfanityFilter()
+        print("До замены:", profanity_filter.contains_profanity("Это новоеслово в словаре"))
+
+        dictionary = os.path.join(tmp, "dict.txt")
+        with open(dictionary, "w", encoding="utf-8") as f:
+            f.write("новоеслово\n")
+        build_snapshot(watched, dictionary)
+        print("После замены:", profanity_filter.contains_profanity("Это новоеслово в словаре"))
@@ -0,0 +1,140 @@
+# long_text.py - Классификация длинных текстов перекрывающимися окнами токенов
+import numpy as np
+
+
+class LongTextClassifier:
+    """
+    Обертка над text-classification моделью: пайплайном transformers
+    или ONNX-классификатором (onnx_backend.OnnxClassifier).
+    Текст токенизируется один раз и режется на перекрывающиеся окна
+    по max_tokens токенов; все окна всех текстов прогоняются батчами,
+    оценки окон усредняются с весом по числу токенов.
+    Требуется быстрый (Rust) токенизатор - он нарезает окна сам.
+    """
+
+    def __init__(self, pipe, max_tokens=512, stride=128, batch_size=16):
+        """
+        Args:
+            pipe: пайплайн transformers (нужны pipe.model и быстрый pipe.tokenizer),
+                  объект с tokenizer, config и logits(batch) или ModelHandle реестра
+            max_tokens: длина окна в токенах, включая служебные
+            stride: перекрытие соседних окон в токенах
+            batch_size: число окон в одном прогоне модели
+        """
+        self.pipe = pipe
+        self.batch_size = batch_size
+        self.requested_max_tokens = max_tokens
+        self.requested_stride = stride
+
+    @property
+    def tokenizer(self):
+        # Через pipe: модель реестра может быть выгружена и загружена заново
+        return self.pipe.tokenizer
+
+    def __getattr__(self, name):
+        # Параметры модели читаются при первом обращении, чтобы не загружать
+        # модель при создании анализатора
+        if name in ("max_tokens", "n_special", "stride", "labels", "multi_label"):
+            self._configure()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def _configure(self):
+        model_max = getattr(self.tokenizer, 'model_max_length', None) or self.requested_max_tokens
+        self.max_tokens = min(self.requested_max_tokens, model_max)
+        self.n_special = self.tokenizer.num_special_tokens_to_add()
+        self.stride = min(self.requested_stride, (self.max_tokens - self.n_special) // 2)
+
+        config = getattr(self.pipe, "config", None) or self.pipe.model.config
+        self.labels = [config.id2label[i] for i in range(config.num_labels)]
+        # Та же функция активации, что выбирает пайплайн
+        self.multi_label = config.problem_type == "multi_label_classification" or config.num_labels == 1
+
+    def split(self, texts):
+        """
+        Токенизация с нарезкой на окна (один проход токенизатора)
+
+        Returns:
+            tuple: (окна input_ids со служебными токенами, индекс текста для каждого окна)
+        """
+        encoded = self.tokenizer(
+            list(texts),
+            truncation=True,
+            max_length=self.max_tokens,
+            stride=self.stride,
+            return_overflowing_tokens=True
+        )
+        return encoded["input_ids"], list(encoded["overflow_to_sample_mapping"])
+
+    def _acquire(self):
+        """Модель на один прогон: ModelHandle реестра разрешается один раз"""
+        from .model_registry import ModelHandle
+        return self.pipe.get() if isinstance(self.pipe, ModelHandle) else self.pipe
+
+    def _logits(self, batch, pipe):
+        """Логиты модели для батча numpy-массивов"""
+        if hasattr(pipe, "logits"):
+            return pipe.logits(batch)
+
+        import torch
+
+        model = pipe.model
+        inputs = {key: torch.from_numpy(value).to(model.device) for key, value in batch.items()}
+        with torch.no_grad():
+            return model(**inputs).logits.float().cpu().numpy()
+
+    def _forward(self, windows, batch_size):
+        """Вероятности меток для списка окон (батчи по близкой длине)"""
+        pipe = self._acquire()
+        probs = np.zeros((len(windows), len(self.labels)), dtype=np.float32)
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            batch = pipe.tokenizer.pad({"input_ids": [windows[i] for i in batch_idx]}, return_tensors="np")
+            logits = self._logits(dict(batch), pipe).astype(np.float32)
+
+            if self.multi_label:
+                scores = 1.0 / (1.0 + np.exp(-logits))
+            else:
+                exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+                scores = exp / exp.sum(axis=1, keepdims=True)
+            probs[batch_idx] = scores
+
+        return probs
+
+    def predict_proba(self, texts, batch_size=None):
+        """
+        Распределения вероятностей меток для списка текстов
+
+        Returns:
+            np.ndarray: матрица (len(texts), len(self.labels))
+        """
+        texts = list(texts)
+        result = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        if not texts:
+            return result
+
+        windows, owners = self.split(texts)
+        probs = self._forward(windows, batch_size or self.batch_size)
+        owners = np.asarray(owners)
+        weights = np.array([max(len(window) - self.n_special, 1) for window in windows], dtype=np.float32)
+
+        # Взвешенное по длине окна среднее оценок для каждого текста
+        np.add.at(result, owners, probs * weights[:, None])
+        totals = np.bincount(owners, weights=weights, minlength=len(texts))
+        return result / np.maximum(totals, 1e-9)[:, None]
+
+    def classify(self, texts, batch_size=None):
+        """
+        Оценки меток для списка текстов в формате пайплайна (top_k=None)
+
+        Returns:
+            list: для каждого текста список [{label, score}], по убыванию score
+        """
+        probs = self.predict_proba(texts, batch_size)
+        results = []
+        for row in probs:
+            order = np.argsort(-row)
+            results.append([{"label": self.labels[i], "score": float(row[i])} for i in order])
+        return results
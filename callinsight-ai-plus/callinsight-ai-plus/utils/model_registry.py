@@ -0,0 +1,292 @@
+# model_registry.py - Общий реестр моделей: ленивая загрузка, общие веса, бюджет памяти
+import os
+import gc
+import time
+import threading
+from collections import OrderedDict
+
+# Задачи, для которых ONNX-бэкенд использует сам классификатор
+ONNX_CLASSIFICATION_TASKS = ("text-classification", "sentiment-analysis")
+
+# Задачи, которым нужен кодировщик без классификационной головы (AutoModel)
+ENCODER_TASKS = ("feature-extraction",)
+
+
+def process_rss_mb():
+    """Текущий RSS процесса, МБ (None, если /proc недоступен)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelHandle:
+    """
+    Ленивая ссылка на модель реестра. Сама модель не хранится: каждое
+    обращение идет через реестр, поэтому вытесненная модель действительно
+    освобождается, а при следующем использовании загружается заново.
+    Атрибуты и вызов делегируются пайплайну (handle.tokenizer, handle(text));
+    использованием модели (hits в отчете) считаются get() и вызов, но не
+    чтение атрибутов.
+    """
+
+    def __init__(self, registry, task, model_name, backend="torch", onnx_dir=None, **pipeline_kwargs):
+        self.registry = registry
+        self.task = task
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.pipeline_kwargs = pipeline_kwargs
+
+    def get(self, count_hit=True):
+        """Пайплайн задачи (загрузка модели при первом обращении)"""
+        return self.registry.get(self.task, self.model_name, self.backend, self.onnx_dir,
+                                 count_hit=count_hit, **self.pipeline_kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get(count_hit=False), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
+
+
+class ModelRegistry:
+    """
+    Реестр моделей процесса. Каждый чекпойнт (с бэкендом) загружается один
+    раз при первом использовании; пайплайны разных задач над одним
+    чекпойнтом (например, эмоции и zero-shot намерения) разделяют веса
+    и токенизатор. Память каждой модели оценивается по размеру весов
+    и приросту RSS при загрузке; при превышении бюджета вытесняются
+    давно не использованные модели.
+    """
+
+    def __init__(self, memory_budget_mb=None, min_idle_seconds=0.0):
+        """
+        Args:
+            memory_budget_mb: бюджет памяти на модели, МБ (None - без ограничения)
+            min_idle_seconds: модели, использованные позже, не вытесняются
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self.min_idle_seconds = min_idle_seconds
+        self.entries = OrderedDict()  # (model_name, backend, onnx_dir, kind) -> запись, порядок LRU
+        self.lock = threading.RLock()
+        self.load_counts = {}  # число загрузок с учетом повторных после вытеснения
+        self.evictions = 0
+        # Загрузки, после которых вытеснение не уложило модели в бюджет (все нужны сейчас)
+        self.budget_overruns = 0
+
+    def handle(self, task, model_name, backend="torch", onnx_dir=None, **pipeline_kwargs):
+        """Ленивая ссылка на пайплайн задачи (модель не загружается до первого использования)"""
+        return ModelHandle(self, task, model_name, backend, onnx_dir, **pipeline_kwargs)
+
+    def get(self, task, model_name, backend="torch", onnx_dir=None, count_hit=True, **pipeline_kwargs):
+        """
+        Общий пайплайн задачи для модели
+
+        Args:
+            task: задача transformers ("text-classification", "zero-shot-classification", ...)
+            model_name: название модели на хабе или путь к локальной модели
+            backend: "torch" или "onnx"
+            onnx_dir: каталог ONNX-модели (по умолчанию data/onnx/<модель>)
+            count_hit: засчитать использование модели (False - служебное обращение)
+            pipeline_kwargs: дополнительные параметры пайплайна (top_k и т.п.)
+
+        Returns:
+            пайплайн transformers или ONNX-классификатор
+        """
+        kind = "encoder" if task in ENCODER_TASKS else "classifier"
+        key = (model_name, backend, onnx_dir, kind)
+        view_key = (task, tuple(sorted(pipeline_kwargs.items())))
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+            self.entries.move_to_end(key)
+            entry["last_used"] = time.time()
+            if count_hit:
+                entry["hits"] += 1
+
+            view = entry["views"].get(view_key)
+            if view is None:
+                view = self._make_view(entry, task, pipeline_kwargs)
+                entry["views"][view_key] = view
+            return view
+
+    def _load(self, key):
+        model_name, backend, onnx_dir, kind = key
+        rss_before = process_rss_mb()
+        started = time.perf_counter()
+
+        if kind == "encoder":
+            if backend != "torch":
+                raise ValueError("Кодировщик предложений поддерживается только для backend='torch'")
+            from transformers import AutoTokenizer, AutoModel
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModel.from_pretrained(model_name).eval()
+            tensors = list(model.parameters()) + list(model.buffers())
+            size_mb = sum(t.numel() * t.element_size() for t in tensors) / 2 ** 20
+        elif backend == "onnx":
+            from .onnx_backend import OnnxClassifier
+            model = OnnxClassifier(onnx_dir) if onnx_dir else OnnxClassifier.from_model_name(model_name)
+            tokenizer = model.tokenizer
+            size_mb = os.path.getsize(model.model_path) / 2 ** 20
+        else:
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+            tensors = list(model.parameters()) + list(model.buffers())
+            size_mb = sum(t.numel() * t.element_size() for t in tensors) / 2 ** 20
+
+        load_seconds = time.perf_counter() - started
+        rss_after = process_rss_mb()
+        entry = {
+            "model": model,
+            "tokenizer": tokenizer,
+            "views": {},
+            "size_mb": size_mb,
+            "rss_delta_mb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "load_seconds": load_seconds,
+            "loaded_at": time.time(),
+            "last_used": time.time(),
+            "hits": 0
+        }
+        self.load_counts[key] = self.load_counts.get(key, 0) + 1
+
+        self.entries[key] = entry
+        self._enforce_budget(keep=key)
+        return entry
+
+    def _make_view(self, entry, task, pipeline_kwargs):
+        """Пайплайн задачи поверх загруженных весов"""
+        model = entry["model"]
+        if hasattr(model, "logits"):
+            if task in ONNX_CLASSIFICATION_TASKS:
+                return model
+            if task == "zero-shot-classification":
+                from .onnx_backend import OnnxZeroShotClassifier
+                return OnnxZeroShotClassifier.from_classifier(model)
+            raise ValueError(f"Задача {task} не поддерживается ONNX-бэкендом")
+
+        from transformers import pipeline
+        return pipeline(task, model=model, tokenizer=entry["tokenizer"], **pipeline_kwargs)
+
+    def resident_mb(self):
+        """Оценка памяти загруженных моделей, МБ"""
+        with self.lock:
+            return sum(entry["size_mb"] for entry in self.entries.values())
+
+    def _enforce_budget(self, keep=None):
+        """Вытеснение давно не использованных моделей сверх бюджета"""
+        if self.memory_budget_mb is None:
+            return
+
+        now = time.time()
+        for key in list(self.entries):
+            if self.resident_mb() <= self.memory_budget_mb:
+                break
+            if key == keep or now - self.entries[key]["last_used"] < self.min_idle_seconds:
+                continue
+            self.unload(key)
+
+        if self.resident_mb() > self.memory_budget_mb:
+            self.budget_overruns += 1
+
+    def unload(self, key):
+        """Выгрузка модели (ключ - (model_name, backend, onnx_dir, kind))"""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.evictions += 1
+            entry.clear()
+            gc.collect()
+
+    def clear(self):
+        """Выгрузка всех моделей"""
+        for key in list(self.entries):
+            self.unload(key)
+
+    def report(self):
+        """
+        Загруженные модели: время загрузки, оценка памяти, использование
+
+        Returns:
+            dict: бюджет, суммарная память, over_budget (модели сейчас не укладываются
+                  в бюджет), budget_overruns (сколько раз так было после загрузки)
+                  и список моделей
+        """
+        now = time.time()
+        with self.lock:
+            models = [{
+                "model": model_name,
+                "backend": backend,
+                "tasks": sorted({task for task, _ in entry["views"]}),
+                "size_mb": round(entry["size_mb"], 1),
+                "rss_delta_mb": round(entry["rss_delta_mb"], 1) if entry["rss_delta_mb"] is not None else None,
+                "load_seconds": round(entry["load_seconds"], 3),
+                "loads": self.load_counts[(model_name, backend, onnx_dir, kind)],
+                "hits": entry["hits"],
+                "resident_seconds": round(now - entry["loaded_at"], 1),
+                "idle_seconds": round(now - entry["last_used"], 1)
+            } for (model_name, backend, onnx_dir, kind), entry in self.entries.items()]
+
+        resident_mb = self.resident_mb()
+        return {
+            "memory_budget_mb": self.memory_budget_mb,
+            "resident_mb": round(resident_mb, 1),
+            "over_budget": self.memory_budget_mb is not None and resident_mb > self.memory_budget_mb,
+            "budget_overruns": self.budget_overruns,
+            "process_rss_mb": round(process_rss_mb() or 0.0, 1),
+            "evictions": self.evictions,
+            "models": models
+        }
+
+
+_default_registry = None
+
+
+def get_model_registry():
+    """
+    Общий для процесса реестр. Бюджет памяти задается переменной
+    окружения MODEL_MEMORY_BUDGET_MB (по умолчанию без ограничения).
+    """
+    global _default_registry
+    if _default_registry is None:
+        budget = os.environ.get("MODEL_MEMORY_BUDGET_MB")
+        _default_registry = ModelRegistry(memory_budget_mb=float(budget) if budget else None)
+    return _default_registry
+
+
+if __name__ == "__main__":
+    # Демонстрация на маленьких локальных моделях (без доступа к хабу)
+    import tempfile
+    from .onnx_backend import build_test_model
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first = build_test_model(os.path.join(tmp, "first"), ("NEGATIVE", "NEUTRAL", "POSITIVE"))
+        second = build_test_model(os.path.join(tmp, "second"), ("contradiction", "entailment", "neutral"))
+
+        # Бюджет меньше двух моделей: вторая вытесняет первую
+        registry = ModelRegistry(memory_budget_mb=0.3)
+        emotions = registry.handle("text-classification", first, top_k=None)
+        intents = registry.handle("zero-shot-classification", first)
+        print("До первого использования загружено моделей:", len(registry.entries))
+
+        emotions("Спасибо, всё отлично")
+        intents("Хочу вернуть деньги", candidate_labels=["возврат", "жалоба"])
+        print("Две задачи на одном чекпойнте, загружено моделей:", len(registry.entries))
+
+        registry.get("zero-shot-classification", second)("Хочу вернуть деньги", candidate_labels=["возврат"])
+        emotions("Снова первая модель")
+
+        report = registry.report()
+        print(f"Бюджет {report['memory_budget_mb']} МБ, занято {report['resident_mb']} МБ, "
+              f"вытеснений: {report['evictions']}, превышений бюджета: {report['budget_overruns']}, "
+              f"RSS процесса {report['process_rss_mb']} МБ")
+        for model in report["models"]:
+            print(f"  {os.path.basename(model['model'])} [{model['backend']}] {model['tasks']}: "
+                  f"{model['size_mb']} МБ, загрузка {model['load_seconds']} с, загрузок {model['loads']}")
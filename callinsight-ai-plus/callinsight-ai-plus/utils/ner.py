@@ -8,7 +8,12 @@ class NamedEntityRecognizer:
     Извлечение именованных сущностей из текста (regex-based)
     """
     
-    def __init__(self):
+    def __init__(self, use_snapshot: bool = True):
+        """
+        Args:
+            use_snapshot: брать выражения из снимка словарей data/
+                          (см. lexicon_snapshot) и подхватывать его обновления
+        """
         # Регулярные выражения для извлечения сущностей
         self.patterns = {
             'phone': [
@@ -31,6 +36,35 @@ class NamedEntityRecognizer:
                 r'[A-Z]-?\d{5,}'
             ]
         }
+        
+        # Выражения компилируются один раз (из patterns или из текста снимка)
+        self._compiled_cache = None
+        self._snapshot = None
+        if use_snapshot:
+            from .lexicon_snapshot import SnapshotLink
+            self._snapshot = SnapshotLink(self._apply_snapshot)
+            self._snapshot.sync()
+    
+    def snapshot_state(self) -> Dict[str, Any]:
+        """Раздел снимка словарей: только тексты выражений, компилируются они при загрузке"""
+        return {"ner": {"source": {category: tuple(patterns) for category, patterns in self.patterns.items()}}}
+    
+    def _apply_snapshot(self, data: Dict[str, Any]):
+        self.patterns = {category: list(patterns) for category, patterns in data["ner"]["source"].items()}
+        self._compiled_cache = None
+    
+    def _compiled(self) -> Dict[str, list]:
+        """Скомпилированные выражения; пересобираются, если patterns изменили"""
+        if self._snapshot is not None:
+            self._snapshot.sync()
+        source = {category: tuple(patterns) for category, patterns in self.patterns.items()}
+        if self._compiled_cache is None or self._compiled_cache['source'] != source:
+            self._compiled_cache = {
+                'source': source,
+                'patterns': {category: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+                             for category, patterns in source.items()}
+            }
+        return self._compiled_cache['patterns']
     
     def extract_entities(self, text: str) -> Dict[str, Any]:
         """
@@ -38,11 +72,11 @@ class NamedEntityRecognizer:
         """
         entities = {category: [] for category in self.patterns.keys()}
         
-        for category, patterns in self.patterns.items():
+        for category, patterns in self._compiled().items():
             found_entities = []
             
             for pattern in patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
+                matches = pattern.findall(text)
                 
                 for match in matches:
                     if isinstance(match, tuple):
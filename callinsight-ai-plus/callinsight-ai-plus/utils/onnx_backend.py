@@ -0,0 +1,519 @@
+# onnx_backend.py - CPU-инференс моделей классификации через ONNX Runtime (int8)
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+
+import numpy as np
+
+# Экспортированные модели лежат в data/ пакета, а не в текущем каталоге процесса
+ONNX_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "onnx")
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+# Модели анализаторов проекта: экспортируются шагом сборки
+# python -m utils.onnx_backend --export (нужен torch), сервису с backend="onnx" torch не нужен
+PROJECT_MODELS = (
+    "seara/rubert-tiny2-russian-sentiment",
+    "cointegrated/rubert-tiny2-cedr-emotion-detection"
+)
+
+
+def onnx_model_dir(model_name, onnx_root=ONNX_ROOT):
+    """Каталог экспортированной модели (имя модели хаба -> имя каталога)"""
+    return os.path.join(onnx_root, model_name.strip("/").replace("/", "__"))
+
+
+def export_onnx(model_name, output_dir, quantize=True, opset=17):
+    """
+    Экспорт модели transformers в ONNX с динамической int8-квантизацией весов.
+    Нужен один раз (требует torch), дальше модель работает без него.
+
+    Args:
+        model_name: название модели на хабе или путь к локальной модели
+        output_dir: каталог для model.onnx, model.int8.onnx, токенизатора и конфига
+        quantize: дополнительно сохранить квантизованную версию
+        opset: версия набора операторов ONNX
+
+    Returns:
+        str: output_dir
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    os.makedirs(output_dir, exist_ok=True)
+
+    sample = tokenizer(["пример текста", "второй пример"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False
+        )
+
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+
+    return output_dir
+
+
+def export_models(model_names=PROJECT_MODELS, onnx_root=ONNX_ROOT, quantize=True):
+    """
+    Шаг сборки: экспорт моделей в onnx_root (уже экспортированные пропускаются)
+
+    Returns:
+        dict: {модель: каталог}
+    """
+    exported = {}
+    for model_name in model_names:
+        model_dir = onnx_model_dir(model_name, onnx_root)
+        if not os.path.exists(os.path.join(model_dir, FP32_FILE)):
+            export_onnx(model_name, model_dir, quantize=quantize)
+        exported[model_name] = model_dir
+    return exported
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class OnnxConfig:
+    """Нужные для классификации поля config.json (без импорта transformers)"""
+
+    def __init__(self, model_dir, revision=None):
+        config = _read_json(os.path.join(model_dir, "config.json"))
+        self.id2label = {int(i): label for i, label in config["id2label"].items()}
+        self.label2id = config.get("label2id") or {label: i for i, label in self.id2label.items()}
+        self.num_labels = len(self.id2label)
+        self.problem_type = config.get("problem_type")
+        self._commit_hash = None
+        self._name_or_path = revision or model_dir
+
+
+class OnnxTokenizer:
+    """
+    Быстрый токенизатор из tokenizer.json (библиотека tokenizers) с той частью
+    интерфейса transformers, которая нужна LongTextClassifier и zero-shot:
+    вызов с нарезкой на окна, pad и num_special_tokens_to_add.
+    В transformers 5 даже AutoTokenizer импортирует torch, а здесь его нет.
+
+    Обрезка в tokenizers - состояние объекта Tokenizer, поэтому для каждого
+    набора параметров обрезки создается своя копия, которая больше не
+    перенастраивается: вызовы из разных потоков не мешают друг другу.
+    """
+
+    def __init__(self, model_dir):
+        from tokenizers import Tokenizer
+
+        self.backend = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.backend.no_padding()
+        self.backend.no_truncation()
+        # (max_length, stride, strategy) -> настроенная копия backend
+        self._truncating = {}
+        self._lock = threading.Lock()
+        config = _read_json(os.path.join(model_dir, "tokenizer_config.json"))
+
+        max_length = config.get("model_max_length") or 512
+        # Для моделей без ограничения transformers пишет огромное число
+        self.model_max_length = int(max_length) if max_length < 1e6 else 512
+
+        pad_token = config.get("pad_token") or "[PAD]"
+        if isinstance(pad_token, dict):
+            pad_token = pad_token.get("content", "[PAD]")
+        self.pad_token_id = self.backend.token_to_id(pad_token) or 0
+
+    def _encoder(self, truncation, max_length, stride):
+        """Токенизатор с нужной обрезкой (без обрезки - общий backend)"""
+        if not truncation:
+            return self.backend
+
+        strategy = truncation if isinstance(truncation, str) else "longest_first"
+        key = (max_length or self.model_max_length, stride, strategy)
+        with self._lock:
+            encoder = self._truncating.get(key)
+            if encoder is None:
+                from tokenizers import Tokenizer
+                encoder = Tokenizer.from_str(self.backend.to_str())
+                encoder.enable_truncation(key[0], stride=stride, strategy=strategy)
+                self._truncating[key] = encoder
+        return encoder
+
+    def num_special_tokens_to_add(self, pair=False):
+        processor = self.backend.post_processor
+        return processor.num_special_tokens_to_add(pair) if processor is not None else 0
+
+    def __call__(self, text, text_pair=None, truncation=False, max_length=None, stride=0,
+                 return_overflowing_tokens=False, padding=False, return_tensors=None):
+        """
+        Токенизация списка текстов (или пар текст-гипотеза)
+
+        Returns:
+            dict: input_ids, token_type_ids (списки или numpy-массивы при return_tensors="np"),
+                  overflow_to_sample_mapping при return_overflowing_tokens
+        """
+        texts = [text] if isinstance(text, str) else list(text)
+        if text_pair is not None:
+            pairs = [text_pair] * len(texts) if isinstance(text_pair, str) else list(text_pair)
+            texts = list(zip(texts, pairs))
+
+        encoder = self._encoder(truncation, max_length, stride)
+
+        input_ids, token_type_ids, owners = [], [], []
+        for i, encoding in enumerate(encoder.encode_batch(texts)):
+            windows = [encoding] + (list(encoding.overflowing) if return_overflowing_tokens else [])
+            for window in windows:
+                input_ids.append(window.ids)
+                token_type_ids.append(window.type_ids)
+                owners.append(i)
+
+        encoded = {"input_ids": input_ids, "token_type_ids": token_type_ids}
+        if padding or return_tensors == "np":
+            encoded = self.pad(encoded, return_tensors="np")
+        if return_overflowing_tokens:
+            encoded["overflow_to_sample_mapping"] = owners
+        return encoded
+
+    def pad(self, encoded, return_tensors="np"):
+        """Дополнение до самой длинной последовательности батча (numpy)"""
+        sequences = encoded["input_ids"]
+        length = max((len(ids) for ids in sequences), default=0)
+        input_ids = np.full((len(sequences), length), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(sequences), length), dtype=np.int64)
+        token_type_ids = np.zeros((len(sequences), length), dtype=np.int64)
+
+        for i, ids in enumerate(sequences):
+            input_ids[i, :len(ids)] = ids
+            attention_mask[i, :len(ids)] = 1
+            if "token_type_ids" in encoded:
+                token_type_ids[i, :len(ids)] = encoded["token_type_ids"][i]
+
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": token_type_ids}
+
+
+class OnnxClassifier:
+    """
+    Классификатор последовательностей на ONNX Runtime.
+    Предоставляет tokenizer, config и logits(batch) - этого достаточно
+    для LongTextClassifier, поэтому анализаторы работают с ним так же,
+    как с пайплайном transformers. Ни transformers, ни torch не импортируются.
+    """
+
+    def __init__(self, model_dir, quantized=True, num_threads=None):
+        """
+        Args:
+            model_dir: каталог, созданный export_onnx
+            quantized: использовать int8-модель, если она есть
+            num_threads: число потоков ONNX Runtime (None - по числу ядер)
+        """
+        import onnxruntime as ort
+
+        self.model_dir = model_dir
+        int8_path = os.path.join(model_dir, INT8_FILE)
+        self.quantized = quantized and os.path.exists(int8_path)
+        path = int8_path if self.quantized else os.path.join(model_dir, FP32_FILE)
+        self.model_path = path
+
+        self.tokenizer = OnnxTokenizer(model_dir)
+        # Ревизия для ключа кэша: результаты int8 и fp32 немного различаются
+        self.config = OnnxConfig(model_dir, revision=f"onnx-{'int8' if self.quantized else 'fp32'}:{model_dir}")
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [item.name for item in self.session.get_inputs()]
+
+    @classmethod
+    def from_model_name(cls, model_name, onnx_root=ONNX_ROOT, quantized=True, **kwargs):
+        """
+        Загрузка модели, экспортированной в onnx_root шагом сборки.
+        Экспорт во время работы не выполняется: он требует torch и занял бы
+        первый запрос; FileNotFoundError подсказывает команду экспорта.
+        """
+        model_dir = onnx_model_dir(model_name, onnx_root)
+        if not os.path.exists(os.path.join(model_dir, FP32_FILE)):
+            raise FileNotFoundError(
+                f"ONNX-модель {model_name} не найдена в {model_dir}; "
+                f"экспортируйте ее: python -m utils.onnx_backend --export {model_name}"
+            )
+        return cls(model_dir, quantized=quantized, **kwargs)
+
+    def logits(self, batch):
+        """
+        Логиты для батча токенов
+
+        Args:
+            batch: {input_ids, attention_mask[, token_type_ids]} - numpy-массивы
+
+        Returns:
+            np.ndarray: (batch, num_labels)
+        """
+        feeds = {}
+        for name in self.input_names:
+            value = batch.get(name)
+            if value is None:
+                value = np.zeros_like(batch["input_ids"])
+            feeds[name] = np.asarray(value, dtype=np.int64)
+        return self.session.run(["logits"], feeds)[0]
+
+
+class OnnxZeroShotClassifier(OnnxClassifier):
+    """
+    Zero-shot классификация через NLI-модель на ONNX Runtime.
+    Повторяет логику пайплайна transformers "zero-shot-classification"
+    и возвращает результат того же формата.
+    """
+
+    def __init__(self, model_dir, quantized=True, num_threads=None):
+        super().__init__(model_dir, quantized, num_threads)
+        self._find_entailment_id()
+
+    @classmethod
+    def from_classifier(cls, classifier):
+        """Zero-shot поверх уже загруженного OnnxClassifier (общая сессия и токенизатор)"""
+        instance = cls.__new__(cls)
+        instance.__dict__.update(classifier.__dict__)
+        instance._find_entailment_id()
+        return instance
+
+    def _find_entailment_id(self):
+        # Как в пайплайне: метка, начинающаяся с "entail", иначе последняя
+        self.entailment_id = -1
+        for label, index in self.config.label2id.items():
+            if label.lower().startswith("entail"):
+                self.entailment_id = index
+                break
+        # Метка противоречия для multi_label - по label2id; без нее, как
+        # в пайплайне, первая метка, а при entailment на месте 0 - последняя
+        self.contradiction_id = -1 if self.entailment_id == 0 else 0
+        for label, index in self.config.label2id.items():
+            if label.lower().startswith("contradict"):
+                self.contradiction_id = index
+                break
+
+    def __call__(self, sequences, candidate_labels, hypothesis_template="This example is {}.",
+                 multi_label=False):
+        """
+        Args:
+            sequences: текст или список текстов
+            candidate_labels: метки-кандидаты
+            hypothesis_template: шаблон гипотезы для NLI
+            multi_label: независимые вероятности меток вместо softmax по меткам
+
+        Returns:
+            dict (или список dict): {sequence, labels, scores}, метки по убыванию score
+        """
+        single = isinstance(sequences, str)
+        if isinstance(candidate_labels, str):
+            candidate_labels = [label.strip() for label in candidate_labels.split(",") if label.strip()]
+        hypotheses = [hypothesis_template.format(label) for label in candidate_labels]
+
+        results = []
+        for sequence in ([sequences] if single else sequences):
+            batch = self.tokenizer(
+                [sequence] * len(hypotheses),
+                hypotheses,
+                padding=True,
+                truncation="only_first",
+                return_tensors="np"
+            )
+            logits = self.logits(dict(batch)).astype(np.float32)
+
+            if multi_label or len(candidate_labels) == 1:
+                # Softmax entailment против contradiction для каждой метки отдельно
+                pair = logits[:, [self.contradiction_id, self.entailment_id]]
+                exp = np.exp(pair - pair.max(axis=1, keepdims=True))
+                scores = exp[:, 1] / exp.sum(axis=1)
+            else:
+                entail = logits[:, self.entailment_id]
+                exp = np.exp(entail - entail.max())
+                scores = exp / exp.sum()
+
+            order = np.argsort(-scores, kind="stable")
+            results.append({
+                "sequence": sequence,
+                "labels": [candidate_labels[i] for i in order],
+                "scores": [float(scores[i]) for i in order]
+            })
+
+        return results[0] if single else results
+
+
+def build_test_model(path, labels=("NEGATIVE", "NEUTRAL", "POSITIVE"), problem_type=None, seed=0):
+    """
+    Маленькая BERT-модель со случайными весами для проверок без доступа к хабу
+    (посимвольный словарь, 2 слоя по 32 нейрона)
+    """
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    torch.manual_seed(seed)
+    os.makedirs(path, exist_ok=True)
+    chars = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяabcdefghijklmnopqrstuvwxyz0123456789"
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list(chars) + \
+        ["##" + c for c in chars] + list(".,!?-")
+    vocab_path = os.path.join(path, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+
+    BertTokenizerFast(vocab_path, do_lower_case=True, model_max_length=512).save_pretrained(path)
+    config = BertConfig(
+        vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=512, num_labels=len(labels),
+        id2label=dict(enumerate(labels)), label2id={label: i for i, label in enumerate(labels)},
+        problem_type=problem_type
+    )
+    BertForSequenceClassification(config).save_pretrained(path)
+    return path
+
+
+SAMPLE_TEXTS = [
+    "Здравствуйте, у меня не работает интернет уже третий день.",
+    "Спасибо большое, вы очень помогли!",
+    "Я хочу вернуть деньги за сломанный телефон.",
+    "Подскажите, пожалуйста, статус заказа номер 12345.",
+    "Это просто ужасно, я буду жаловаться!",
+    "Оператор быстро решил мою проблему, всё отлично."
+]
+
+
+def check_parity(model_path, onnx_dir, texts=None, atol=0.05, quantized=True):
+    """
+    Сравнение оценок torch-пайплайна и ONNX-модели на одних текстах
+
+    Returns:
+        dict: максимальное расхождение оценок, совпадение top-1 меток, passed
+    """
+    from transformers import pipeline
+    from .long_text import LongTextClassifier
+
+    texts = texts or SAMPLE_TEXTS
+    torch_probs = LongTextClassifier(pipeline("text-classification", model=model_path)).predict_proba(texts)
+    onnx_probs = LongTextClassifier(OnnxClassifier(onnx_dir, quantized=quantized)).predict_proba(texts)
+
+    max_diff = float(np.abs(torch_probs - onnx_probs).max())
+    top1_agreement = float(np.mean(torch_probs.argmax(axis=1) == onnx_probs.argmax(axis=1)))
+    return {
+        "quantized": quantized,
+        "max_abs_diff": round(max_diff, 5),
+        "top1_agreement": round(top1_agreement, 3),
+        "passed": max_diff <= atol
+    }
+
+
+def _peak_rss_mb():
+    """Пик RSS процесса, МБ"""
+    # VmHWM сбрасывается при exec, в отличие от ru_maxrss, который наследует пик родителя
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _bench_worker(backend, model_path, n_texts, batch_size):
+    """Замер в отдельном процессе: импорт + загрузка, латентность, пик RSS"""
+    started = time.perf_counter()
+    from .long_text import LongTextClassifier
+    if backend == "torch":
+        from transformers import pipeline
+        classifier = LongTextClassifier(pipeline("text-classification", model=model_path), batch_size=batch_size)
+    else:
+        classifier = LongTextClassifier(OnnxClassifier(model_path, quantized=backend == "onnx-int8"),
+                                        batch_size=batch_size)
+    load_seconds = time.perf_counter() - started
+
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] + f" Номер обращения {i}." for i in range(n_texts)]
+    classifier.predict_proba(texts[:batch_size])  # прогрев
+
+    timings = []
+    for start in range(0, n_texts, batch_size):
+        batch_started = time.perf_counter()
+        classifier.predict_proba(texts[start:start + batch_size])
+        timings.append(time.perf_counter() - batch_started)
+
+    max_rss_mb = _peak_rss_mb()
+    print(json.dumps({
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "median_batch_ms": round(float(np.median(timings)) * 1000, 2),
+        "texts_per_second": round(n_texts / sum(timings), 1),
+        "max_rss_mb": round(max_rss_mb, 1),
+        "torch_imported": "torch" in sys.modules
+    }))
+
+
+def benchmark(model_path, onnx_dir, n_texts=256, batch_size=32):
+    """
+    Сравнение torch-пайплайна и ONNX Runtime (fp32 и int8) по скорости и памяти.
+    Каждый бэкенд запускается в отдельном процессе, чтобы пик RSS
+    не включал библиотеки другого бэкенда.
+
+    Returns:
+        list: результаты по бэкендам
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = [("torch", model_path), ("onnx-fp32", onnx_dir), ("onnx-int8", onnx_dir)]
+
+    results = []
+    for backend, path in runs:
+        output = subprocess.run(
+            [sys.executable, "-m", "utils.onnx_backend", "--bench-worker", backend,
+             os.path.abspath(path), str(n_texts), str(batch_size)],
+            cwd=package_root, capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench-worker":
+        _bench_worker(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+
+    elif len(sys.argv) > 1 and sys.argv[1] == "--export":
+        # python -m utils.onnx_backend --export [модель ...] - по умолчанию PROJECT_MODELS
+        for name, model_dir in export_models(sys.argv[2:] or PROJECT_MODELS).items():
+            print(f"{name} -> {model_dir}")
+
+    else:
+        # Проверка на маленькой локальной модели (без доступа к хабу)
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = build_test_model(os.path.join(tmp, "model"))
+            onnx_dir = export_onnx(model_path, os.path.join(tmp, "onnx"))
+
+            for quantized in (False, True):
+                parity = check_parity(model_path, onnx_dir, quantized=quantized)
+                print(f"Паритет ({'int8' if quantized else 'fp32'}): "
+                      f"max |diff| = {parity['max_abs_diff']}, top-1 = {parity['top1_agreement']:.0%}, "
+                      f"{'OK' if parity['passed'] else 'FAIL'}")
+
+            print(f"{'бэкенд':<10} {'загрузка, с':>12} {'батч, мс':>10} {'текст/с':>10} {'RSS, МБ':>10} "
+                  f"{'torch':>6}")
+            for row in benchmark(model_path, onnx_dir):
+                print(f"{row['backend']:<10} {row['load_seconds']:>12} {row['median_batch_ms']:>10} "
+                      f"{row['texts_per_second']:>10} {row['max_rss_mb']:>10} {str(row['torch_imported']):>6}")
@@ -0,0 +1,113 @@
+# pipeline.py - Анализ звонка целиком: транскрибация, диаризация, привязка текста к дикторам
+from .alignment import align_transcript
+
+
+def default_speaker_map(diarization):
+    """
+    Роли дикторов по порядку появления: первым говорит оператор
+    (звонок в поддержку начинается с приветствия), вторым - клиент
+
+    Returns:
+        dict: {'speaker_1': 'operator', 'speaker_2': 'client'}
+    """
+    roles = ['operator', 'client']
+    speaker_map = {}
+    for segment in sorted(diarization.get('segments', []), key=lambda x: x['start']):
+        if segment['speaker'] not in speaker_map and len(speaker_map) < len(roles):
+            speaker_map[segment['speaker']] = roles[len(speaker_map)]
+    return speaker_map
+
+
+def analyze_call(audio_path, engine=False, speaker_map=None, call_id=None, transcriber=None,
+                 diarizer=None, profanity_filter=None, keyword_index=None):
+    """
+    Сегменты транскрипции получают диктора по времени из диаризации
+    (SpeakerAligner), а не из текста реплик, и дальше анализируются
+    по дикторам
+
+    Args:
+        audio_path: путь к WAV-файлу
+        engine: True - потоковое распознавание и диаризация по звуку,
+                False - демо-данные обоих этапов; стереозапись АТС всегда
+                делится на дикторов по каналам (один линейный проход по файлу)
+        speaker_map: переименование дикторов (по умолчанию default_speaker_map)
+        call_id: идентификатор звонка - транскрипт добавляется в индекс ключевых слов
+                 (только распознанный движком: демо-текст корпус не пополняет)
+        transcriber, diarizer, profanity_filter: готовые экземпляры (по умолчанию создаются)
+        keyword_index: индекс ключевых слов (по умолчанию общий get_keyword_index)
+
+    Returns:
+        dict: transcript, segments (с speaker и speaker_overlap), speaker_stats,
+              статистика нецензурной лексики по дикторам, keywords - отличительные
+              слова звонка (при call_id и распознанном движком тексте);
+              error - если не удалась транскрибация,
+              diarization_error - если не удалась диаризация (реплики остаются
+              с диктором 'unknown')
+    """
+    from .transcribe import AudioTranscriber, probe_wav_header
+    from .diarization import SimpleDiarizer
+    from .profanity import ProfanityFilter
+
+    transcriber = transcriber or AudioTranscriber()
+    diarizer = diarizer or SimpleDiarizer()
+
+    transcription = transcriber.transcribe(audio_path, method="stream" if engine else "demo")
+    if transcription.get("error"):
+        return {"error": transcription["error"], "segments": []}
+
+    stereo = probe_wav_header(audio_path)["channels"] == 2
+    diarization = diarizer.diarize(audio_path, method="engine" if engine or stereo else "demo")
+
+    speaker_map = speaker_map if speaker_map is not None else default_speaker_map(diarization)
+    segments = align_transcript(transcription, diarization, speaker_map)
+
+    # Счетчики - по разу на вхождение слова, сколько бы основ словаря к нему ни подошло
+    profanity = (profanity_filter or ProfanityFilter()).analyze_conversation(segments)
+
+    # Демо-текст одинаков для всех звонков: в постоянном индексе он бы
+    # накапливался с каждым запросом и искажал частоты слов корпуса
+    keywords = []
+    if call_id is not None and not transcription.get("demo"):
+        if keyword_index is None:
+            from .keyword_index import get_keyword_index
+            keyword_index = get_keyword_index()
+        keywords = keyword_index.add_call(call_id, transcription["text"])
+
+    result = {
+        "transcript": transcription["text"],
+        "segments": profanity["masked_dialog"],
+        "speaker_stats": {
+            speaker_map.get(speaker, speaker): stats
+            for speaker, stats in diarization.get("speaker_stats", {}).items()
+        },
+        "has_profanity": profanity["total_profanity_count"] > 0,
+        "total_profanity_count": profanity["total_profanity_count"],
+        "profanity_by_speaker": profanity["profanity_by_speaker"],
+        "keywords": keywords
+    }
+    if not diarization.get("success"):
+        result["diarization_error"] = diarization.get("error")
+    return result
+
+
+if __name__ == "__main__":
+    # Синтетический звонок: дикторы определяются по звуку, текст - демо-движком распознавания
+    import os
+    import wave
+    import tempfile
+    from .diarization import synthesize_dialogue
+
+    samples, _ = synthesize_dialogue(60)
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_path = os.path.join(tmp, "call.wav")
+        with wave.open(audio_path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(samples.tobytes())
+        result = analyze_call(audio_path, engine=True)
+
+    for segment in result["segments"]:
+        print(f"{segment['speaker']} ({segment['speaker_overlap']:.0%}): {segment['text']}")
+    print(result["speaker_stats"])
+    print(result["profanity_by_speaker"])
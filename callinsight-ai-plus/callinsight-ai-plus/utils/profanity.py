@@ -1,15 +1,40 @@
 # profanity.py - Улучшенная версия с примером словаря
+import os
 import re
 
+from .lexicon import trie_regex
+
+# Словарь проекта (data/ рядом с пакетом utils, независимо от текущего каталога)
+PROFANITY_DICTIONARY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    "data", "profanity_dict.txt")
+
+
 class ProfanityFilter:
-    def __init__(self, dictionary_path=None):
+    def __init__(self, dictionary_path=None, use_snapshot=True):
+        """
+        Args:
+            dictionary_path: файл словаря (по строке на основу слова),
+                             по умолчанию PROFANITY_DICTIONARY
+            use_snapshot: без явного словаря брать словарь и готовое дерево основ
+                          из снимка data/ (см. lexicon_snapshot) и подхватывать его обновления;
+                          без снимка словарь собирается из того же PROFANITY_DICTIONARY
+        """
+        self._patterns = None
+        self._snapshot = None
+        if use_snapshot and dictionary_path is None:
+            from .lexicon_snapshot import SnapshotLink
+            self._snapshot = SnapshotLink(self._apply_snapshot)
+            if self._snapshot.sync():
+                return
+        dictionary_path = dictionary_path or PROFANITY_DICTIONARY
+
         # Базовый словарь нецензурных слов (можно расширить)
         self.profanity_words = [
             "плохоеслово1",  # Замените на реальные слова
             "оскорбление",
             # Добавьте сюда свой список
         ]
-        
+
         # Загрузка кастомного словаря
         if dictionary_path:
             try:
@@ -18,61 +43,175 @@ class ProfanityFilter:
                     self.profanity_words.extend(custom_words)
             except FileNotFoundError:
                 print(f"Файл словаря {dictionary_path} не найден, используется базовый список.")
-        
-        # Создаем регулярные выражения для поиска
-        self.patterns = []
-        for word in self.profanity_words:
-            # Учитываем возможные морфологические варианты
-            pattern = re.compile(r'\b' + re.escape(word) + r'\w*\b', re.IGNORECASE)
-            self.patterns.append(pattern)
-    
+
+        # Все основы словаря - одно выражение в виде префиксного дерева:
+        # текст просматривается один раз слева направо, и время не растет
+        # с числом слов в словаре. Слово засчитывается, если начинается
+        # с любой основы (учитываем морфологические варианты).
+        stems = sorted({word.lower() for word in self.profanity_words if word})
+        self.regex = re.compile(r'\b(?:' + trie_regex(stems) + r')\w*\b', re.IGNORECASE) if stems else None
+
+    def snapshot_state(self):
+        """
+        Раздел снимка словарей: текст выражения-дерева, а не скомпилированное
+        выражение - при загрузке оно все равно компилируется заново
+        """
+        return {"profanity": {"words": self.profanity_words,
+                              "pattern": self.regex.pattern if self.regex else None}}
+
+    def _apply_snapshot(self, data):
+        pattern = data["profanity"]["pattern"]
+        self.profanity_words = list(data["profanity"]["words"])
+        self.regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self._patterns = None
+
+    @property
+    def patterns(self):
+        """Отдельные выражения для каждого слова (прежний способ поиска, для сравнения)"""
+        if self._patterns is None:
+            self._patterns = [re.compile(r'\b' + re.escape(word) + r'\w*\b', re.IGNORECASE)
+                              for word in self.profanity_words]
+        return self._patterns
+
+    def find_profanity(self, text):
+        """
+        Поиск нецензурных слов за один проход. Каждое вхождение слова
+        находится один раз, даже если оно начинается с нескольких основ
+        словаря ("бля" и "блять"): прежний поиск по выражению на основу
+        засчитывал такое слово по разу на каждую основу.
+
+        Returns:
+            list: [{word, start, end}] по порядку в тексте
+        """
+        if self._snapshot is not None:
+            self._snapshot.sync()
+        if self.regex is None:
+            return []
+        return [{"word": match.group(), "start": match.start(), "end": match.end()}
+                for match in self.regex.finditer(text)]
+
+    @staticmethod
+    def mask_spans(text, spans):
+        """Замена найденных слов звездочками по готовым позициям"""
+        if not spans:
+            return text
+        parts = []
+        position = 0
+        for span in spans:
+            parts.append(text[position:span["start"]])
+            parts.append('*' * (span["end"] - span["start"]))
+            position = span["end"]
+        parts.append(text[position:])
+        return "".join(parts)
+
     def contains_profanity(self, text):
-        matches = []
-        for pattern in self.patterns:
-            found = pattern.findall(text)
-            if found:
-                matches.extend(found)
+        """
+        Returns:
+            tuple: (найдено ли, слова по порядку в тексте - по разу на вхождение)
+        """
+        matches = [span["word"] for span in self.find_profanity(text)]
         return len(matches) > 0, matches
-    
+
     def mask_profanity(self, text):
-        masked_text = text
-        for pattern in self.patterns:
-            # Заменяем каждое найденное слово на звездочки
-            def replace_func(match):
-                return '*' * len(match.group())
-            masked_text = pattern.sub(replace_func, masked_text)
-        return masked_text
-    
+        # Заменяем каждое найденное слово на звездочки
+        return self.mask_spans(text, self.find_profanity(text))
+
+    def analyze_line(self, line):
+        """
+        Поиск и маскирование в одной реплике (один проход по тексту)
+
+        Returns:
+            dict: реплика с замаскированным текстом, profanity_found,
+                  profanity_words и позициями profanity_spans в исходном тексте
+        """
+        spans = self.find_profanity(line["text"])
+        return {
+            **line,
+            "text": self.mask_spans(line["text"], spans),
+            "profanity_found": bool(spans),
+            "profanity_words": [span["word"] for span in spans],
+            "profanity_spans": spans
+        }
+
+    def iter_analyze_conversation(self, dialog):
+        """
+        Потоковый вариант analyze_conversation для очень длинных диалогов:
+        реплики обрабатываются и отдаются по одной, диалог целиком
+        в памяти не хранится
+
+        Yields:
+            dict: реплика в формате analyze_line
+        """
+        for line in dialog:
+            yield self.analyze_line(line)
+
     def analyze_conversation(self, dialog):
+        """
+        Маскирование и подсчет по диалогу. Счетчики - число вхождений
+        нецензурных слов (см. find_profanity), а не совпадений с основами
+
+        Returns:
+            dict: total_profanity_count, profanity_by_speaker, masked_dialog
+        """
         stats = {
             "total_profanity_count": 0,
             "profanity_by_speaker": {"operator": 0, "client": 0},
             "masked_dialog": []
         }
-        
-        for line in dialog:
-            has_profanity, words = self.contains_profanity(line["text"])
-            
-            if has_profanity:
-                stats["total_profanity_count"] += len(words)
-                speaker = line.get("speaker", "client")
-                if speaker in stats["profanity_by_speaker"]:
-                    stats["profanity_by_speaker"][speaker] += len(words)
-                else:
-                    stats["profanity_by_speaker"][speaker] = len(words)
-                
-                stats["masked_dialog"].append({
-                    **line,
-                    "text": self.mask_profanity(line["text"]),
-                    "profanity_found": True,
-                    "profanity_words": words
-                })
-            else:
-                stats["masked_dialog"].append({
-                    **line,
-                    "text": line["text"],
-                    "profanity_found": False,
-                    "profanity_words": []
-                })
-        
-        return stats
\ No newline at end of file
+
+        for masked_line in self.iter_analyze_conversation(dialog):
+            count = len(masked_line["profanity_words"])
+            if count:
+                stats["total_profanity_count"] += count
+                speaker = masked_line.get("speaker", "client")
+                stats["profanity_by_speaker"][speaker] = stats["profanity_by_speaker"].get(speaker, 0) + count
+
+            stats["masked_dialog"].append(masked_line)
+
+        return stats
+
+
+if __name__ == "__main__":
+    # Сравнение с прежним поиском (отдельное выражение на каждое слово словаря)
+    import os
+    import time
+    import random
+    import tempfile
+
+    random.seed(0)
+    alphabet = "абвгдежзиклмнопрстуфхцчшщыэюя"
+    stems = sorted({"".join(random.choices(alphabet, k=random.randint(5, 8))) for _ in range(3000)})
+    words = ["клиент", "звонит", "по", "поводу", "заказа", "и", "очень", "недоволен", "доставкой"]
+    dialog = [{
+        "speaker": random.choice(["operator", "client"]),
+        "text": " ".join(random.choice(words) if random.random() > 0.02 else random.choice(stems) + "ый"
+                         for _ in range(30))
+    } for _ in range(1000)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dict.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(stems))
+        profanity_filter = ProfanityFilter(path, use_snapshot=False)
+
+    started = time.perf_counter()
+    result = profanity_filter.analyze_conversation(dialog)
+    single_pass_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    old_count = 0
+    old_masked = []
+    for line in dialog:
+        found = [word for pattern in profanity_filter.patterns for word in pattern.findall(line["text"])]
+        old_count += len(found)
+        masked = line["text"]
+        for pattern in profanity_filter.patterns:
+            masked = pattern.sub(lambda match: '*' * len(match.group()), masked)
+        old_masked.append(masked)
+    per_pattern_seconds = time.perf_counter() - started
+
+    print(f"Словарь {len(profanity_filter.profanity_words)} слов, {len(dialog)} реплик: "
+          f"один проход {single_pass_seconds:.3f} с, по выражению на слово {per_pattern_seconds:.3f} с")
+    print(f"Найдено {result['total_profanity_count']} (прежним способом, по разу на основу: {old_count}), "
+          f"маскирование совпадает: {old_masked == [line['text'] for line in result['masked_dialog']]}")
+    print(result["profanity_by_speaker"])
\ No newline at end of file
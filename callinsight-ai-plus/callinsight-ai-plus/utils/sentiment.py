@@ -1,44 +1,116 @@
 # sentiment.py
-from transformers import pipeline
 import numpy as np
-from collections import Counter
+from collections import Counter, deque
+
+from .long_text import LongTextClassifier
+from .lexicon import LexiconMatcher
+from .inference_cache import get_inference_cache, model_revision
+from .model_registry import get_model_registry
 
 class SentimentAnalyzer:
     """
     Анализатор тональности для русского языка
     """
     
-    def __init__(self, model_name="seara/rubert-tiny2-russian-sentiment"):
+    # Маппинг на русские метки
+    label_map = {
+        "POSITIVE": "позитивный",
+        "NEGATIVE": "негативный",
+        "NEUTRAL": "нейтральный",
+        "LABEL_0": "негативный",  # для некоторых моделей
+        "LABEL_1": "позитивный"
+    }
+    
+    def __init__(self, model_name="seara/rubert-tiny2-russian-sentiment", batch_size=32,
+                 use_cache=True, backend="torch", onnx_dir=None, use_snapshot=True):
         """
         Инициализация модели анализа тональности
         
         Args:
             model_name: название предобученной модели
+            batch_size: размер батча для пакетного анализа
+            use_cache: кэшировать результаты модели (общий InferenceCache)
+            backend: "torch" - пайплайн transformers, "onnx" - int8-модель на ONNX Runtime
+            onnx_dir: каталог экспортированной модели (по умолчанию data/onnx/<модель>,
+                      создается шагом сборки python -m utils.onnx_backend --export)
+            use_snapshot: брать скомпилированные словари из снимка data/
+                          (см. lexicon_snapshot) и подхватывать его обновления
         """
-        try:
-            self.analyzer = pipeline(
-                "sentiment-analysis",
-                model=model_name,
-                tokenizer=model_name
-            )
-            self.model_loaded = True
-        except Exception as e:
-            print(f"Ошибка загрузки модели: {e}")
-            print("Используется простой анализатор на правилах")
-            self.model_loaded = False
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache = get_inference_cache() if use_cache else None
+        # Модель берется из общего реестра и загружается при первом анализе
+        self.analyzer = get_model_registry().handle(
+            "sentiment-analysis", model_name, backend=backend, onnx_dir=onnx_dir
+        )
+        # Длинные тексты - окнами по 512 токенов вместо обрезки
+        self.long_text = LongTextClassifier(self.analyzer, batch_size=batch_size)
+        self._model_loaded = None
         
-        # Словари для rule-based анализа (запасной вариант)
+        # Словари для rule-based анализа (запасной вариант).
+        # Сравнение идет по нормальным формам, поэтому достаточно одной формы
+        # слова: "доволен" находит и "довольна", "довольны"
         self.positive_words = [
             "хорошо", "отлично", "прекрасно", "замечательно", "спасибо",
-            "доволен", "довольна", "довольны", "супер", "отличный",
+            "доволен", "супер", "отличный",
             "рекомендую", "понравилось", "удобно", "быстро", "качественно"
         ]
         
         self.negative_words = [
-            "плохо", "ужасно", "кошмар", "недоволен", "недовольна",
-            "недовольны", "жалоба", "проблема", "сломал", "не работает",
-            "медленно", "долго", "дорого", "разочарован", "отвратительно"
+            "плохо", "ужасно", "кошмар", "недоволен",
+            "жалоба", "проблема", "сломал", "не работает",
+            "медленно", "долго", "дорого", "разочарован", "отвратительно",
+            # "сломался" - другой глагол (сломаться), а не форма "сломал"
+            "сломался"
         ]
+        
+        # Словари компилируются в префиксное дерево для поиска за один проход;
+        # сравнение по нормальным формам ("недовольна" = "недовольный").
+        # Если есть снимок словарей, готовое дерево берется из него.
+        self._snapshot = None
+        if use_snapshot:
+            from .lexicon_snapshot import SnapshotLink
+            self._snapshot = SnapshotLink(self._apply_snapshot)
+        if not self._sync_snapshot():
+            self.lexicon = LexiconMatcher({
+                "positive": self.positive_words,
+                "negative": self.negative_words
+            }, lemmatize=True)
+    
+    def _sync_snapshot(self):
+        """Применение новой версии снимка словарей; True - словари взяты из снимка"""
+        return self._snapshot is not None and self._snapshot.sync()
+    
+    def snapshot_state(self):
+        """Раздел снимка словарей"""
+        return {"sentiment": {
+            "positive_words": self.positive_words,
+            "negative_words": self.negative_words,
+            "lexicon": self.lexicon.to_state()
+        }}
+    
+    def _apply_snapshot(self, data):
+        section = data["sentiment"]
+        self.positive_words = section["positive_words"]
+        self.negative_words = section["negative_words"]
+        self.lexicon = LexiconMatcher.from_state(section["lexicon"])
+    
+    @property
+    def model_loaded(self):
+        """Загружена ли модель (при ошибке загрузки используется анализ на правилах)"""
+        if self._model_loaded is None:
+            try:
+                self.analyzer.get(count_hit=False)
+                self._model_loaded = True
+            except Exception as e:
+                print(f"Ошибка загрузки модели: {e}")
+                print("Используется простой анализатор на правилах")
+                self._model_loaded = False
+        return self._model_loaded
+    
+    @property
+    def cache_key(self):
+        return f"sentiment:{self.model_name}:{model_revision(self.analyzer)}"
     
     def analyze_sentiment_transformers(self, text):
         """
@@ -55,41 +127,71 @@ class SentimentAnalyzer:
             }
         
         try:
-            # Ограничиваем длину текста для модели
-            truncated_text = text[:512]
-            
-            result = self.analyzer(truncated_text)[0]
-            
-            # Маппинг на русские метки
-            label_map = {
-                "POSITIVE": "позитивный",
-                "NEGATIVE": "негативный",
-                "NEUTRAL": "нейтральный",
-                "LABEL_0": "негативный",  # для некоторых моделей
-                "LABEL_1": "позитивный"
-            }
-            
-            return {
-                "label": result["label"],
-                "score": round(result["score"], 3),
-                "sentiment_ru": label_map.get(result["label"], result["label"])
-            }
+            return self._model_batch([text])[0]
             
         except Exception as e:
             print(f"Ошибка анализа тональности: {e}")
             return self.analyze_sentiment_rules(text)
     
+    def _format_model_result(self, result):
+        return {
+            "label": result["label"],
+            "score": round(result["score"], 3),
+            "sentiment_ru": self.label_map.get(result["label"], result["label"])
+        }
+    
+    def _model_batch(self, texts, batch_size=None):
+        """Результаты модели для списка текстов (через кэш, если включен)"""
+        def compute(items):
+            return [self._format_model_result(output[0])
+                    for output in self.long_text.classify(items, batch_size)]
+        
+        if self.cache is None:
+            return compute(texts)
+        return [dict(result) for result in self.cache.cached_batch(self.cache_key, texts, compute)]
+    
+    def analyze_sentiment_transformers_batch(self, texts, batch_size=None):
+        """
+        Пакетный анализ тональности с помощью transformers.
+        Окна токенов всех текстов сортируются по длине, чтобы в батч
+        попадали окна близкой длины (меньше паддинга), результаты
+        возвращаются в исходном порядке.
+        
+        Returns:
+            list: результаты в порядке texts
+        """
+        neutral = {"label": "NEUTRAL", "score": 0.5, "sentiment_ru": "нейтрально"}
+        results = [dict(neutral) for _ in texts]
+        
+        indices = [i for i, text in enumerate(texts) if text and len(text.strip()) >= 3]
+        if not indices:
+            return results
+        
+        try:
+            outputs = self._model_batch([texts[i] for i in indices], batch_size)
+        except Exception as e:
+            print(f"Ошибка пакетного анализа тональности: {e}")
+            return self.analyze_sentiment_rules_batch(texts)
+        
+        for i, output in zip(indices, outputs):
+            results[i] = output
+        
+        return results
+    
     def analyze_sentiment_rules(self, text):
         """
         Rule-based анализ тональности (запасной вариант)
         """
         text_lower = text.lower()
         
-        # Подсчет положительных и отрицательных слов
-        pos_count = sum(1 for word in self.positive_words 
-                       if word in text_lower)
-        neg_count = sum(1 for word in self.negative_words 
-                       if word in text_lower)
+        # Подсчет положительных и отрицательных слов (по целым словам,
+        # отрицание перед словом меняет его полярность: "не плохо")
+        self._sync_snapshot()
+        counts, hits = self.lexicon.count(
+            text, flip={"positive": "negative", "negative": "positive"}
+        )
+        pos_count = counts.get("positive", 0)
+        neg_count = counts.get("negative", 0)
         
         total_words = len(text_lower.split())
         
@@ -117,9 +219,14 @@ class SentimentAnalyzer:
             "sentiment_ru": sentiment,
             "pos_count": pos_count,
             "neg_count": neg_count,
+            "hits": hits,
             "method": "rule_based"
         }
     
+    def analyze_sentiment_rules_batch(self, texts):
+        """Rule-based анализ списка текстов (тот же интерфейс, что у пакетного режима модели)"""
+        return [self.analyze_sentiment_rules(text) for text in texts]
+    
     def analyze_sentiment(self, text):
         """
         Основной метод анализа тональности
@@ -132,6 +239,26 @@ class SentimentAnalyzer:
         else:
             return self.analyze_sentiment_rules(text)
     
+    def analyze_sentiment_batch(self, texts, batch_size=None):
+        """
+        Пакетный анализ тональности
+        
+        Args:
+            texts: список текстов
+            batch_size: размер батча (по умолчанию self.batch_size)
+            
+        Returns:
+            list: результаты в порядке texts
+        """
+        if self.model_loaded:
+            return self.analyze_sentiment_transformers_batch(texts, batch_size)
+        else:
+            return self.analyze_sentiment_rules_batch(texts)
+    
+    def create_timeline(self, window_size=3, center=False):
+        """Инкрементальная шкала тональности для звонка в реальном времени"""
+        return SentimentTimeline(self, window_size, center)
+    
     def analyze_sentiment_timeline(self, segments, window_size=3):
         """
         Анализ тональности с временной шкалой
@@ -145,45 +272,32 @@ class SentimentAnalyzer:
         """
         sentiment_timeline = []
         
-        for i, segment in enumerate(segments):
-            if 'text' in segment and segment['text'].strip():
-                sentiment = self.analyze_sentiment(segment['text'])
-                
-                sentiment_point = {
-                    'time': segment.get('start', i),
-                    'text': segment['text'][:100],  # Ограничиваем длину
-                    'sentiment': sentiment['sentiment_ru'],
-                    'score': sentiment['score'],
-                    'speaker': segment.get('speaker', 'unknown')
-                }
-                
-                sentiment_timeline.append(sentiment_point)
+        indexed = [(i, segment) for i, segment in enumerate(segments)
+                   if 'text' in segment and segment['text'].strip()]
+        # Все тексты звонка анализируются одним пакетным вызовом
+        sentiments = self.analyze_sentiment_batch([segment['text'] for _, segment in indexed])
+        
+        for (i, segment), sentiment in zip(indexed, sentiments):
+            sentiment_point = {
+                'time': segment.get('start', i),
+                'text': segment['text'][:100],  # Ограничиваем длину
+                'sentiment': sentiment['sentiment_ru'],
+                'score': sentiment['score'],
+                'speaker': segment.get('speaker', 'unknown')
+            }
+            
+            sentiment_timeline.append(sentiment_point)
         
         # Применяем скользящее среднее для сглаживания
         if len(sentiment_timeline) > window_size:
-            smoothed_timeline = []
-            
-            for i in range(len(sentiment_timeline)):
-                start = max(0, i - window_size // 2)
-                end = min(len(sentiment_timeline), i + window_size // 2 + 1)
-                
-                window_scores = [s['score'] for s in sentiment_timeline[start:end]]
-                avg_score = np.mean(window_scores)
-                
-                smoothed_point = sentiment_timeline[i].copy()
-                smoothed_point['smoothed_score'] = round(avg_score, 3)
-                
-                # Определяем сглаженную тональность
-                if avg_score > 0.6:
-                    smoothed_point['smoothed_sentiment'] = 'позитивный'
-                elif avg_score < 0.4:
-                    smoothed_point['smoothed_sentiment'] = 'негативный'
-                else:
-                    smoothed_point['smoothed_sentiment'] = 'нейтральный'
-                
-                smoothed_timeline.append(smoothed_point)
+            smoothed_scores = SentimentTimeline.smooth(
+                [point['score'] for point in sentiment_timeline], window_size, center=True
+            )
             
-            return smoothed_timeline
+            return [
+                SentimentTimeline.with_smoothing(point, score)
+                for point, score in zip(sentiment_timeline, smoothed_scores)
+            ]
         
         return sentiment_timeline
     
@@ -240,13 +354,141 @@ class SentimentAnalyzer:
         }
 
 
+def score_to_sentiment(score):
+    """Конвертация скора в тональность"""
+    if score > 0.6:
+        return "позитивный"
+    elif score < 0.4:
+        return "негативный"
+    else:
+        return "нейтральный"
+
+
+class SentimentTimeline:
+    """
+    Шкала тональности, принимающая сегменты по одному (живой звонок).
+    Скользящее среднее поддерживается как бегущая сумма по окну - O(1)
+    на сегмент. Для офлайн-обработки тот же расчет выполняется
+    векторно через кумулятивную сумму (smooth).
+    """
+    
+    def __init__(self, analyzer=None, window_size=3, center=False):
+        """
+        Args:
+            analyzer: SentimentAnalyzer для оценки текста сегментов
+            window_size: размер окна сглаживания
+            center: False - окно из последних точек, точка выдается сразу;
+                    True - окно вокруг точки (как в analyze_sentiment_timeline),
+                    точка выдается с задержкой в window_size // 2 сегментов
+        """
+        self.analyzer = analyzer
+        self.window_size = window_size
+        self.center = center
+        self.points = []
+        self._window = deque()
+        self._window_sum = 0.0
+        self._pending = deque()
+        self._count = 0
+    
+    @staticmethod
+    def smooth(scores, window_size=3, center=True):
+        """
+        Векторное скользящее среднее через кумулятивную сумму
+        
+        Returns:
+            np.ndarray: сглаженные оценки той же длины
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        n = len(scores)
+        csum = np.concatenate([[0.0], np.cumsum(scores)])
+        idx = np.arange(n)
+        
+        if center:
+            lo = np.maximum(idx - window_size // 2, 0)
+            hi = np.minimum(idx + window_size // 2 + 1, n)
+        else:
+            lo = np.maximum(idx - window_size + 1, 0)
+            hi = idx + 1
+        
+        return (csum[hi] - csum[lo]) / (hi - lo)
+    
+    @staticmethod
+    def with_smoothing(point, smoothed_score):
+        smoothed_point = point.copy()
+        smoothed_point['smoothed_score'] = round(float(smoothed_score), 3)
+        smoothed_point['smoothed_sentiment'] = score_to_sentiment(smoothed_score)
+        return smoothed_point
+    
+    def add_segment(self, segment):
+        """
+        Оценка и добавление сегмента
+        
+        Returns:
+            list: точки, для которых сглаживание уже известно
+        """
+        text = segment.get('text', '')
+        if not text.strip():
+            return []
+        
+        sentiment = self.analyzer.analyze_sentiment(text)
+        return self.add_point({
+            'time': segment.get('start', self._count),
+            'text': text[:100],
+            'sentiment': sentiment['sentiment_ru'],
+            'score': sentiment['score'],
+            'speaker': segment.get('speaker', 'unknown')
+        })
+    
+    def add_point(self, point):
+        """Добавление уже оцененной точки {time, score, ...}"""
+        self._window.append((self._count, point['score']))
+        self._window_sum += point['score']
+        self._pending.append((self._count, point))
+        self._count += 1
+        return self._drain(final=False)
+    
+    def close(self):
+        """Завершение звонка: выдача точек, ожидавших правую часть окна"""
+        return self._drain(final=True)
+    
+    def _drain(self, final):
+        half = self.window_size // 2
+        emitted = []
+        
+        while self._pending:
+            index, point = self._pending[0]
+            if self.center:
+                if not final and index + half > self._count - 1:
+                    break
+                lo = index - half
+            else:
+                lo = index - self.window_size + 1
+            
+            # Убираем из бегущей суммы точки левее окна
+            while self._window[0][0] < lo:
+                self._window_sum -= self._window.popleft()[1]
+            
+            self._pending.popleft()
+            smoothed = self.with_smoothing(point, self._window_sum / len(self._window))
+            self.points.append(smoothed)
+            emitted.append(smoothed)
+        
+        return emitted
+
+
 class AdvancedSentimentAnalyzer(SentimentAnalyzer):
     """
     Продвинутый анализатор тональности с анализом аспектов
     """
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, **kwargs):
+        """
+        Args:
+            kwargs: параметры SentimentAnalyzer
+        """
+        super().__init__(**kwargs)
+        if self._sync_snapshot():
+            return
         
         # Аспекты для анализа (можно расширить)
         self.aspects = {
@@ -256,24 +498,57 @@ class AdvancedSentimentAnalyzer(SentimentAnalyzer):
             "доставка": ["доставка", "доставили", "срок", "курьер"],
             "продукт": ["товар", "продукт", "упаковка", "комплектация"]
         }
+        self.aspect_lexicon = LexiconMatcher(self.aspects, lemmatize=True)
     
-    def analyze_aspect_sentiment(self, text):
+    def snapshot_state(self):
+        state = super().snapshot_state()
+        state["aspects"] = {"aspects": self.aspects, "lexicon": self.aspect_lexicon.to_state()}
+        return state
+    
+    def _apply_snapshot(self, data):
+        super()._apply_snapshot(data)
+        self.aspects = data["aspects"]["aspects"]
+        self.aspect_lexicon = LexiconMatcher.from_state(data["aspects"]["lexicon"])
+    
+    def analyze_aspect_sentiment(self, text, context_words=5):
         """
-        Анализ тональности по аспектам
+        Анализ тональности по аспектам.
+        Текст разбивается на слова один раз, упоминания всех аспектов
+        находятся одним проходом, пересекающиеся контексты одного аспекта
+        объединяются, и все уникальные контексты оцениваются одним
+        пакетным вызовом модели.
         
         Returns:
             dict: тональность по аспектам
         """
+        self._sync_snapshot()
+        tokens, spans = self.aspect_lexicon.tokenize(text)
+        hits = self.aspect_lexicon.find_tokens(tokens, spans)
+        
+        # Окна контекста вокруг упоминаний, пересекающиеся окна аспекта склеиваются
+        aspect_windows = {}
+        for hit in hits:
+            start = max(0, hit["token_start"] - context_words)
+            end = min(len(tokens), hit["token_end"] + context_words)
+            windows = aspect_windows.setdefault(hit["category"], [])
+            if windows and start <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+            else:
+                windows.append((start, end))
+        
+        # Одинаковые окна разных аспектов оцениваются один раз
+        unique_windows = sorted({window for windows in aspect_windows.values() for window in windows})
+        contexts = [text[spans[start][0]:spans[end - 1][1]] for start, end in unique_windows]
+        sentiments = self.analyze_sentiment_batch(contexts) if contexts else []
+        window_scores = {window: sentiment['score'] for window, sentiment in zip(unique_windows, sentiments)}
+        
         aspect_sentiments = {}
         
-        for aspect, keywords in self.aspects.items():
-            # Проверяем наличие ключевых слов аспекта
-            aspect_mentioned = any(keyword in text.lower() 
-                                  for keyword in keywords)
-            
-            if aspect_mentioned:
-                # Анализируем тональность контекста вокруг ключевых слов
-                aspect_score = self._analyze_aspect_context(text, keywords)
+        for aspect in self.aspects:
+            if aspect in aspect_windows:
+                aspect_score = round(float(np.mean(
+                    [window_scores[window] for window in aspect_windows[aspect]]
+                )), 3)
                 
                 aspect_sentiments[aspect] = {
                     "mentioned": True,
@@ -289,35 +564,9 @@ class AdvancedSentimentAnalyzer(SentimentAnalyzer):
         
         return aspect_sentiments
     
-    def _analyze_aspect_context(self, text, keywords, context_words=5):
-        """
-        Анализ тональности контекста вокруг ключевых слов
-        """
-        words = text.lower().split()
-        scores = []
-        
-        for i, word in enumerate(words):
-            if word in keywords:
-                # Берем контекст вокруг ключевого слова
-                start = max(0, i - context_words)
-                end = min(len(words), i + context_words + 1)
-                context = " ".join(words[start:end])
-                
-                # Анализируем тональность контекста
-                sentiment = self.analyze_sentiment(context)
-                scores.append(sentiment['score'])
-        
-        # Возвращаем средний скор, или нейтральный если не найдено
-        return np.mean(scores) if scores else 0.5
-    
     def _score_to_sentiment(self, score):
         """Конвертация скора в тональность"""
-        if score > 0.6:
-            return "позитивный"
-        elif score < 0.4:
-            return "негативный"
-        else:
-            return "нейтральный"
+        return score_to_sentiment(score)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,243 @@
 # transcribe.py (упрощенная версия)
 import os  # ⬅️ УЖЕ ЕСТЬ, но проверьте что он в начале файла
+import json
+import struct
 import wave
-import tempfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Форматы WAV, которые умеет читать транскрибатор
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def probe_wav_header(audio_path):
+    """
+    Разбор RIFF/WAVE-заголовка без создания объекта wave.
+    Читаются только заголовки чанков до начала секции data.
+    
+    Returns:
+        dict: строка таблицы с параметрами файла и флагом valid
+    """
+    row = {
+        "path": audio_path,
+        "valid": False,
+        "error": None,
+        "duration_seconds": 0,
+        "sample_rate": 0,
+        "channels": 0,
+        "sample_width": 0,
+        "file_size": 0
+    }
+    
+    try:
+        with open(audio_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            row["file_size"] = file_size
+            
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+                row["error"] = "не RIFF/WAVE файл"
+                return row
+            
+            fmt = None
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    row["error"] = "секция data не найдена" if fmt else "секция fmt не найдена"
+                    return row
+                
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+                
+                if chunk_id == b'fmt ':
+                    body = f.read(chunk_size)
+                    if len(body) < 16:
+                        row["error"] = "обрезанная секция fmt"
+                        return row
+                    fmt = struct.unpack('<HHIIHH', body[:16])
+                    if chunk_size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    data_offset = f.tell()
+                    break
+                else:
+                    # Пропускаем LIST, fact и прочие служебные секции
+                    f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    except OSError as e:
+        row["error"] = str(e)
+        return row
+    
+    if fmt is None:
+        row["error"] = "секция data перед секцией fmt"
+        return row
+    
+    format_tag, channels, framerate, _, block_align, bits = fmt
+    row["sample_rate"] = framerate
+    row["channels"] = channels
+    row["sample_width"] = bits // 8
+    
+    if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE):
+        row["error"] = f"неподдерживаемый формат {format_tag:#06x}"
+        return row
+    if not channels or not framerate or not block_align:
+        row["error"] = "некорректные параметры fmt"
+        return row
+    
+    available = max(0, file_size - data_offset)
+    row["duration_seconds"] = round(min(chunk_size, available) / block_align / framerate, 2)
+    
+    if chunk_size > available:
+        row["error"] = "файл обрезан"
+        return row
+    
+    row["valid"] = True
+    return row
+
+
+class DemoBackend:
+    """
+    Детерминированный локальный распознаватель (замена движка для тестов).
+    Каждые utterance_seconds аудио превращаются в одну фразу демо-диалога.
+    """
+    
+    phrases = [
+        "Оператор: Здравствуйте, это служба поддержки компании ТехноМаркет.",
+        "Клиент: Здравствуйте. У меня большая проблема с заказом номер A-12345.",
+        "Оператор: Понимаю ваше беспокойство. Давайте проверим статус вашего заказа.",
+        "Клиент: Это просто ужасно! Мне нужен ноутбук для срочной работы.",
+        "Оператор: Приношу извинения за неудобства. Я могу предложить два варианта.",
+        "Клиент: Хорошо, давайте второе решение. Но только если будет доставлено точно завтра.",
+        "Оператор: Отлично. Я оформляю замену заказа. Новый номер заказа B-67890.",
+        "Клиент: Спасибо. Надеюсь, на этот раз все будет хорошо."
+    ]
+    
+    def __init__(self, utterance_seconds=5.0):
+        self.utterance_seconds = utterance_seconds
+    
+    def create_stream(self, sample_rate):
+        return _DemoStream(self.phrases, sample_rate, self.utterance_seconds)
+
+
+class _DemoStream:
+    """Поток распознавания демо-движка (16-битный моно PCM)"""
+    
+    def __init__(self, phrases, sample_rate, utterance_seconds):
+        self.phrases = phrases
+        self.sample_rate = sample_rate
+        self.utterance_samples = max(1, int(sample_rate * utterance_seconds))
+        self.position = 0
+        self.utterance_start = 0
+        self.index = 0
+    
+    def accept(self, pcm):
+        self.position += len(pcm) // 2
+        segments = []
+        while self.position - self.utterance_start >= self.utterance_samples:
+            segments.append(self._emit(self.utterance_start + self.utterance_samples))
+        return segments
+    
+    def flush(self):
+        if self.position > self.utterance_start:
+            return [self._emit(self.position)]
+        return []
+    
+    def _emit(self, end_sample):
+        start = self.utterance_start / self.sample_rate
+        end = end_sample / self.sample_rate
+        text = self.phrases[self.index % len(self.phrases)]
+        self.index += 1
+        self.utterance_start = end_sample
+        return {
+            "start": round(start, 2),
+            "end": round(end, 2),
+            "text": text,
+            "duration": round(end - start, 2)
+        }
+
+
+class VoskBackend:
+    """
+    Офлайн-распознавание через Vosk (pip install vosk).
+    Модель загружается один раз при первом использовании (в каждом процессе),
+    на каждый файл создается свой распознаватель.
+    """
+    
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.model = None
+    
+    def __getstate__(self):
+        # В дочерние процессы передается только путь, модель грузится там заново
+        return {"model_path": self.model_path, "model": None}
+    
+    def create_stream(self, sample_rate):
+        if self.model is None:
+            from vosk import Model
+            self.model = Model(self.model_path)
+        return _VoskStream(self.model, sample_rate)
+
+
+class _VoskStream:
+    """Обертка над KaldiRecognizer, отдающая сегменты в формате транскрибатора"""
+    
+    def __init__(self, model, sample_rate):
+        from vosk import KaldiRecognizer
+        self.recognizer = KaldiRecognizer(model, sample_rate)
+        self.recognizer.SetWords(True)
+    
+    def accept(self, pcm):
+        if self.recognizer.AcceptWaveform(pcm):
+            return self._parse(self.recognizer.Result())
+        return []
+    
+    def flush(self):
+        return self._parse(self.recognizer.FinalResult())
+    
+    def _parse(self, raw_result):
+        result = json.loads(raw_result)
+        text = result.get("text", "").strip()
+        words = result.get("result", [])
+        if not text or not words:
+            return []
+        
+        start = words[0]["start"]
+        end = words[-1]["end"]
+        return [{
+            "start": round(start, 2),
+            "end": round(end, 2),
+            "text": text,
+            "duration": round(end - start, 2),
+            "words": words
+        }]
+
 
 class AudioTranscriber:
-    def __init__(self, language="ru-RU"):
+    def __init__(self, language="ru-RU", backend=None, chunk_seconds=0.5, vad=None,
+                 max_workers=None, max_chunk_seconds=300):
+        """
+        Args:
+            language: язык распознавания
+            backend: движок распознавания (VoskBackend, DemoBackend);
+                     по умолчанию используется DemoBackend
+            chunk_seconds: размер окна чтения WAV в секундах
+            vad: VoiceActivityDetector - распознавать только участки речи
+            max_workers: число процессов для режима "parallel" (по умолчанию - число ядер)
+            max_chunk_seconds: максимальная длина фрагмента в режиме "parallel"
+        """
+        if max_chunk_seconds <= 0:
+            raise ValueError(f"max_chunk_seconds должен быть положительным, получено {max_chunk_seconds}")
+        
         self.language = language
+        self.backend = backend
+        self.chunk_seconds = chunk_seconds
+        self.vad = vad
+        self.max_workers = max_workers
+        self.max_chunk_seconds = max_chunk_seconds
+    
+    def _get_backend(self):
+        if self.backend is None:
+            self.backend = DemoBackend()
+        return self.backend
     
     def get_audio_info(self, audio_path):
         """Получение информации об аудиофайле"""
@@ -43,9 +275,195 @@ class AudioTranscriber:
                 "file_exists": False
             }
     
+    def probe_audio_batch(self, paths, max_workers=8):
+        """
+        Пакетная проверка аудиофайлов по заголовкам (без загрузки аудио)
+        
+        Args:
+            paths: путь к папке или список путей к WAV-файлам
+            max_workers: число потоков для чтения заголовков
+            
+        Returns:
+            dict: таблица параметров файлов и список отбракованных
+        """
+        if isinstance(paths, (str, os.PathLike)):
+            with os.scandir(paths) as entries:
+                paths = sorted(
+                    entry.path for entry in entries
+                    if entry.is_file() and entry.name.lower().endswith('.wav')
+                )
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            rows = list(executor.map(probe_wav_header, paths))
+        
+        rejected = [row["path"] for row in rows if not row["valid"]]
+        
+        return {
+            "files": rows,
+            "total_files": len(rows),
+            "valid_count": len(rows) - len(rejected),
+            "rejected": rejected,
+            "total_duration_seconds": round(sum(row["duration_seconds"] for row in rows if row["valid"]), 2)
+        }
+    
+    def iter_segments(self, audio_path, intervals=None):
+        """
+        Потоковая транскрибация: WAV читается окнами по chunk_seconds,
+        сегменты отдаются по мере готовности движка.
+        В памяти одновременно находится только одно окно аудио.
+        
+        Args:
+            audio_path: путь к WAV-файлу
+            intervals: интервалы речи [{start, end}, ...] в секундах;
+                       если заданы, распознаются только они
+        
+        Yields:
+            dict: сегмент {start, end, text, duration}
+        """
+        with wave.open(audio_path, 'rb') as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            framerate = wf.getframerate()
+            n_frames = wf.getnframes()
+            
+            if sample_width != 2:
+                raise ValueError(f"Поддерживается только 16-битный PCM, получено {sample_width * 8} бит")
+            
+            if intervals is None:
+                regions = [(0, n_frames)]
+            else:
+                regions = [
+                    (int(interval['start'] * framerate), min(int(interval['end'] * framerate), n_frames))
+                    for interval in intervals
+                ]
+            
+            frames_per_chunk = max(1, int(framerate * self.chunk_seconds))
+            
+            for region_start, region_end in regions:
+                # Каждый интервал распознается отдельным потоком,
+                # время сегментов сдвигается на начало интервала
+                wf.setpos(region_start)
+                stream = self._get_backend().create_stream(framerate)
+                offset = region_start / framerate
+                remaining = region_end - region_start
+                
+                while remaining > 0:
+                    data = wf.readframes(min(frames_per_chunk, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data) // (channels * sample_width)
+                    if channels > 1:
+                        data = self._to_mono(data, channels)
+                    
+                    for segment in stream.accept(data):
+                        yield self._shift_segment(segment, offset)
+                
+                for segment in stream.flush():
+                    yield self._shift_segment(segment, offset)
+    
+    def _shift_segment(self, segment, offset):
+        """Перевод времени сегмента из времени потока в абсолютное"""
+        if not offset:
+            return segment
+        
+        shifted = {
+            **segment,
+            "start": round(segment["start"] + offset, 2),
+            "end": round(segment["end"] + offset, 2)
+        }
+        if "words" in segment:
+            shifted["words"] = [
+                {**word, "start": word["start"] + offset, "end": word["end"] + offset}
+                for word in segment["words"]
+            ]
+        return shifted
+    
+    def plan_chunks(self, vad_result, voiced_only):
+        """
+        Разбиение записи на фрагменты не длиннее max_chunk_seconds по паузам
+        
+        Args:
+            vad_result: результат VoiceActivityDetector.detect
+            voiced_only: True - фрагменты состоят только из интервалов речи,
+                         False - фрагменты покрывают всю запись, разрезы в середине пауз
+        
+        Returns:
+            list: фрагменты, каждый - список интервалов [{start, end}, ...]
+        """
+        intervals = vad_result["intervals"]
+        total = vad_result["total_duration"]
+        
+        if voiced_only:
+            units = [(interval["start"], interval["end"]) for interval in intervals]
+        else:
+            cuts = [(prev["end"] + nxt["start"]) / 2 for prev, nxt in zip(intervals, intervals[1:])]
+            bounds = [0.0] + cuts + [total]
+            units = list(zip(bounds[:-1], bounds[1:]))
+        
+        # Слишком длинные участки без пауз режем принудительно
+        max_len = self.max_chunk_seconds
+        pieces = []
+        for start, end in units:
+            while end - start > max_len:
+                pieces.append((start, start + max_len))
+                start += max_len
+            if end > start:
+                pieces.append((start, end))
+        
+        chunks = []
+        for start, end in pieces:
+            if chunks and end - chunks[-1][0][0] <= max_len:
+                chunks[-1].append((start, end))
+            else:
+                chunks.append([(start, end)])
+        
+        if not voiced_only:
+            # Соседние участки непрерывны - читаем фрагмент одним потоком
+            chunks = [[(chunk[0][0], chunk[-1][1])] for chunk in chunks]
+        
+        return [[{"start": start, "end": end} for start, end in chunk] for chunk in chunks]
+    
+    def iter_segments_parallel(self, audio_path, vad_result=None):
+        """
+        Параллельная транскрибация длинной записи на пуле процессов.
+        Запись всегда режется по паузам: без настроенного VAD паузы ищет
+        VoiceActivityDetector с параметрами по умолчанию, а фрагменты покрывают
+        всю запись (разрез посреди слова испортил бы распознавание обоих
+        фрагментов). Сегменты собираются в исходном порядке с абсолютным временем.
+        
+        Yields:
+            dict: сегмент {start, end, text, duration}
+        """
+        if vad_result is None:
+            from .vad import VoiceActivityDetector
+            vad_result = (self.vad or VoiceActivityDetector()).detect_file(audio_path)
+        
+        chunks = self.plan_chunks(vad_result, voiced_only=self.vad is not None)
+        tasks = [(audio_path, chunk) for chunk in chunks]
+        
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_transcribe_worker,
+            initargs=(self.language, self.backend, self.chunk_seconds)
+        ) as executor:
+            for chunk_segments in executor.map(_transcribe_chunk, tasks):
+                for segment in chunk_segments:
+                    yield segment
+    
+    def _to_mono(self, data, channels):
+        """Сведение окна многоканального PCM в моно"""
+        samples = np.frombuffer(data, dtype='<i2').reshape(-1, channels)
+        return samples.mean(axis=1).astype('<i2').tobytes()
+    
     def transcribe(self, audio_path, method="demo"):
         """
-        Демо-версия транскрибации
+        Транскрибация аудиофайла
+        
+        Args:
+            audio_path: путь к WAV-файлу
+            method: "demo" - демо-текст, "stream" - потоковый движок
+                    (собирает все сегменты iter_segments), "parallel" - то же
+                    на пуле процессов (iter_segments_parallel)
         """
         # Проверяем существует ли файл
         if not os.path.exists(audio_path):
@@ -60,6 +478,39 @@ class AudioTranscriber:
         
         audio_info = self.get_audio_info(audio_path)
         
+        if method in ("stream", "parallel"):
+            try:
+                vad_result = None
+                if self.vad is not None:
+                    vad_result = self.vad.detect_file(audio_path)
+                    audio_info["speech_ratio"] = vad_result["speech_ratio"]
+                    audio_info["speech_duration"] = vad_result["speech_duration"]
+                
+                if method == "parallel":
+                    segments = list(self.iter_segments_parallel(audio_path, vad_result))
+                else:
+                    intervals = vad_result["intervals"] if vad_result else None
+                    segments = list(self.iter_segments(audio_path, intervals))
+            except Exception as e:
+                return {
+                    "error": str(e),
+                    "text": "",
+                    "audio_info": audio_info,
+                    "segments": [],
+                    "language": self.language,
+                    "method": method
+                }
+            
+            return {
+                "text": " ".join(segment["text"] for segment in segments),
+                "audio_info": audio_info,
+                "segments": segments,
+                "language": self.language,
+                "method": method,
+                # Демо-движок выдает заготовленные фразы, а не текст записи
+                "demo": isinstance(self._get_backend(), DemoBackend)
+            }
+        
         # Демо-текст
         demo_text = """
         Оператор: Здравствуйте, это служба поддержки компании ТехноМаркет. Меня зовут Анна. Чем могу помочь?
@@ -102,7 +553,8 @@ class AudioTranscriber:
             "audio_info": audio_info,
             "segments": segments,
             "language": self.language,
-            "method": method
+            "method": method,
+            "demo": True
         }
     
     def _format_time(self, seconds):
@@ -111,6 +563,21 @@ class AudioTranscriber:
         secs = int(seconds % 60)
         return f"{minutes:02d}:{secs:02d}"
 
+# Транскрибатор дочернего процесса: создается один раз на процесс пула
+_worker_transcriber = None
+
+
+def _init_transcribe_worker(language, backend, chunk_seconds):
+    global _worker_transcriber
+    _worker_transcriber = AudioTranscriber(language=language, backend=backend,
+                                           chunk_seconds=chunk_seconds)
+
+
+def _transcribe_chunk(task):
+    audio_path, intervals = task
+    return list(_worker_transcriber.iter_segments(audio_path, intervals))
+
+
 if __name__ == "__main__":
     transcriber = AudioTranscriber(language="ru-RU")
     print("Транскрибатор инициализирован (демо-версия)")
@@ -120,6 +587,9 @@ if __name__ == "__main__":
     if os.path.exists(test_audio):
         result = transcriber.transcribe(test_audio)
         print(f"Транскрибация успешна. Длительность: {result['audio_info'].get('duration_formatted', 'N/A')}")
+        
+        for segment in transcriber.iter_segments(test_audio):
+            print(f"[{segment['start']:.2f}-{segment['end']:.2f}] {segment['text']}")
     else:
         print(f"Тестовый файл не найден: {test_audio}")
         print("Создайте папку audio_samples и добавьте test.wav для тестирования")
\ No newline at end of file
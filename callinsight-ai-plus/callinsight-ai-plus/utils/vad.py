@@ -0,0 +1,150 @@
+# vad.py - Детектор речевой активности (энергия + частота переходов через ноль)
+import numpy as np
+
+from .audio_cache import load_audio, TARGET_SAMPLE_RATE
+
+
+class VoiceActivityDetector:
+    """
+    Энергетический VAD для отсечения тишины, удержания и пауз
+    перед транскрибацией и диаризацией
+    """
+
+    def __init__(self, frame_ms=20, energy_margin_db=12.0, min_energy_db=-50.0,
+                 max_zcr=0.35, min_speech_ms=200, min_silence_ms=300, padding_ms=100,
+                 noise_percentile=3.0):
+        """
+        Args:
+            frame_ms: длина кадра анализа
+            energy_margin_db: превышение над уровнем шума для речи
+            min_energy_db: абсолютный минимум энергии речи (dBFS)
+            max_zcr: доля переходов через ноль, выше которой кадр считается шумом
+            min_speech_ms: более короткие участки речи отбрасываются
+            min_silence_ms: более короткие паузы внутри речи склеиваются
+            padding_ms: запас, добавляемый к границам интервалов
+            noise_percentile: перцентиль энергии кадров, принимаемый за уровень шума
+                              (в плотном диалоге тишины бывает меньше 10% записи)
+        """
+        self.frame_ms = frame_ms
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.max_zcr = max_zcr
+        self.min_speech_ms = min_speech_ms
+        self.min_silence_ms = min_silence_ms
+        self.padding_ms = padding_ms
+        self.noise_percentile = noise_percentile
+
+    def frame_features(self, samples, sample_rate=TARGET_SAMPLE_RATE, block_frames=30000):
+        """
+        Энергия (dBFS) и доля переходов через ноль по кадрам.
+        Кадры - это reshape-представление сигнала без копирования;
+        обработка идет крупными блоками, чтобы ограничить временную память.
+
+        Returns:
+            tuple: (energy_db, zcr) - массивы длины n_frames
+        """
+        frame_len = max(2, int(sample_rate * self.frame_ms / 1000))
+        n_frames = len(samples) // frame_len
+        frames = np.asarray(samples[:n_frames * frame_len]).reshape(n_frames, frame_len)
+
+        energy_db = np.empty(n_frames, dtype=np.float32)
+        zcr = np.empty(n_frames, dtype=np.float32)
+
+        for start in range(0, n_frames, block_frames):
+            block = frames[start:start + block_frames]
+            power = np.einsum('ij,ij->i', block, block, dtype=np.int64) / frame_len
+            energy_db[start:start + len(block)] = 10 * np.log10(power / 32768.0 ** 2 + 1e-10)
+
+            signs = block >= 0
+            crossings = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1)
+            zcr[start:start + len(block)] = crossings / (frame_len - 1)
+
+        return energy_db, zcr
+
+    def detect(self, samples, sample_rate=TARGET_SAMPLE_RATE):
+        """
+        Поиск интервалов речи
+
+        Args:
+            samples: моно сигнал int16
+            sample_rate: частота дискретизации
+
+        Returns:
+            dict: интервалы речи и доля речи в записи
+        """
+        total_duration = len(samples) / sample_rate
+        energy_db, zcr = self.frame_features(samples, sample_rate)
+
+        if len(energy_db) == 0:
+            return self._result([], total_duration)
+
+        # Порог относительно уровня шума (нижний перцентиль энергии;
+        # провалы до цифровой тишины ограничены снизу min_energy_db)
+        noise_floor = np.percentile(energy_db, self.noise_percentile)
+        threshold = max(noise_floor + self.energy_margin_db, self.min_energy_db)
+        is_speech = (energy_db > threshold) & (zcr < self.max_zcr)
+
+        starts, ends = self._runs(is_speech)
+        frame_sec = self.frame_ms / 1000
+
+        # Склеиваем короткие паузы между участками речи
+        if len(starts) > 1:
+            gaps = (starts[1:] - ends[:-1]) * frame_sec
+            keep = np.concatenate([[True], gaps >= self.min_silence_ms / 1000])
+            starts = starts[keep]
+            ends = ends[np.concatenate([keep[1:], [True]])]
+
+        # Отбрасываем слишком короткие участки
+        durations = (ends - starts) * frame_sec
+        long_enough = durations >= self.min_speech_ms / 1000
+        starts, ends = starts[long_enough], ends[long_enough]
+
+        padding = self.padding_ms / 1000
+        interval_starts = np.maximum(starts * frame_sec - padding, 0.0)
+        interval_ends = np.minimum(ends * frame_sec + padding, total_duration)
+
+        intervals = []
+        for start, end in zip(interval_starts, interval_ends):
+            # Границы после добавления запаса могут перекрыться
+            if intervals and start <= intervals[-1]['end']:
+                intervals[-1]['end'] = round(float(end), 2)
+                intervals[-1]['duration'] = round(intervals[-1]['end'] - intervals[-1]['start'], 2)
+                continue
+            intervals.append({
+                'start': round(float(start), 2),
+                'end': round(float(end), 2),
+                'duration': round(float(end - start), 2)
+            })
+
+        return self._result(intervals, total_duration)
+
+    def detect_file(self, audio_path):
+        """Поиск интервалов речи в файле (через общий кэш декодированного аудио)"""
+        return self.detect(load_audio(audio_path), TARGET_SAMPLE_RATE)
+
+    def _runs(self, mask):
+        """Начала и концы (не включительно) серий True в булевом массиве"""
+        padded = np.concatenate([[False], mask, [False]]).astype(np.int8)
+        edges = np.diff(padded)
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    def _result(self, intervals, total_duration):
+        speech_duration = sum(interval['duration'] for interval in intervals)
+        return {
+            'intervals': intervals,
+            'speech_duration': round(speech_duration, 2),
+            'total_duration': round(total_duration, 2),
+            'speech_ratio': round(speech_duration / total_duration, 3) if total_duration else 0.0
+        }
+
+
+if __name__ == "__main__":
+    import os
+
+    vad = VoiceActivityDetector()
+    test_audio = "audio_samples/test.wav"
+    if os.path.exists(test_audio):
+        result = vad.detect_file(test_audio)
+        print(f"Интервалов речи: {len(result['intervals'])}, доля речи: {result['speech_ratio']:.1%}")
+    else:
+        print(f"Тестовый файл не найден: {test_audio}")